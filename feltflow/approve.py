@@ -1,14 +1,30 @@
-from typing import Any, Dict
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, Tuple
 
 from ocean_lib.models.datatoken1 import Datatoken1
 from ocean_lib.ocean.ocean import Ocean
 
+from feltflow.gas import send_transaction
+from feltflow.rpc import get_reader
+
+# Locks of allowances by (owner, token address, spender)
+_LOCKS: Dict[Tuple[str, str, str], threading.Lock] = defaultdict(threading.Lock)
+_LOCKS_LOCK = threading.Lock()
+
 
 class Approve:
     """Class handling all approve calls during dataset order.
 
-    Right now it adds amounts together if there are multiple approve calls for one spender
-    In future this should batch approves together to minimize transaction calls.
+    Right now it adds amounts together if there are multiple approve calls for one
+    spender. Approve is skipped if current allowance is sufficient, allowance can be
+    approved ahead for multiple orders (APPROVE_AHEAD config), so following orders
+    of the round don't need approve transactions.
+
+    Approve overwrites allowance and concurrent orders could spend allowance
+    checked by each other, so orders should be sent within `approved` block which
+    serializes orders of same account, token and spender.
     """
 
     def __init__(self) -> None:
@@ -48,18 +64,65 @@ class Approve:
             ocean: ocean class with all configs
             tx_dict: transaction config, must contain key {"from": account}
         """
+        reader = get_reader(ocean)
         for token_address, transactions in self.approve.items():
             token = Datatoken1(ocean.config, token_address)
             for spender, amount in transactions.items():
                 if amount == 0:
                     continue
 
-                token_balance = token.balanceOf(tx_dict["from"])
+                owner = str(tx_dict["from"])
+                token_balance = reader.call(token.balanceOf, owner)
                 if token_balance < amount:
+                    symbol = reader.symbol(token)
                     raise ValueError(
-                        f"Your token balance {token_balance} {token.symbol()} is not  "
+                        f"Your token balance {token_balance} {symbol} is not  "
                         f"sufficient to execute the requested service. This service "
-                        f"requires {amount} {token.symbol()}."
+                        f"requires {amount} {symbol}."
                     )
 
-                token.approve(spender, amount, tx_dict)
+                if reader.call(token.allowance, owner, spender) >= amount:
+                    continue
+
+                # Allowance for following orders, limited by the checked balance
+                ahead = ocean.config_dict.get("APPROVE_AHEAD", 1)
+                approved = min(amount * ahead, token_balance)
+                send_transaction(
+                    ocean,
+                    tx_dict,
+                    "approve",
+                    lambda tx_dict: token.approve(spender, approved, tx_dict),
+                    replaceable=True,
+                )
+                reader.invalidate()
+
+    @contextmanager
+    def approved(self, ocean: Ocean, tx_dict: Dict[str, Any]) -> Iterator[None]:
+        """Approve all stored transactions and hold the allowances during the block.
+
+        Order spending the allowances must be sent inside the block.
+
+        Args:
+            ocean: ocean class with all configs
+            tx_dict: transaction config, must contain key {"from": account}
+        """
+        owner = str(tx_dict["from"])
+        keys = sorted(
+            (owner, token_address, spender)
+            for token_address, transactions in self.approve.items()
+            for spender, amount in transactions.items()
+            if amount
+        )
+        with _LOCKS_LOCK:
+            locks = [_LOCKS[key] for key in keys]
+
+        # Locks are always taken in same order, so orders can't deadlock
+        with ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            self.appprove_all(ocean, tx_dict)
+            try:
+                yield
+            finally:
+                # Following orders must see allowance spent by this order
+                get_reader(ocean).invalidate()
@@ -0,0 +1,112 @@
+"""Content-addressed storage of model artifacts shared between compute jobs."""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+import requests
+
+from feltflow.metrics import MODEL_BYTES, cache_lookup
+
+# Timeout (seconds) of requests to artifact server
+TIMEOUT = 60
+
+
+class ArtifactStore:
+    """Class storing model artifacts under their content hash.
+
+    Artifacts are written to local directory and optionally uploaded to HTTP server
+    (`upload_url`). Compute jobs then reference artifacts by `base_url` and hash
+    instead of carrying the whole model inline. Artifact with same content is stored
+    and uploaded only once, only actually uploaded bytes are counted in metrics.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        local_dir: str,
+        upload_url: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Args:
+            base_url: URL (reachable by provider) under which artifacts are served
+            local_dir: directory for storing artifacts on local disk
+            upload_url: URL of HTTP server accepting PUT of artifacts (optional)
+            headers: extra headers used for upload requests
+        """
+        self.base_url = base_url.rstrip("/")
+        self.local_dir = Path(local_dir)
+        self.upload_url = upload_url.rstrip("/") if upload_url else None
+        self.headers = headers or {}
+        self._uploaded: Set[str] = set()
+
+        self.local_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def hash(data: bytes) -> str:
+        """Compute content hash (sha256 hex digest) of artifact."""
+        return hashlib.sha256(data).hexdigest()
+
+    def url(self, digest: str) -> str:
+        """Get URL of artifact with given hash."""
+        return f"{self.base_url}/{digest}"
+
+    def put(self, data: bytes) -> Dict[str, str]:
+        """Store artifact, skip it if artifact with same content already exists.
+
+        Args:
+            data: artifact content
+
+        Returns:
+            dictionary with url and hash of the artifact
+        """
+        digest = self.hash(data)
+
+        path = self.local_dir / digest
+        exists = path.exists()
+        cache_lookup("artifacts", exists)
+        if not exists:
+            # Unique temporary file, other process can store same artifact
+            with tempfile.NamedTemporaryFile(
+                dir=self.local_dir, suffix=".tmp", delete=False
+            ) as f:
+                f.write(data)
+            os.replace(f.name, path)
+            if not self.upload_url:
+                # Artifact is served from local directory
+                MODEL_BYTES.inc(len(data), direction="upload")
+
+        if self.upload_url and digest not in self._uploaded:
+            if self._upload(digest, data):
+                MODEL_BYTES.inc(len(data), direction="upload")
+            self._uploaded.add(digest)
+
+        return {"url": self.url(digest), "hash": digest}
+
+    def put_json(self, data: Dict[str, Any]) -> Dict[str, str]:
+        """Store JSON serializable object (model) as canonical JSON artifact."""
+        encoded = json.dumps(data, separators=(",", ":"), sort_keys=True)
+        return self.put(encoded.encode("utf-8"))
+
+    def get(self, digest: str) -> bytes:
+        """Load artifact content from local disk."""
+        return (self.local_dir / digest).read_bytes()
+
+    def _upload(self, digest: str, data: bytes) -> bool:
+        """Upload artifact to HTTP server unless it's already present there.
+
+        Returns:
+            True if the artifact was uploaded
+        """
+        url = f"{self.upload_url}/{digest}"
+        res = requests.head(url, headers=self.headers, timeout=TIMEOUT)
+        if res.status_code == 200:
+            return False
+
+        res = requests.put(url, data=data, headers=self.headers, timeout=TIMEOUT)
+        if not res.ok:
+            raise Exception(f"Failed to upload artifact {digest} ({res.status_code}).")
+        return True
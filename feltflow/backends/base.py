@@ -0,0 +1,108 @@
+"""Interface of compute backends running compute jobs."""
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from brownie.network.account import LocalAccount
+
+if TYPE_CHECKING:
+    from feltflow.comput_job import ComputeJob
+
+# Classes of job failures
+FAILURE_TRANSIENT = "transient"  # provider error, job can be resubmitted
+FAILURE_ALGORITHM = "algorithm"  # algorithm error, resubmitting won't help
+FAILURE_EXPIRED = "expired"  # order expired, job must be paid again
+
+
+class ComputeBackend(ABC):
+    """Base class of compute backend (e.g. Ocean C2D or local executor).
+
+    Backend works with `ComputeJob` objects which keep the generic job state.
+    Job info returned by backend follows format of Ocean provider status:
+    {"jobId": ..., "ok": bool, "status": int (70 = finished), "results": [...]}
+    where each result has at least "filename" and "filesize".
+    """
+
+    def validate(self, dataset_dids: List[str], algorithm_did: str) -> Any:
+        """Check that algorithm can run on the datasets.
+
+        Result is cached by backend, so `prepare` of jobs using same assets reuses it
+        and validation of many jobs can run in parallel.
+        """
+
+    def preload(self, asset_dids: List[str]) -> None:
+        """Load metadata of all assets used by jobs at once (optional)."""
+
+    def start_round(self) -> None:
+        """Drop state cached for one round of training (optional)."""
+
+    @abstractmethod
+    def prepare(self, job: "ComputeJob") -> None:
+        """Resolve datasets and algorithm of the job and check their compatibility."""
+
+    @abstractmethod
+    def start(
+        self, job: "ComputeJob", account: LocalAccount, nonce: Optional[str] = None
+    ) -> Tuple[dict, str]:
+        """Start the job.
+
+        Returns:
+            tuple of job info and auth token used for accessing job outputs
+        """
+
+    @abstractmethod
+    def status(self, job: "ComputeJob", account: LocalAccount) -> dict:
+        """Get current job info of the job."""
+
+    def status_group(self, job: "ComputeJob") -> str:
+        """Key of jobs which status can be obtained by single `bulk_status` call."""
+        return str(id(self))
+
+    def host(self, job: "ComputeJob") -> Optional[str]:
+        """Scheduler host of job requests, None if requests aren't rate limited."""
+        return None
+
+    def classify_failure(self, job: "ComputeJob") -> str:
+        """Classify why the job failed (one of FAILURE_* constants)."""
+        return FAILURE_TRANSIENT
+
+    def bulk_status(
+        self, jobs: List["ComputeJob"], account: LocalAccount
+    ) -> Dict[str, dict]:
+        """Get job info of multiple jobs from same status group at once.
+
+        Returns:
+            dictionary mapping job id to job info, jobs missing in it are checked
+            one by one using `status`
+        """
+        return {}
+
+    @abstractmethod
+    def result(self, job: "ComputeJob", index: int, account: LocalAccount) -> bytes:
+        """Get content of output file with given index."""
+
+    @abstractmethod
+    def result_url(
+        self,
+        job: "ComputeJob",
+        index: int,
+        account: LocalAccount,
+        nonce: Optional[str] = None,
+    ) -> dict:
+        """Get URL and headers for accessing output file (e.g. by other job)."""
+
+    def fetch(
+        self,
+        job: "ComputeJob",
+        index: int,
+        account: LocalAccount,
+        nonce: Optional[str] = None,
+        max_size: Optional[int] = None,
+    ) -> bytes:
+        """Download output file, can be called for many jobs in parallel.
+
+        Download is stopped with exception once it exceeds `max_size` bytes.
+        """
+        content = self.result(job, index, account)
+        if max_size is not None and len(content) > max_size:
+            raise Exception(f"Output {index} of job {job.job_id} exceeds {max_size}")
+        return content
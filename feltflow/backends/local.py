@@ -0,0 +1,161 @@
+"""Compute backend running algorithms locally in process pool."""
+import hashlib
+import importlib
+import os
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from brownie.network.account import LocalAccount
+
+from feltflow.backends.base import FAILURE_ALGORITHM, FAILURE_TRANSIENT, ComputeBackend
+
+if TYPE_CHECKING:
+    from feltflow.comput_job import ComputeJob
+
+
+def load_function(path: str) -> Callable:
+    """Import function from path in format "package.module:function"."""
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _run_algorithm(
+    algorithm: str, data_paths: List[str], algocustomdata: dict, output_dir: str
+) -> List[dict]:
+    """Run algorithm in worker process and return description of its outputs.
+
+    Algorithm is called as `algorithm(data_paths, algocustomdata, output_dir)` and
+    should write its outputs (e.g. "model") into output_dir (same as /data/outputs
+    folder in Ocean C2D).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    load_function(algorithm)(data_paths, algocustomdata, output_dir)
+
+    results = []
+    for name in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, name), "rb") as f:
+            content = f.read()
+        results.append(
+            {
+                "filename": name,
+                "filesize": len(content),
+                "sha256": hashlib.sha256(content).hexdigest(),
+                "type": "output",
+            }
+        )
+    return results
+
+
+class LocalBackend(ComputeBackend):
+    """Backend running training and aggregation algorithms in local process pool.
+
+    Datasets and algorithms are referenced by same ids as in Ocean (DIDs), but they
+    are mapped to local data files and python functions. No orders are created.
+    """
+
+    def __init__(
+        self,
+        datasets: Dict[str, str],
+        algorithms: Dict[str, str],
+        work_dir: str = ".feltflow/local",
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Args:
+            datasets: mapping of dataset id to path of local data file
+            algorithms: mapping of algorithm id to function ("module:function")
+            work_dir: directory where outputs of jobs are stored
+            max_workers: number of worker processes (number of CPUs by default)
+        """
+        self.datasets = datasets
+        self.algorithms = algorithms
+        self.work_dir = Path(work_dir)
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._futures: Dict[str, Future] = {}
+
+    def close(self) -> None:
+        """Shut down worker processes."""
+        self.executor.shutdown()
+
+    def _output_path(self, job: "ComputeJob", index: int) -> Path:
+        file_name = job.job_info["results"][index]["filename"]
+        return self.work_dir / job.job_id / "outputs" / file_name
+
+    def validate(self, dataset_dids: List[str], algorithm_did: str) -> None:
+        for did in dataset_dids:
+            assert did in self.datasets, f"Unknown local dataset: {did}"
+        assert (
+            algorithm_did in self.algorithms
+        ), f"Unknown local algorithm: {algorithm_did}"
+
+    def prepare(self, job: "ComputeJob") -> None:
+        self.validate(job.dataset_dids, job.algorithm_did)
+
+    def start(
+        self, job: "ComputeJob", account: LocalAccount, nonce: Optional[str] = None
+    ) -> Tuple[dict, str]:
+        job_id = uuid.uuid4().hex
+        self._futures[job_id] = self.executor.submit(
+            _run_algorithm,
+            self.algorithms[job.algorithm_did],
+            [self.datasets[did] for did in job.dataset_dids],
+            job.algocustomdata,
+            str(self.work_dir / job_id / "outputs"),
+        )
+        job_info = {
+            "jobId": job_id,
+            "ok": True,
+            "status": 1,
+            "statusText": "Job started",
+            "results": [],
+        }
+        return job_info, ""
+
+    def status(self, job: "ComputeJob", account: LocalAccount) -> dict:
+        future = self._futures[job.job_id]
+        job_info = {"jobId": job.job_id, "ok": True, "results": []}
+
+        if not future.done():
+            job_info.update({"status": 40, "statusText": "Running algorithm"})
+        elif future.exception() is not None:
+            job_info.update(
+                {
+                    "ok": False,
+                    "status": 70,
+                    "statusText": f"Algorithm failed: {future.exception()}",
+                }
+            )
+        else:
+            job_info.update(
+                {
+                    "status": 70,
+                    "statusText": "Job completed",
+                    "results": future.result(),
+                }
+            )
+        return job_info
+
+    def classify_failure(self, job: "ComputeJob") -> str:
+        future = self._futures.get(job.job_id)
+        if future is not None and future.done() and future.exception() is not None:
+            return FAILURE_ALGORITHM
+        return FAILURE_TRANSIENT
+
+    def bulk_status(
+        self, jobs: List["ComputeJob"], account: LocalAccount
+    ) -> Dict[str, dict]:
+        return {job.job_id: self.status(job, account) for job in jobs}
+
+    def result(self, job: "ComputeJob", index: int, account: LocalAccount) -> bytes:
+        return self._output_path(job, index).read_bytes()
+
+    def result_url(
+        self,
+        job: "ComputeJob",
+        index: int,
+        account: LocalAccount,
+        nonce: Optional[str] = None,
+    ) -> dict:
+        return {"url": self._output_path(job, index).resolve().as_uri(), "headers": {}}
@@ -0,0 +1,464 @@
+"""Compute backend running jobs through Ocean compute-to-data."""
+import copy
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from brownie.network.account import LocalAccount
+from ocean_lib.agreements.service_types import ServiceTypes
+from ocean_lib.assets.ddo import DDO
+from ocean_lib.data_provider.data_service_provider import DataServiceProvider
+from ocean_lib.models.compute_input import ComputeInput
+from ocean_lib.ocean.ocean import Ocean
+from ocean_lib.services.service import Service
+from requests import PreparedRequest
+
+from feltflow.backends.base import (
+    FAILURE_ALGORITHM,
+    FAILURE_EXPIRED,
+    FAILURE_TRANSIENT,
+    ComputeBackend,
+)
+from feltflow.environments import EnvironmentSelector, get_selector
+from feltflow.metadata_cache import get_metadata_cache
+from feltflow.metrics import LATENCY, cache_lookup
+from feltflow.ocean.data_service_provider import CustomDataServiceProvider
+from feltflow.ocean.ocean_compute import CustomOceanCompute
+from feltflow.order import get_valid_until_time, pay_for_compute_service
+from feltflow.scheduler import Scheduler
+from feltflow.subgraph import get_access_details
+
+# Timeout (seconds) of provider requests made directly by the backend
+TIMEOUT = 60
+
+if TYPE_CHECKING:
+    from feltflow.comput_job import ComputeJob
+
+# Seconds after which list of provider environments is requested again
+ENVIRONMENTS_TTL = 30
+# C2D statuses of jobs failed because of algorithm (algorithm provisioning failed)
+ALGORITHM_FAILED_STATUSES = [32]
+
+
+class OceanBackend(ComputeBackend):
+    """Backend ordering and running compute jobs on Ocean C2D providers.
+
+    Following Ocean specific attributes are set on prepared jobs: datasets,
+    algorithm (resolved DDOs), compute_service, algo_service, compute_env, chain_id.
+    Compute environment of each job is chosen by environment selector using health
+    of the provider observed from start and status requests.
+    """
+
+    def __init__(
+        self,
+        ocean: Ocean,
+        selector: Optional[EnvironmentSelector] = None,
+        min_job_duration: float = 0,
+        compress_payload: bool = False,
+    ):
+        """
+        Args:
+            ocean: Ocean instance of the chain
+            selector: environment selector (shared process selector by default)
+            min_job_duration: minimal maxJobDuration (seconds) of used environments
+            compress_payload: send large compute start payloads gzip encoded
+        """
+        self.ocean = ocean
+        self.ocean.compute = CustomOceanCompute(ocean.config)
+        self.selector = selector or get_selector()
+        self.min_job_duration = min_job_duration
+        self.compress_payload = compress_payload
+        # Caches of resolved DDOs, environments and validations (values are futures,
+        # so parallel validations wait for single request instead of repeating it)
+        self._lock = threading.Lock()
+        self._ddos: Dict[str, Future] = {}
+        self._environments: Dict[str, Future] = {}
+        self._environments_time: Dict[str, float] = {}
+        self._validations: Dict[Tuple[Tuple[str, ...], str], Future] = {}
+        # Prices and order syncs of access details, queried once per round
+        self._round: Dict[Any, Future] = {}
+
+    def _cached(
+        self, name: str, cache: Dict[Any, Future], key: Any, fn: Callable[[], Any]
+    ) -> Any:
+        """Get value from cache or compute it, failed computations aren't cached."""
+        with self._lock:
+            future = cache.get(key)
+            owner = future is None
+            if owner:
+                future = cache[key] = Future()
+        cache_lookup(name, not owner)
+
+        if owner:
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+                with self._lock:
+                    cache.pop(key, None)
+        return future.result()
+
+    def preload(self, asset_dids: List[str]) -> None:
+        with self._lock:
+            missing = [did for did in asset_dids if did not in self._ddos]
+        try:
+            ddos = get_metadata_cache().resolve_ddos(self.ocean, missing)
+        except Exception as e:
+            # Assets are resolved one by one later
+            print(f"Preloading of assets failed: {e}")
+            return
+
+        for did, ddo in ddos.items():
+            with self._lock:
+                if did not in self._ddos:
+                    self._ddos[did] = Future()
+                    self._ddos[did].set_result(ddo)
+
+    def start_round(self) -> None:
+        with self._lock:
+            self._round = {}
+
+    def _resolve(self, did: str) -> DDO:
+        ddo = self._cached("ddo", self._ddos, did, lambda: self._resolve_uncached(did))
+        assert ddo is not None, f"Couldn't resolve asset: {did}"
+        return ddo
+
+    def _resolve_uncached(self, did: str) -> Optional[DDO]:
+        try:
+            ddo = get_metadata_cache().resolve_ddos(self.ocean, [did]).get(did)
+        except Exception as e:
+            # Aquarius query endpoint failed, resolve asset by its DDO endpoint
+            print(f"Resolving asset {did} from cache failed: {e}")
+            ddo = None
+        return ddo or self.ocean.assets.resolve(did)
+
+    def _timed(
+        self,
+        provider: str,
+        kind: str,
+        fn: Callable[[], Any],
+        environment_id: Optional[str] = None,
+    ) -> Any:
+        """Call provider request and record its latency (or failure) as health."""
+        start_time = time.time()
+        try:
+            result = fn()
+        except Exception:
+            LATENCY.observe(time.time() - start_time, service="provider")
+            self.selector.record_failure(provider, environment_id)
+            raise
+        duration = time.time() - start_time
+        LATENCY.observe(duration, service="provider")
+        self.selector.record_latency(provider, kind, duration, environment_id)
+        return result
+
+    def _environment_list(self, service_endpoint: str) -> List[dict]:
+        """Get environments of provider, list is refreshed after ENVIRONMENTS_TTL."""
+        with self._lock:
+            fetched = self._environments_time.get(service_endpoint, 0)
+            if time.time() - fetched > ENVIRONMENTS_TTL:
+                self._environments.pop(service_endpoint, None)
+                self._environments_time[service_endpoint] = time.time()
+
+        return self._cached(
+            "environments",
+            self._environments,
+            service_endpoint,
+            lambda: self._timed(
+                service_endpoint,
+                "status",
+                lambda: self.ocean.compute.get_c2d_environments(
+                    service_endpoint, self.ocean.config_dict["chainId"]
+                ),
+            ),
+        )
+
+    def _compute_environment(self, service_endpoint: str) -> dict:
+        """Select best compute environment of provider based on its health."""
+        return self.selector.select(
+            service_endpoint,
+            self._environment_list(service_endpoint),
+            self.min_job_duration,
+        )
+
+    @staticmethod
+    def check_compatibility(dataset: DDO, algorithm: DDO) -> Service:
+        """Check from DDOs that algorithm is allowed to run on the dataset.
+
+        Returns:
+            compute service of the dataset
+        """
+        assert not dataset.is_disabled, f"Dataset {dataset.did} is disabled"
+        assert not algorithm.is_disabled, f"Algorithm {algorithm.did} is disabled"
+        assert (
+            algorithm.metadata.get("type") == "algorithm"
+        ), f"Asset {algorithm.did} is not an algorithm"
+        assert algorithm.services, f"Algorithm {algorithm.did} has no service"
+
+        services = [s for s in dataset.services if s.type == ServiceTypes.CLOUD_COMPUTE]
+        assert services, f"Dataset {dataset.did} has no compute service"
+        service = services[0]
+
+        # Same rules as provider uses, no trusted algorithms means any is allowed
+        trusted = [a["did"] for a in service.get_trusted_algorithms()]
+        publishers = [p.lower() for p in service.get_trusted_algorithm_publishers()]
+        owner = (algorithm.nft or {}).get("owner", "").lower()
+        assert (
+            (not trusted and not publishers)
+            or algorithm.did in trusted
+            or owner in publishers
+        ), f"Algorithm {algorithm.did} is not trusted by dataset {dataset.did}"
+        return service
+
+    def validate(self, dataset_dids: List[str], algorithm_did: str) -> dict:
+        """Resolve and check assets of the job.
+
+        Returns:
+            dictionary with resolved datasets, algorithm, compute_service,
+            algo_service and compute_env
+        """
+
+        def validation():
+            algorithm = self._resolve(algorithm_did)
+            datasets = [self._resolve(did) for did in dataset_dids]
+            compute_services = [
+                self.check_compatibility(dataset, algorithm) for dataset in datasets
+            ]
+            return {
+                "datasets": datasets,
+                "algorithm": algorithm,
+                "compute_service": compute_services[0],
+                "algo_service": algorithm.services[0],
+                "compute_env": self._compute_environment(
+                    compute_services[0].service_endpoint
+                ),
+            }
+
+        key = (tuple(dataset_dids), algorithm_did)
+        return self._cached("validations", self._validations, key, validation)
+
+    def prepare(self, job: "ComputeJob") -> None:
+        validation = self.validate(job.dataset_dids, job.algorithm_did)
+        job.datasets = validation["datasets"]
+        job.algorithm = validation["algorithm"]
+        job.compute_service = validation["compute_service"]
+        job.algo_service = validation["algo_service"]
+        # Environment is selected again, using latest health of the provider
+        job.compute_env = self._compute_environment(
+            job.compute_service.service_endpoint
+        )
+        job.chain_id = self.ocean.config_dict["chainId"]
+
+    def prepare_inputs(
+        self, job: "ComputeJob", address: str
+    ) -> Tuple[List[ComputeInput], ComputeInput, int]:
+        """Prepare compute inputs (with already valid orders) of datasets and algorithm.
+
+        Args:
+            job: prepared compute job
+            address: address of account which will order the compute job
+
+        Returns:
+            tuple of dataset inputs, algorithm input and valid until time of orders
+        """
+        # Add access details to copies of dataset and algo DDOs, DDOs are shared
+        # by jobs (cached validation) which can be started concurrently
+        datasets = [copy.copy(dataset) for dataset in job.datasets]
+        round_cache = self._round
+
+        def cached(key: Any, fn: Callable[[], Any]) -> Any:
+            return self._cached("access_details", round_cache, key, fn)
+
+        for dataset in datasets:
+            dataset.access_details = get_access_details(
+                job.compute_service, self.ocean.config["SUBGRAPH_URL"], address, cached
+            )
+
+        algorithm = copy.copy(job.algorithm)
+        algorithm.access_details = get_access_details(
+            job.algo_service, self.ocean.config["SUBGRAPH_URL"], address, cached
+        )
+
+        data_input = [
+            ComputeInput(
+                ddo, job.compute_service, ddo.access_details.get("valid_order_tx", "")
+            )
+            for ddo in datasets
+        ]
+        algo_input = ComputeInput(
+            algorithm,
+            job.algo_service,
+            algorithm.access_details.get("valid_order_tx", ""),
+        )
+
+        valid_until = get_valid_until_time(
+            float(job.compute_env["maxJobDuration"]),
+            float(job.compute_service.timeout),
+            float(job.algo_service.timeout),
+        )
+        return data_input, algo_input, valid_until
+
+    def start(
+        self, job: "ComputeJob", account: LocalAccount, nonce: Optional[str] = None
+    ) -> Tuple[dict, str]:
+        start_time = time.time()
+        data_input, algo_input, valid_until = self.prepare_inputs(job, account.address)
+
+        reuse_orders = bool(job.dataset_tx_ids) and not self._orders_expired(job)
+        if reuse_orders:
+            # Resubmitted job, orders of previous attempt are still valid
+            for compute_input, tx_id in zip(data_input, job.dataset_tx_ids):
+                compute_input.transfer_tx_id = tx_id
+            if job.algorithm_tx_id:
+                algo_input.transfer_tx_id = job.algorithm_tx_id
+
+        # Approves are skipped while allowance approved ahead is sufficient
+        datasets, algorithm = pay_for_compute_service(
+            datasets=data_input,
+            algorithm_data=algo_input,
+            consume_market_order_fee_address=account.address,
+            tx_dict={"from": account},
+            compute_environment=job.compute_env["id"],
+            valid_until=valid_until,
+            consumer_address=job.compute_env["consumerAddress"],
+            ocean=self.ocean,
+        )
+        dataset_tx_ids = [d.transfer_tx_id for d in datasets]
+        if not reuse_orders or dataset_tx_ids != job.dataset_tx_ids:
+            # Orders are valid for timeout of services (0 means unlimited)
+            timeouts = [
+                float(t)
+                for t in [job.compute_service.timeout, job.algo_service.timeout]
+                if float(t)
+            ]
+            job.orders_expire_at = start_time + min(timeouts) if timeouts else None
+        job.dataset_tx_ids = dataset_tx_ids
+        job.algorithm_tx_id = algorithm.transfer_tx_id if algorithm else None
+        job.timings["orders"] = time.time() - start_time
+
+        return self._timed(
+            job.compute_service.service_endpoint,
+            "start",
+            lambda: self.ocean.compute.start(
+                consumer_wallet=account,
+                dataset=datasets[0],
+                compute_environment=job.compute_env["id"],
+                algorithm=algorithm,
+                algorithm_algocustomdata=job.algocustomdata,
+                additional_datasets=datasets[1:],
+                nonce=nonce,
+                compress=self.compress_payload,
+            ),
+            job.compute_env["id"],
+        )
+
+    @staticmethod
+    def _orders_expired(job: "ComputeJob") -> bool:
+        return job.orders_expire_at is not None and time.time() >= job.orders_expire_at
+
+    def classify_failure(self, job: "ComputeJob") -> str:
+        job_info = getattr(job, "job_info", None) or {}
+        if (
+            self._orders_expired(job)
+            or "expired" in str(job_info.get("statusText", "")).lower()
+        ):
+            return FAILURE_EXPIRED
+        if job_info.get("status") in ALGORITHM_FAILED_STATUSES:
+            return FAILURE_ALGORITHM
+        return FAILURE_TRANSIENT
+
+    def status(self, job: "ComputeJob", account: LocalAccount) -> dict:
+        return self._timed(
+            job.compute_service.service_endpoint,
+            "status",
+            lambda: self.ocean.compute.status(
+                job.datasets[0], job.compute_service, job.job_id, account
+            ),
+        )
+
+    def status_group(self, job: "ComputeJob") -> str:
+        return job.compute_service.service_endpoint
+
+    def host(self, job: "ComputeJob") -> Optional[str]:
+        return Scheduler.host(job.compute_service.service_endpoint)
+
+    def bulk_status(
+        self, jobs: List["ComputeJob"], account: LocalAccount
+    ) -> Dict[str, dict]:
+        provider = jobs[0].compute_service.service_endpoint
+        statuses = self._timed(
+            provider,
+            "status",
+            lambda: CustomDataServiceProvider.compute_jobs_status(provider, account),
+        )
+        return {info.get("jobId"): info for info in statuses}
+
+    def result(self, job: "ComputeJob", index: int, account: LocalAccount) -> bytes:
+        # TODO: Use ocean auth token instead
+        return self.ocean.compute.result(
+            job.datasets[0], job.compute_service, job.job_id, index, account
+        )
+
+    def result_url(
+        self,
+        job: "ComputeJob",
+        index: int,
+        account: LocalAccount,
+        nonce: Optional[str] = None,
+    ) -> dict:
+        if not nonce:
+            nonce = str(CustomDataServiceProvider.get_nonce())
+
+        req = PreparedRequest()
+        params = {
+            "nonce": nonce,
+            "jobId": job.job_id,
+            "index": index,
+            "consumerAddress": account.address,
+        }
+
+        (
+            _,
+            compute_job_result_endpoint,
+        ) = DataServiceProvider.build_compute_result_file_endpoint(
+            job.compute_service.service_endpoint
+        )
+        req.prepare_url(compute_job_result_endpoint, params)
+        return {
+            "url": req.url,
+            "headers": {
+                "AuthToken": job.auth_token,
+            },
+        }
+
+    def fetch(
+        self,
+        job: "ComputeJob",
+        index: int,
+        account: LocalAccount,
+        nonce: Optional[str] = None,
+        max_size: Optional[int] = None,
+    ) -> bytes:
+        """Download output file using auth token (doesn't require signing)."""
+        url = self.result_url(job, index, account, nonce)
+        with LATENCY.time(service="provider"):
+            with requests.get(
+                url["url"], headers=url["headers"], stream=True, timeout=TIMEOUT
+            ) as res:
+                if not res.ok:
+                    raise Exception(
+                        f"Unable to download output {index} of job {job.job_id} "
+                        f"(error: {res.status_code})"
+                    )
+
+                content = bytearray()
+                for chunk in res.iter_content(chunk_size=1024**2):
+                    content += chunk
+                    if max_size is not None and len(content) > max_size:
+                        raise Exception(
+                            f"Output {index} of job {job.job_id} exceeds "
+                            f"{max_size} bytes"
+                        )
+        return bytes(content)
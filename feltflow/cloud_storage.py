@@ -1,8 +1,11 @@
 import json
-from typing import Any, List
+from typing import Any, List, Optional
 
 import requests
 
+from feltflow.metadata_cache import get_metadata_cache
+from feltflow.metrics import LATENCY
+
 
 class CloudStorage:
     """Class communicating with FELT backend server.
@@ -20,20 +23,25 @@ class CloudStorage:
 
     def _fetch(self, endpoint: str, method: str, data: str) -> requests.Response:
         """Send request to FELT API with appropriate headers."""
-        response = requests.request(
-            method, f"{self.api_base_url}{endpoint}", data=data, headers=self.headers
-        )
+        with LATENCY.time(service="felt_api"):
+            response = requests.request(
+                method,
+                f"{self.api_base_url}{endpoint}",
+                data=data,
+                headers=self.headers,
+            )
         if not response.ok:
             raise Exception("Failed to store/update job in cloud storage.")
 
         return response
 
     def get_job(self) -> dict:
-        res = requests.request(
-            "GET",
+        """Get job spec of launch token, cached spec is revalidated by ETag."""
+        return get_metadata_cache().fetch_json(
+            "job",
             f"{self.api_base_url}/api/python-flow/jobs?launchToken={self.launch_token}",
+            "felt_api",
         )
-        return res.json()
 
     def create_job(self) -> requests.Response:
         """Store new job through API into the FELT Labs storage."""
@@ -66,16 +74,20 @@ class CloudStorage:
         authToken: str,
         dataDid: str,
         computeJob: dict,
+        seedKey: Optional[dict] = None,
     ) -> requests.Response:
         """Store new aggregation through API into the FELT Labs storage."""
-        data = self._stringify(
-            {
-                "launchToken": self.launch_token,
-                "round": round,
-                "seed": seed,
-                "authToken": authToken,
-                "dataDid": dataDid,
-                "computeJob": computeJob,
-            }
+        data = {
+            "launchToken": self.launch_token,
+            "round": round,
+            "seed": seed,
+            "authToken": authToken,
+            "dataDid": dataDid,
+            "computeJob": computeJob,
+        }
+        # Entropy and (round, client) key from which the seed was derived
+        if seedKey is not None:
+            data["seedKey"] = seedKey
+        return self._fetch(
+            "/api/python-flow/jobs/localTraining", "POST", self._stringify(data)
         )
-        return self._fetch("/api/python-flow/jobs/localTraining", "POST", data)
@@ -0,0 +1,269 @@
+"""Compression of model weights exchanged between training rounds."""
+import json
+from base64 import b64decode, b64encode
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def _flatten(weights: Dict[str, Any]) -> Tuple[np.ndarray, List[list]]:
+    """Concatenate all weight tensors into single float64 vector."""
+    arrays = [np.asarray(v, dtype=np.float64) for v in weights.values()]
+    layout = [[name, list(a.shape)] for name, a in zip(weights, arrays)]
+    vector = np.concatenate([a.ravel() for a in arrays]) if arrays else np.zeros(0)
+    return vector, layout
+
+
+def _offsets(layout: List[list]) -> np.ndarray:
+    """Start offsets of tensors in flat vector (last item is total size)."""
+    sizes = [int(np.prod(shape)) for _, shape in layout]
+    return np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+
+
+def _unflatten(vector: np.ndarray, layout: List[list]) -> Dict[str, np.ndarray]:
+    offsets = _offsets(layout)
+    return {
+        name: vector[offsets[i] : offsets[i + 1]].reshape(shape)
+        for i, (name, shape) in enumerate(layout)
+    }
+
+
+def _size(data: Any) -> int:
+    """Size of compact JSON encoding of data in bytes."""
+    return len(json.dumps(data, separators=(",", ":")))
+
+
+def _b64(array: np.ndarray) -> str:
+    return b64encode(array.tobytes()).decode("utf-8")
+
+
+def encode(
+    vector: np.ndarray, layout: List[list], dtype: str, top_k: Optional[float]
+) -> dict:
+    """Encode flat weight vector as JSON serializable payload.
+
+    Args:
+        vector: flat weights (or weight update)
+        layout: list of [name, shape] of tensors in the vector
+        dtype: dtype of transmitted values (float32, float16 or int8)
+        top_k: fraction of values with largest magnitude to keep (None keeps all)
+    """
+    payload = {"dtype": dtype, "layout": layout}
+    indices = np.arange(len(vector))
+    if top_k is not None and len(vector):
+        k = max(1, int(np.ceil(top_k * len(vector))))
+        indices = np.sort(np.argpartition(np.abs(vector), -k)[-k:])
+        payload["indices"] = _b64(indices.astype(np.int32))
+    values = vector[indices]
+
+    if dtype == "int8":
+        # One scale per tensor, tensor of each value is found by its index
+        offsets = _offsets(layout)
+        tensor_ids = np.searchsorted(offsets[1:], indices, side="right")
+        scales = np.zeros(len(layout))
+        np.maximum.at(scales, tensor_ids, np.abs(values) / 127)
+        scales[scales == 0] = 1.0
+        values = np.round(values / scales[tensor_ids])
+        payload["scales"] = scales.tolist()
+
+    payload["values"] = _b64(values.astype(DTYPES[dtype]))
+    return payload
+
+
+def decode(payload: dict) -> np.ndarray:
+    """Decode payload created by `encode` into flat float64 vector."""
+    layout = payload["layout"]
+    offsets = _offsets(layout)
+    values = np.frombuffer(
+        b64decode(payload["values"]), dtype=DTYPES[payload["dtype"]]
+    ).astype(np.float64)
+
+    if "indices" in payload:
+        indices = np.frombuffer(b64decode(payload["indices"]), dtype=np.int32)
+    else:
+        indices = np.arange(offsets[-1])
+
+    if "scales" in payload:
+        tensor_ids = np.searchsorted(offsets[1:], indices, side="right")
+        values *= np.asarray(payload["scales"])[tensor_ids]
+
+    vector = np.zeros(offsets[-1])
+    vector[indices] = values
+    return vector
+
+
+def encode_model(weights: Dict[str, Any], dtype: str) -> dict:
+    """Quantize model weights (used by algorithms for compressing their outputs).
+
+    Args:
+        weights: dictionary of weight tensors
+        dtype: dtype of transmitted values (float32, float16 or int8)
+
+    Returns:
+        payload which can be decoded by `decode_model` ("weights_update" of model)
+    """
+    vector, layout = _flatten(weights)
+    return encode(vector, layout, dtype, None)
+
+
+def decode_model(payload: dict, base: Optional[dict] = None) -> Dict[str, np.ndarray]:
+    """Reconstruct model weights from compressed update (used by algorithms).
+
+    Args:
+        payload: compressed update ("weights_update" of algocustomdata)
+        base: encoded base model ("base_model" artifact) if update is a delta
+    """
+    vector = decode(payload)
+    if base is not None:
+        vector += decode(base)
+    return _unflatten(vector, payload["layout"])
+
+
+class ModelCompressor:
+    """Compressor of model weights exchanged each round.
+
+    Weights are sent to local trainings quantized to `dtype`, local trainings are
+    asked to return their models quantized the same way (see `encode_model`).
+
+    Optionally weights are sent as delta against the model of previous round,
+    which can be top-k sparsified. Compute jobs don't keep state between rounds,
+    so the base model is sent with the delta (as float32 payload, see
+    `base_payload`) and delta pays off only if the base is cheap for receivers
+    (e.g. served from nearby cache). Delta is computed against the model
+    reconstructed by receivers, so error of the compression is carried into the
+    next update (error feedback) and isn't lost over rounds.
+    """
+
+    def __init__(
+        self,
+        dtype: str = "float16",
+        top_k: Optional[float] = None,
+        delta: bool = False,
+        tolerance: float = 0.05,
+    ):
+        """
+        Args:
+            dtype: dtype of transmitted values (float32, float16 or int8)
+            top_k: fraction of largest values sent in each delta (None sends all)
+            delta: send difference against previous round's model
+            tolerance: maximal relative error of aggregation allowed by `verify`
+        """
+        assert dtype in DTYPES, f"Unsupported compression dtype: {dtype}"
+        assert top_k is None or 0 < top_k <= 1, "top_k must be fraction in (0, 1]"
+        assert top_k is None or delta, "top_k sparsification requires delta"
+        self.dtype = dtype
+        self.top_k = top_k
+        self.delta = delta
+        self.tolerance = tolerance
+        # Model as reconstructed by receivers
+        self.layout: List[list] = []
+        self.reference: Optional[np.ndarray] = None
+
+    def base_payload(self) -> Optional[dict]:
+        """Encoded model which next update is relative to (None if absolute)."""
+        if not self.delta or self.reference is None:
+            return None
+        # Reference is kept representable in float32, so base is sent losslessly
+        return encode(self.reference, self.layout, "float32", None)
+
+    def compress(self, weights: Dict[str, Any]) -> Tuple[dict, Dict[str, int]]:
+        """Compress new model weights.
+
+        Args:
+            weights: dictionary of weight tensors
+
+        Returns:
+            tuple of payload and size statistics (raw_bytes - JSON weights,
+            baseline_bytes - weights quantized to dtype without delta,
+            compressed_bytes and base_bytes - size of base model receivers need
+            for decoding the update)
+        """
+        vector, layout = _flatten(weights)
+        if self.reference is not None and len(self.reference) != len(vector):
+            self.reference = None
+        self.layout = layout
+        base = self.base_payload()
+
+        if self.reference is None:
+            # Receivers have no base yet, first model is sent without sparsification
+            payload = encode(vector, layout, self.dtype, None)
+            self.reference = decode(payload)
+        elif self.delta:
+            # Update includes error of previous updates (not yet received part)
+            payload = encode(vector - self.reference, layout, self.dtype, self.top_k)
+            self.reference = self.reference + decode(payload)
+        else:
+            payload = encode(vector, layout, self.dtype, self.top_k)
+            self.reference = decode(payload)
+
+        if self.delta:
+            # Base is sent as float32, rounding is sent with the next update
+            self.reference = self.reference.astype(np.float32).astype(np.float64)
+
+        raw = {k: np.asarray(v).tolist() for k, v in weights.items()}
+        stats = {
+            "raw_bytes": _size(raw),
+            "baseline_bytes": _size(encode(vector, layout, self.dtype, None)),
+            "compressed_bytes": _size(payload),
+            "base_bytes": _size(base) if base is not None else 0,
+        }
+        return payload, stats
+
+    def verify(
+        self, weights: Dict[str, Any], rounds: int = 10, n_clients: int = 4
+    ) -> float:
+        """Check that aggregation of compressed models matches uncompressed one.
+
+        Copy of the compressor runs simulated rounds: model is compressed and
+        decoded by clients the same way as algorithms do (`decode_model` with base
+        model), each client changes it by random update and returns it quantized
+        (`encode_model`). Average of decoded client models is compared with
+        model aggregated from the same updates without any compression.
+
+        Args:
+            weights: initial model weights
+            rounds: number of simulated rounds
+            n_clients: number of simulated clients
+
+        Returns:
+            maximal relative error of aggregated model (norm of error / model norm)
+        """
+        compressor = ModelCompressor(self.dtype, self.top_k, self.delta)
+        vector, layout = _flatten(weights)
+        expected = vector
+        rng = np.random.default_rng(0)
+        scale = max(float(np.abs(vector).mean()), 1e-3) * 0.01
+
+        error = 0.0
+        for _ in range(rounds):
+            base = compressor.base_payload()
+            payload, _ = compressor.compress(_unflatten(vector, layout))
+            received = _flatten(decode_model(payload, base))[0]
+
+            updates = rng.normal(scale=scale, size=(n_clients, len(vector)))
+            decoded = [
+                _flatten(
+                    decode_model(
+                        encode_model(_unflatten(received + u, layout), self.dtype)
+                    )
+                )[0]
+                for u in updates
+            ]
+            vector = np.mean(decoded, axis=0)
+            expected = expected + updates.mean(axis=0)
+            error = max(
+                error,
+                float(
+                    np.linalg.norm(vector - expected)
+                    / max(np.linalg.norm(expected), 1e-12)
+                ),
+            )
+
+        if error > self.tolerance:
+            raise Exception(
+                f"Aggregation of compressed models differs by {error:.4f} "
+                f"(tolerance {self.tolerance})"
+            )
+        return error
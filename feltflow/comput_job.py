@@ -1,139 +1,285 @@
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from brownie.network.account import LocalAccount
-from ocean_lib.data_provider.data_service_provider import DataServiceProvider
-from ocean_lib.models.compute_input import ComputeInput
 from ocean_lib.ocean.ocean import Ocean
-from ocean_lib.web3_internal.utils import sign_with_key
-from requests import PreparedRequest
-from web3.main import Web3
 
+from feltflow.backends.base import FAILURE_ALGORITHM, FAILURE_TRANSIENT, ComputeBackend
+from feltflow.backends.ocean_c2d import OceanBackend
+from feltflow.metrics import JOBS, MODEL_BYTES, STATUS_POLLS
 from feltflow.ocean.data_service_provider import CustomDataServiceProvider
-from feltflow.ocean.ocean_compute import CustomOceanCompute
-from feltflow.order import get_valid_until_time, pay_for_compute_service
-from feltflow.subgraph import get_access_details
+from feltflow.outputs import OUTPUT_LIMITS, check_results, parse_model
+from feltflow.profiling import profiled
+from feltflow.scheduler import PRIORITY_TRAINING, get_scheduler
+
+# Maximal number of parallel requests when working with results of many jobs
+MAX_WORKERS = 16
+# Maximal number of resubmissions of failed job and backoff delays (seconds)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 10
+RETRY_BACKOFF_MAX = 300
+
+
+class JobRecord:
+    """Compact record of compute job kept in the training history."""
+
+    __slots__ = (
+        "job_id",
+        "did",
+        "algorithm_did",
+        "state",
+        "started_at",
+        "finished_at",
+        "dataset_tx_ids",
+        "algorithm_tx_id",
+        "outputs",
+        "timings",
+        "attempts",
+    )
+
+    def __init__(
+        self,
+        job_id: str,
+        did: str,
+        algorithm_did: str,
+        state: str,
+        started_at: Optional[float] = None,
+        finished_at: Optional[float] = None,
+        dataset_tx_ids: Optional[List[str]] = None,
+        algorithm_tx_id: Optional[str] = None,
+        outputs: Optional[Dict[str, int]] = None,
+        timings: Optional[Dict[str, float]] = None,
+        attempts: int = 1,
+    ):
+        self.job_id = job_id
+        self.did = did
+        self.algorithm_did = algorithm_did
+        self.state = state
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.dataset_tx_ids = dataset_tx_ids or []
+        self.algorithm_tx_id = algorithm_tx_id
+        self.outputs = outputs or {}
+        self.timings = timings or {}
+        self.attempts = attempts
+
+    @staticmethod
+    def from_job(job: "ComputeJob") -> "JobRecord":
+        """Create record from (started) compute job."""
+        return JobRecord(
+            getattr(job, "job_id", None),
+            job.did,
+            job.algorithm_did,
+            job.state,
+            job.started_at,
+            job.finished_at,
+            job.dataset_tx_ids,
+            job.algorithm_tx_id,
+            {name: index for name, (index, _) in job.files.items()},
+            dict(job.timings),
+            job.attempts,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
 
 
 class ComputeJob:
-    """Class providing all functions for working with compute job."""
+    """Class providing all functions for working with compute job.
+
+    Backend specific work (ordering, starting, status and outputs) is done by
+    compute backend, Ocean C2D backend is used by default.
+    """
 
     def __init__(
         self,
-        ocean: Ocean,
+        ocean: Optional[Ocean],
         dataset_dids: List[str],
         algorithm_did: str,
         algocustomdata: dict,
+        backend: Optional[ComputeBackend] = None,
+        priority: int = PRIORITY_TRAINING,
+        owner: Any = None,
     ):
+        """
+        Args:
+            priority: scheduling priority of job requests (PRIORITY_* constant)
+            owner: owner of the job (e.g. training) used for fair scheduling
+        """
         self.ocean = ocean
+        self.backend = backend or OceanBackend(ocean)
         self.algocustomdata = algocustomdata
         self.did = dataset_dids[0]
-        self.datasets = [ocean.assets.resolve(did) for did in dataset_dids]
-        self.algorithm = ocean.assets.resolve(algorithm_did)
-
-        assert (
-            self.algorithm is not None
-        ), f"Couldn't resolve algorithm: {algorithm_did}"
-        for did, dataset in zip(dataset_dids, self.datasets):
-            assert dataset is not None, f"Couldn't resolve dataset: {did}"
+        self.dataset_dids = dataset_dids
+        self.algorithm_did = algorithm_did
+        self.priority = priority
+        self.owner = owner
 
-        self.ocean.compute = CustomOceanCompute(ocean.config)
+        self.state = "init"
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.dataset_tx_ids: List[str] = []
+        self.algorithm_tx_id: Optional[str] = None
+        # Time when paid orders expire (None if unknown or unlimited)
+        self.orders_expire_at: Optional[float] = None
+        # Number of submissions and class of the last failure (FAILURE_* constant)
+        self.attempts = 0
+        self.failure: Optional[str] = None
+        # Duration (seconds) of job stages {"orders": ..., "start": ...}
+        self.timings: Dict[str, float] = {}
+        # Index of job outputs {filename: (index, file)}, build once job finishes
+        self.files: Dict[str, Tuple[int, dict]] = {}
+        # Content of already downloaded and verified outputs {filename: bytes}
+        self.results: Dict[str, bytes] = {}
+        # Parsed and validated JSON outputs {filename: value}
+        self.parsed: Dict[str, Any] = {}
+        # Expected outputs and their maximal sizes, checked once job finishes
+        self.output_limits = dict(OUTPUT_LIMITS)
+        self.output_error: Optional[str] = None
 
-        # TODO: Check service types and compatibility
-        self.compute_service = self.datasets[0].services[0]
-        self.algo_service = self.algorithm.services[0]
+        self.backend.prepare(self)
 
-        self.chain_id = self.ocean.config_dict["chainId"]
+    @profiled("job_start")
+    def start(
+        self, account: LocalAccount, nonce: Optional[str] = None
+    ) -> Tuple[dict, str]:
+        assert self.state == "init", f"Compute job already in state {self.state}"
 
+        start_time = time.time()
+        self.attempts += 1
         try:
-            self.compute_env = ocean.compute.get_free_c2d_environment(
-                self.compute_service.service_endpoint,
-                self.chain_id,
-            )
+            with self.scheduled():
+                self.job_info, self.auth_token = self.backend.start(
+                    self, account, nonce
+                )
         except Exception:
-            self.compute_env = ocean.compute.get_c2d_environments(
-                self.compute_service.service_endpoint,
-                self.chain_id,
-            )[0]
+            # Orders paid before the failure are kept and reused by next attempt
+            self.failure = FAILURE_TRANSIENT
+            raise
+        self.job_id = self.job_info["jobId"]
+        JOBS.inc(state="started")
 
-        self.state = "init"
+        self.state = "running"
+        self.started_at = time.time()
+        self.timings["start"] = (
+            self.started_at - start_time - self.timings.get("orders", 0)
+        )
 
-    def start(
+        return self.job_info, self.auth_token
+
+    @contextmanager
+    def scheduled(self) -> Iterator[None]:
+        """Hold scheduler slot of job's provider (with job priority and owner)."""
+        scheduler = get_scheduler()
+        host = self.backend.host(self)
+        with scheduler.context(self.priority, self.owner):
+            with scheduler.slot(host) if host else nullcontext():
+                yield
+
+    def start_with_retry(
         self, account: LocalAccount, nonce: Optional[str] = None
     ) -> Tuple[dict, str]:
-        assert self.state == "init", f"Compute job already in state {self.state}"
-
-        # Add access details to dataset and algo DDOs
-        for dataset in self.datasets:
-            dataset.access_details = get_access_details(
-                self.compute_service, self.ocean.config["NETWORK_NAME"], account.address
-            )
+        """Start (or resubmit failed) job, retrying with backoff if start fails."""
+        while True:
+            try:
+                if self.state == "failed":
+                    return self.retry(account, nonce)
+                return self.start(account, nonce)
+            except Exception as e:
+                if not self.can_retry():
+                    raise
+                delay = self.retry_delay()
+                print(f"Start of job failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+                # Nonce can't be used twice
+                nonce = None
 
-        self.algorithm.access_details = get_access_details(
-            self.algo_service, self.ocean.config["NETWORK_NAME"], account.address
-        )
+    def classify_failure(self) -> str:
+        """Find out why the job failed (one of FAILURE_* constants)."""
+        assert self.state == "failed", "Only failed job can be classified"
+        if self.output_error:
+            # Outputs don't match expected metadata, running again won't help
+            self.failure = FAILURE_ALGORITHM
+        else:
+            self.failure = self.backend.classify_failure(self)
+        return self.failure
 
-        data_input = [
-            ComputeInput(
-                ddo, self.compute_service, ddo.access_details.get("valid_order_tx", "")
-            )
-            for ddo in self.datasets
-        ]
-        algo_input = ComputeInput(
-            self.algorithm,
-            self.algo_service,
-            self.algorithm.access_details.get("valid_order_tx", ""),
-        )
+    def can_retry(self) -> bool:
+        """Check if the job can be resubmitted (failure isn't caused by algorithm)."""
+        return self.failure != FAILURE_ALGORITHM and self.attempts <= MAX_RETRIES
 
-        valid_unitl = get_valid_until_time(
-            float(self.compute_env["maxJobDuration"]),
-            float(self.compute_service.timeout),
-            float(self.algo_service.timeout),
-        )
+    def retry_delay(self) -> float:
+        """Backoff delay (seconds) before next resubmission of the job."""
+        delay = min(RETRY_BACKOFF * 2 ** (self.attempts - 1), RETRY_BACKOFF_MAX)
+        return delay * random.uniform(0.5, 1)
 
-        # TODO: Would be nice to batch all approve transactions into one
-        datasets, algorithm = pay_for_compute_service(
-            datasets=data_input,
-            algorithm_data=algo_input,
-            consume_market_order_fee_address=account.address,
-            tx_dict={"from": account},
-            compute_environment=self.compute_env["id"],
-            valid_until=valid_unitl,
-            consumer_address=self.compute_env["consumerAddress"],
-            ocean=self.ocean,
-        )
+    def retry(
+        self,
+        account: LocalAccount,
+        nonce: Optional[str] = None,
+        algocustomdata: Optional[dict] = None,
+    ) -> Tuple[dict, str]:
+        """Resubmit failed job.
 
-        self.job_info, self.auth_token = self.ocean.compute.start(
-            consumer_wallet=account,
-            dataset=datasets[0],
-            compute_environment=self.compute_env["id"],
-            algorithm=algorithm,
-            algorithm_algocustomdata=self.algocustomdata,
-            additional_datasets=datasets[1:],
-            nonce=nonce,
-        )
-        self.job_id = self.job_info["jobId"]
+        Still valid orders of previous attempt are reused, orders are paid again
+        only if they expired.
 
-        self.state = "running"
+        Args:
+            account: account which started the job
+            nonce: nonce used for starting the job
+            algocustomdata: new algocustomdata (e.g. with newly signed URLs)
+        """
+        assert self.state == "failed", "Only failed job can be retried"
+        assert self.can_retry(), f"Job {self.job_id} can't be retried"
 
-        return self.job_info, self.auth_token
+        self.state = "init"
+        self.finished_at = None
+        self.files = {}
+        self.results = {}
+        self.parsed = {}
+        self.output_error = None
+        if algocustomdata is not None:
+            self.algocustomdata = algocustomdata
+        return self.start(account, nonce)
 
     def check_status(self, account: LocalAccount) -> str:
         assert self.state != "init", f"Compute job must be started first."
-        self.job_info = self.ocean.compute.status(
-            self.datasets[0], self.compute_service, self.job_id, account
-        )
+        STATUS_POLLS.inc()
+        with self.scheduled():
+            job_info = self.backend.status(self, account)
+        return self.update_status(job_info)
+
+    def update_status(self, job_info: dict) -> str:
+        """Update job state from job info obtained from provider status endpoint."""
+        self.job_info = job_info
+        previous_state = self.state
 
         if not self.job_info["ok"]:
             self.state = "failed"
+            self.finished_at = time.time()
 
         elif self.job_info["status"] == 70:
             self.state = "finished"
-            self.files = {
-                file["filename"]: (i, file)
-                for i, file in enumerate(self.job_info["results"])
-            }
+            self.finished_at = self.finished_at or time.time()
+            if not self.files:
+                self.files = {
+                    file["filename"]: (i, file)
+                    for i, file in enumerate(self.job_info["results"])
+                }
+                # Metadata of outputs is checked before anything is downloaded
+                self.output_error = check_results(
+                    self.job_info["results"], self.output_limits
+                )
+            if self.output_error:
+                print(f"Invalid outputs of job {self.job_id}: {self.output_error}")
+                self.state = "failed"
 
+        if self.state != previous_state:
+            JOBS.inc(state=self.state)
         return self.state
 
     def get_outputs(self) -> dict:
@@ -144,38 +290,104 @@ class ComputeJob:
         self, file_name: str, account: LocalAccount, nonce: Optional[str] = None
     ) -> dict:
         assert self.state == "finished", "Job must finish first before getting outputs"
+        index = self.files[file_name][0]
+        return self.backend.result_url(self, index, account, nonce)
+
+    def get_file(self, file_name: str, account: LocalAccount) -> bytes:
+        assert self.state == "finished", "Job must finish first before getting outputs"
+        if file_name in self.results:
+            return self.results[file_name]
 
         index = self.files[file_name][0]
+        return self.backend.result(self, index, account)
 
+    def fetch_file(
+        self, file_name: str, account: LocalAccount, nonce: Optional[str] = None
+    ) -> str:
+        """Download output file and verify its size.
+
+        Downloaded content is kept in `results` and reused by `get_file`.
+
+        Returns:
+            sha256 hash of the file content
+        """
+        if file_name not in self.results:
+            assert file_name in self.files, f"Job {self.job_id} has no {file_name}"
+
+            index, file = self.files[file_name]
+            expected_size = file.get("filesize")
+            max_size = (
+                int(expected_size)
+                if expected_size is not None
+                else self.output_limits.get(file_name)
+            )
+            content = self.backend.fetch(self, index, account, nonce, max_size)
+
+            if expected_size is not None and int(expected_size) != len(content):
+                raise Exception(
+                    f"Invalid size of {file_name} of job {self.job_id}: "
+                    f"{len(content)} bytes, expected {expected_size}"
+                )
+            expected_hash = file.get("sha256")
+            if expected_hash and hashlib.sha256(content).hexdigest() != expected_hash:
+                raise Exception(f"Invalid hash of {file_name} of job {self.job_id}")
+            self.results[file_name] = content
+            MODEL_BYTES.inc(len(content), direction="download")
+
+        return hashlib.sha256(self.results[file_name]).hexdigest()
+
+    def get_json(
+        self, file_name: str, account: LocalAccount, schema: Optional[dict] = None
+    ) -> Any:
+        """Get parsed JSON output validated against schema, it's parsed only once."""
+        if file_name not in self.parsed:
+            self.parsed[file_name] = parse_model(
+                self.get_file(file_name, account), schema
+            )
+        return self.parsed[file_name]
+
+    @staticmethod
+    def get_file_urls(
+        jobs: List["ComputeJob"],
+        file_names: List[str],
+        account: LocalAccount,
+        nonce: Optional[str] = None,
+    ) -> List[Dict[str, dict]]:
+        """Get URLs and headers of multiple output files for many jobs at once.
+
+        Args:
+            jobs: finished compute jobs
+            file_names: names of output files
+            account: account which started the jobs
+            nonce: nonce used for all URLs
+
+        Returns:
+            list (one item per job) of dictionaries mapping file name to URL data
+        """
         if not nonce:
             nonce = str(CustomDataServiceProvider.get_nonce())
 
-        req = PreparedRequest()
-        params = {
-            "nonce": nonce,
-            "jobId": self.job_id,
-            "index": index,
-            "consumerAddress": account.address,
-        }
-
-        (
-            _,
-            compute_job_result_endpoint,
-        ) = DataServiceProvider.build_compute_result_file_endpoint(
-            self.compute_service.service_endpoint
-        )
-        req.prepare_url(compute_job_result_endpoint, params)
-        return {
-            "url": req.url,
-            "headers": {
-                "AuthToken": self.auth_token,
-            },
-        }
-
-    def get_file(self, file_name: str, account: LocalAccount) -> Dict[str, Any]:
-        assert self.state == "finished", "Job must finish first before getting outputs"
-        index = self.files[file_name][0]
-        # TODO: Use ocean auth token instead
-        return self.ocean.compute.result(
-            self.datasets[0], self.compute_service, self.job_id, index, account
-        )
+        def job_urls(job: ComputeJob) -> Dict[str, dict]:
+            return {f: job.get_file_url(f, account, nonce) for f in file_names}
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            return list(executor.map(job_urls, jobs))
+
+    @staticmethod
+    def prefetch_files(
+        jobs: List["ComputeJob"], file_names: List[str], account: LocalAccount
+    ) -> List[Dict[str, str]]:
+        """Download and verify output files of many jobs in parallel.
+
+        Raises exception if any of the files is missing or doesn't match its size.
+
+        Returns:
+            list (one item per job) of dictionaries mapping file name to its hash
+        """
+        nonce = str(CustomDataServiceProvider.get_nonce())
+
+        def job_hashes(job: ComputeJob) -> Dict[str, str]:
+            return {f: job.fetch_file(f, account, nonce) for f in file_names}
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            return list(executor.map(job_hashes, jobs))
@@ -1,24 +1,163 @@
+"""Registry of supported chains and creation of Ocean objects for them.
+
+Ocean objects are cached by chainId, but brownie has a single active network per
+process, so only one chain can be used in a process. Jobs on other chains have to
+be run by separate processes (e.g. one worker per chain), requesting Ocean of other
+chain raises exception instead of switching the network under existing objects.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from brownie import network, web3
 from ocean_lib.example_config import get_config_dict
 from ocean_lib.ocean.ocean import Ocean
-from ocean_lib.web3_internal.utils import connect_to_network
 
-# Dictonary mapping chainId to network name
-NETWORKS = {80001: "polygon-test"}
+from feltflow.rpc import endpoint_uri
+from feltflow.scheduler import Limits, Scheduler, get_scheduler
+
+
+@dataclass
+class ChainConfig:
+    """Configuration of single chain (network) supported by FELT Flow.
+
+    Attributes:
+        network_name: brownie network name (e.g. "polygon-test" for mumbai)
+        subgraph_url: URL of Ocean subgraph
+        aquarius_uri: URL of Aquarius (metadata cache), ocean.py default if None
+        provider_uris: URLs of Ocean providers, first one is used as default
+        rpc_url: URL of RPC node, brownie network default if None
+        block_time: average block time in seconds
+        poll_interval: delay in seconds between compute job status checks
+        gas_speed: speed of gas strategy ("slow", "standard", "fast"), brownie
+            default fees are used if None
+        gas_max_fee_gwei: cap of max fee per gas in gwei
+        gas_stuck_after: seconds after which pending transaction is replaced
+        approve_ahead: number of orders for which allowance is approved at once
+        limits: scheduler limits (`Limits` fields) by host (host:port of provider),
+            "rpc" is host of RPC node and "transactions" are transactions of the
+            chain, e.g.
+            {"rpc": {"concurrency": 8, "rate": 20}, "transactions": {"rate": 1}}
+    """
+
+    network_name: str
+    subgraph_url: str
+    aquarius_uri: Optional[str] = None
+    provider_uris: List[str] = field(default_factory=list)
+    rpc_url: Optional[str] = None
+    block_time: float = 2.0
+    poll_interval: float = 5.0
+    gas_speed: Optional[str] = None
+    gas_max_fee_gwei: Optional[float] = None
+    gas_stuck_after: float = 120.0
+    approve_ahead: int = 1
+    limits: Dict[str, dict] = field(default_factory=dict)
+
+
+# Dictonary mapping chainId to chain configuration
+CHAINS: Dict[int, ChainConfig] = {
+    80001: ChainConfig(
+        network_name="polygon-test",
+        subgraph_url="https://v4.subgraph.mumbai.oceanprotocol.com",
+        aquarius_uri="https://v4.aquarius.oceanprotocol.com",
+        provider_uris=["https://v4.provider.mumbai.oceanprotocol.com"],
+        block_time=2.0,
+        poll_interval=5.0,
+    ),
+}
+
+# Already created Ocean objects by chainId
+_OCEANS: Dict[int, Ocean] = {}
+
+
+def load_chains(path: str) -> None:
+    """Load chain configurations from JSON file and add them to the registry.
+
+    File should contain object mapping chainId to ChainConfig fields, e.g.:
+    {"80001": {"network_name": "polygon-test", "subgraph_url": "https://..."}}
+
+    Args:
+        path: path to JSON file
+    """
+    with open(path) as f:
+        chains = json.load(f)
+
+    for chain_id, chain in chains.items():
+        CHAINS[int(chain_id)] = ChainConfig(**chain)
+        _OCEANS.pop(int(chain_id), None)
+
+
+def get_chain(chain_id: int) -> ChainConfig:
+    """Get configuration of chain with given chainId."""
+    if chain_id not in CHAINS:
+        raise Exception(f"Chain with id {chain_id} is not supported.")
+    return CHAINS[chain_id]
+
+
+def _connect(chain: ChainConfig) -> None:
+    """Connect brownie to network of the chain (only one network per process)."""
+    active = network.show_active()
+    if active is None:
+        network.connect(chain.network_name)
+        if chain.rpc_url:
+            # Brownie's supported way of using another node of connected network
+            web3.connect(chain.rpc_url)
+    elif active != chain.network_name:
+        raise Exception(
+            f"Already connected to network {active}, brownie supports only one "
+            f"active network, so only one chain can be used per process."
+        )
+
+
+def _configure_limits(chain_id: int, chain: ChainConfig) -> None:
+    """Set scheduler limits of hosts used by the chain."""
+    aliases = {
+        "rpc": Scheduler.host(endpoint_uri(web3.provider)),
+        "transactions": f"chain:{chain_id}",
+    }
+    for host, limits in chain.limits.items():
+        get_scheduler().configure(aliases.get(host, host), Limits(**limits))
 
 
 def get_ocean(chain_id: int):
     """Create Ocean object extend config object with extra fields.
+    Ocean object is cached, but only one chain can be used per process, because
+    brownie has single active network. Requesting other chain raises exception.
 
     Extra fields added to ocean config:
         chainId (int): chain id used with the ocean
+        SUBGRAPH_URL (str): URL of ocean subgraph
+        BLOCK_TIME (float): average block time in seconds
+        POLL_INTERVAL (float): delay between compute job status checks
+        GAS_SPEED (str): speed of gas strategy or None for brownie defaults
+        GAS_MAX_FEE (int): cap of max fee per gas in wei or None
+        GAS_STUCK_AFTER (float): seconds after which stuck transaction is replaced
+        APPROVE_AHEAD (int): number of orders approved by one approve transaction
 
     Args:
         chainId: id of chain to connect to
     """
-    network_name = NETWORKS[chain_id]
+    chain = get_chain(chain_id)
+    _connect(chain)  # mumbai is "polygon-test"
+
+    if chain_id not in _OCEANS:
+        config = get_config_dict(chain.network_name)
+        config["chainId"] = chain_id
+        config["SUBGRAPH_URL"] = chain.subgraph_url
+        config["BLOCK_TIME"] = chain.block_time
+        config["POLL_INTERVAL"] = chain.poll_interval
+        config["GAS_SPEED"] = chain.gas_speed
+        config["GAS_MAX_FEE"] = (
+            int(chain.gas_max_fee_gwei * 10**9) if chain.gas_max_fee_gwei else None
+        )
+        config["GAS_STUCK_AFTER"] = chain.gas_stuck_after
+        config["APPROVE_AHEAD"] = chain.approve_ahead
+        if chain.aquarius_uri:
+            config["METADATA_CACHE_URI"] = chain.aquarius_uri
+        if chain.provider_uris:
+            config["PROVIDER_URL"] = chain.provider_uris[0]
 
-    connect_to_network(network_name)  # mumbai is "polygon-test"
-    config = get_config_dict(network_name)
-    config["chainId"] = chain_id
+        _OCEANS[chain_id] = Ocean(config)
+        _configure_limits(chain_id, chain)
 
-    return Ocean(config)
+    return _OCEANS[chain_id]
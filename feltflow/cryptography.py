@@ -24,9 +24,9 @@ def encrypt_nacl(data: str, public_key: str) -> str:
     encrypted_message = enc_box.encrypt(data.encode("utf-8"))
     return json.dumps(
         {
-            "nonce": b64encode(encrypted_message.nonce),
-            "ephemPublicKey": b64encode(bytes(emph_key.public_key)),
-            "ciphertext": b64encode(encrypted_message.ciphertext),
+            "nonce": b64encode(encrypted_message.nonce).decode("utf-8"),
+            "ephemPublicKey": b64encode(bytes(emph_key.public_key)).decode("utf-8"),
+            "ciphertext": b64encode(encrypted_message.ciphertext).decode("utf-8"),
         },
         separators=(",", ":"),
     )
@@ -0,0 +1,220 @@
+"""Selection of compute environments based on health of providers."""
+import atexit
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from feltflow.metadata_cache import MetadataCache, get_metadata_cache
+
+# Prior of latencies (seconds) for providers without any observation
+DEFAULT_LATENCY = {"start": 10.0, "status": 1.0}
+
+
+class EnvironmentSelector:
+    """Class scoring compute environments and keeping health of providers.
+
+    Health of each provider (and of its environments) is kept as exponentially
+    weighted moving average of observed latencies (start of compute job, status
+    requests) and failure rate. Statistics are shared across trainings through
+    metadata cache (SQLite). Observations are written in batches (at most once per
+    `save_interval` and at exit) and merged with observations of other processes.
+
+    Score of environment is estimated number of seconds until job is running:
+    latencies of provider and waiting for jobs queued in the environment. Failure
+    rate of provider multiplies the score. Paid environments are used only if
+    allowed and the provider has no suitable free environment.
+    """
+
+    def __init__(
+        self,
+        store: Optional[MetadataCache] = None,
+        persistent: bool = True,
+        alpha: float = 0.3,
+        queue_penalty: float = 60.0,
+        allow_paid: bool = False,
+        save_interval: float = 30.0,
+    ):
+        """
+        Args:
+            store: cache storing health statistics (shared metadata cache by default)
+            persistent: store statistics, False keeps them only in memory
+            alpha: weight of new observation in moving averages
+            queue_penalty: expected waiting time (seconds) per job queued ahead
+            allow_paid: use paid environments if provider has no suitable free one
+            save_interval: minimal delay in seconds between writes of statistics
+        """
+        self.store = (store or get_metadata_cache()) if persistent else None
+        self.alpha = alpha
+        self.queue_penalty = queue_penalty
+        self.allow_paid = allow_paid
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.health: Dict[str, Dict[str, float]] = {}
+        # Observations not yet written to the store [(key, values)]
+        self._pending: List[Tuple[str, Dict[str, float]]] = []
+        self._saved = time.time()
+
+        if self.store:
+            self.health = self.store.entries("health")
+            atexit.register(self.save)
+
+    def _apply(
+        self, stats: Optional[Dict[str, float]], observations: List[Dict[str, float]]
+    ) -> Dict[str, float]:
+        """Add observations into moving averages of statistics."""
+        stats = dict(stats or {})
+        for values in observations:
+            for name, value in values.items():
+                old = stats.get(name)
+                stats[name] = value if old is None else old + self.alpha * (value - old)
+        return stats
+
+    def save(self) -> None:
+        """Merge observations of this process into stored statistics."""
+        if not self.store or not self._save_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._saved = time.time()
+
+            observations = defaultdict(list)
+            for key, values in pending:
+                observations[key].append(values)
+            merged = self.store.update(
+                "health",
+                {
+                    k: partial(self._apply, observations=v)
+                    for k, v in observations.items()
+                },
+            )
+
+            with self._lock:
+                # Observations made during the write are applied on top
+                for key, stats in merged.items():
+                    new = [values for k, values in self._pending if k == key]
+                    self.health[key] = self._apply(stats, new)
+        finally:
+            self._save_lock.release()
+
+    @staticmethod
+    def _key(provider: str, environment_id: Optional[str]) -> str:
+        return provider if environment_id is None else f"{provider}|{environment_id}"
+
+    def _update(self, keys: List[str], values: Dict[str, float]) -> None:
+        with self._lock:
+            for key in keys:
+                self.health[key] = self._apply(self.health.get(key), [values])
+                if self.store:
+                    self._pending.append((key, values))
+            due = time.time() - self._saved >= self.save_interval
+        if due:
+            self.save()
+
+    def _keys(self, provider: str, environment_id: Optional[str]) -> List[str]:
+        keys = [provider]
+        if environment_id is not None:
+            keys.append(self._key(provider, environment_id))
+        return keys
+
+    def record_latency(
+        self,
+        provider: str,
+        kind: str,
+        seconds: float,
+        environment_id: Optional[str] = None,
+    ) -> None:
+        """Record observed latency of successful provider request.
+
+        Args:
+            provider: service endpoint of the provider
+            kind: type of request ("start" or "status")
+            seconds: duration of the request
+            environment_id: environment used by the request (if any)
+        """
+        self._update(
+            self._keys(provider, environment_id), {kind: seconds, "failures": 0.0}
+        )
+
+    def record_failure(
+        self, provider: str, environment_id: Optional[str] = None
+    ) -> None:
+        """Record failed request of provider."""
+        self._update(self._keys(provider, environment_id), {"failures": 1.0})
+
+    @staticmethod
+    def _paid(environment: dict) -> bool:
+        return float(environment.get("priceMin", 0)) > 0
+
+    def score(
+        self, provider: str, environment: dict, min_duration: float = 0
+    ) -> Optional[float]:
+        """Score environment of provider, lower is better.
+
+        Args:
+            provider: service endpoint of the provider
+            environment: environment description returned by provider
+            min_duration: minimal required job duration in seconds
+
+        Returns:
+            estimated seconds until job is running or None if environment isn't
+            suitable (short job duration, missing consumer address, paid environment
+            which isn't allowed)
+        """
+        if float(environment.get("maxJobDuration", 0)) < min_duration:
+            return None
+        if not environment.get("consumerAddress"):
+            return None
+        if self._paid(environment) and not self.allow_paid:
+            return None
+
+        # Statistics of environment fall back to statistics of whole provider
+        stats = {
+            **self.health.get(provider, {}),
+            **self.health.get(self._key(provider, environment.get("id")), {}),
+        }
+        score = stats.get("start", DEFAULT_LATENCY["start"])
+        score += stats.get("status", DEFAULT_LATENCY["status"])
+
+        # Number of jobs which have to finish before the job can start
+        if "maxJobs" in environment:
+            queued = environment.get("currentJobs", 0) - environment["maxJobs"] + 1
+            score += max(0, queued) * self.queue_penalty
+
+        return score * (1 + stats.get("failures", 0.0))
+
+    def select(
+        self, provider: str, environments: List[dict], min_duration: float = 0
+    ) -> dict:
+        """Select the best suitable environment of provider.
+
+        Free environments always have priority, paid environment (if allowed) is
+        selected only when there is no suitable free one.
+
+        Args:
+            provider: service endpoint of the provider
+            environments: environments returned by provider
+            min_duration: minimal required job duration in seconds
+        """
+        scored = [
+            (self._paid(env), score, i)
+            for i, env in enumerate(environments)
+            if (score := self.score(provider, env, min_duration)) is not None
+        ]
+        if not scored:
+            raise Exception(f"No suitable compute environment at {provider}")
+        return environments[min(scored)[2]]
+
+
+_SELECTOR: Optional[EnvironmentSelector] = None
+
+
+def get_selector() -> EnvironmentSelector:
+    """Get environment selector shared by the whole process."""
+    global _SELECTOR
+    if _SELECTOR is None:
+        _SELECTOR = EnvironmentSelector()
+    return _SELECTOR
@@ -1,16 +1,28 @@
 import json
-import os
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from brownie.network.account import LocalAccount
 from ocean_lib.ocean.ocean import Ocean
 
+from feltflow.artifact_store import ArtifactStore
+from feltflow.backends.base import ComputeBackend
+from feltflow.backends.ocean_c2d import OceanBackend
 from feltflow.cloud_storage import CloudStorage
-from feltflow.comput_job import ComputeJob
+from feltflow.compression import ModelCompressor
+from feltflow.comput_job import MAX_WORKERS, ComputeJob, JobRecord
 from feltflow.cryptography import encrypt_nacl
+from feltflow.job_status import check_statuses
+from feltflow.journal import RunJournal
+from feltflow.metrics import MODEL_BYTES, ROUND_MODEL_BYTES
 from feltflow.ocean.data_service_provider import CustomDataServiceProvider
+from feltflow.outputs import check_envelope
+from feltflow.profiling import profiled
+from feltflow.scheduler import PRIORITY_AGGREGATION
+from feltflow.seeds import SeedStream
 
 
 class FederatedTraining:
@@ -25,8 +37,35 @@ class FederatedTraining:
         dataset_dids: List[str],
         algorithm_config: Dict[str, Any],
         algocustomdata: dict,
+        artifact_store: Optional[ArtifactStore] = None,
+        journal: Optional[RunJournal] = None,
+        history_size: int = 10,
+        backend: Optional[ComputeBackend] = None,
+        compression: Optional[ModelCompressor] = None,
+        seed: Optional[int] = None,
+        aggregation_fan_out: Optional[int] = None,
     ):
+        """
+        Args:
+            history_size: number of rounds kept in memory (iterations_data), older
+                rounds are available only in the journal
+            backend: compute backend used for running jobs (Ocean C2D by default)
+            compression: compressor of model weights sent to local trainings and
+                returned by them, delta compression requires artifact store for
+                passing base model
+            seed: entropy of seeds of local trainings (random if not provided),
+                same seed reproduces seeds of all rounds and clients
+            aggregation_fan_out: maximal number of models aggregated by one job,
+                more local trainings are aggregated hierarchically (in groups)
+        """
         assert len(dataset_dids) >= 1, "No datasets provided for training"
+        assert history_size >= 1, "History must keep at least one round"
+        assert (
+            aggregation_fan_out is None or aggregation_fan_out >= 2
+        ), "Aggregation fan-out must be at least 2"
+        assert not (
+            compression and compression.delta and artifact_store is None
+        ), "Delta compression requires artifact store"
 
         self.ocean = ocean
         self.storage = storage
@@ -35,22 +74,60 @@ class FederatedTraining:
         self.dataset_dids = dataset_dids
         self.algorithm_config = algorithm_config
         self.name = name
+        self.artifact_store = artifact_store
+        self.journal = journal
+        self.backend = backend or OceanBackend(ocean)
+        self.compression = compression
+        self.compression_stats: Optional[Dict[str, int]] = None
+        self.aggregation_fan_out = aggregation_fan_out
+        # Schema of model outputs declared by the algorithm (subset of JSON schema)
+        self.model_schema: Optional[dict] = algorithm_config.get("modelSchema")
+        self.poll_interval = ocean.config.get("POLL_INTERVAL", 5) if ocean else 1
         self.type = "solo" if len(dataset_dids) == 1 else "multi"
         self.nonce = None
+        self.seed_stream = SeedStream(seed)
+        # Number of started rounds (over all calls of run)
+        self.round = 0
+        # Total duration of local training stages of all finished rounds
+        self.training_duration = 0.0
+
+        # Compact records of finished rounds, only job of last round is kept alive
+        self.history_size = history_size
+        self.iterations_data = deque(maxlen=history_size)
+        self.final_job: Optional[ComputeJob] = None
+        if self.compression and "weights" in self.algocustomdata:
+            self.compression.verify(self.algocustomdata["weights"])
+        self._validate_assets()
+
+    def _validate_assets(self) -> None:
+        """Check compatibility of datasets and algorithms of all jobs in parallel.
+
+        Validation results are cached by backend and reused by jobs of first round.
+        """
+        assets = self.algorithm_config["assets"]
+        # Metadata of all assets is loaded at once (cached on disk across runs)
+        self.backend.preload(
+            self.dataset_dids
+            + [assets["training"], assets["aggregation"], assets["emptyDataset"]]
+        )
+
+        checks = [([did], assets["training"]) for did in self.dataset_dids]
+        if self.type == "multi":
+            checks.append(([assets["emptyDataset"]], assets["aggregation"]))
 
-        self.iterations_data = []
-        # Run this just to test compatibility of data and algorithms:
-        self._local_jobs(self.algocustomdata)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            list(executor.map(lambda check: self.backend.validate(*check), checks))
 
+    @profiled("latest_model")
     def latest_model(self, account: LocalAccount) -> Dict[str, Any]:
         """Get the latest model from aggregation or return initial model.
 
         Args:
             account: account of user who started the training
         """
-        if self.iterations_data:
-            data = self.iterations_data[-1]["final_job"].get_file("model", account)
-            model = json.loads(data.decode("utf-8"))
+        if self.final_job is not None:
+            ComputeJob.prefetch_files([self.final_job], ["model"], account)
+            model = dict(self.final_job.get_json("model", account, self.model_schema))
             if self.type == "multi":
                 model["seeds"] = self.iterations_data[-1]["seeds"]
             return model
@@ -58,32 +135,158 @@ class FederatedTraining:
         return self.algocustomdata
 
     def run_aggregation(
-        self, round: str, local_trainings: List[ComputeJob], account: LocalAccount
+        self,
+        round: str,
+        local_trainings: List[ComputeJob],
+        account: LocalAccount,
+        sample_sizes: Optional[List[int]] = None,
     ) -> ComputeJob:
         """Run aggregation of provided local trainings.
 
         Args:
             local_trainings: list of local trainings to be aggregated
             account: account used for aggregation
+            sample_sizes: number of samples behind each model (weights of models)
 
         Returns:
             new compute job of the aggregation
         """
-        # Nonce trick - urls have higher nonce that compute job start
-        nonce = CustomDataServiceProvider.get_nonce()
-        url_nonce = str(nonce + 1000)
-
-        urls = [c.get_file_url("model", account, url_nonce) for c in local_trainings]
-        aggregation_data = {"model_urls": urls}
+        # Verify that all models are available and valid before paying for aggregation
+        ComputeJob.prefetch_files(local_trainings, ["model"], account)
+        self._check_models(local_trainings, account)
 
         # Create aggregation job and start aggregation
         aggregation = ComputeJob(
             self.ocean,
             [self.algorithm_config["assets"]["emptyDataset"]],
             self.algorithm_config["assets"]["aggregation"],
-            aggregation_data,
+            {},
+            self.backend,
+            priority=PRIORITY_AGGREGATION,
+            owner=self,
         )
-        job_info, auth_token = aggregation.start(account, str(nonce))
+        self._start_aggregation(
+            round, aggregation, local_trainings, account, sample_sizes
+        )
+        return aggregation
+
+    def _check_models(self, jobs: List[ComputeJob], account: LocalAccount) -> None:
+        """Check downloaded models, fully parsed only if algorithm declares schema."""
+        for job in jobs:
+            try:
+                if self.model_schema:
+                    job.get_json("model", account, self.model_schema)
+                else:
+                    check_envelope(job.get_file("model", account))
+            except Exception as e:
+                raise Exception(f"Invalid model of job {job.job_id}: {e}")
+
+    def _aggregate(
+        self, round: str, trainings: List[ComputeJob], account: LocalAccount
+    ) -> Tuple[ComputeJob, List[ComputeJob]]:
+        """Aggregate local trainings and wait for the final aggregation.
+
+        If there are more trainings than aggregation fan-out, they are split into
+        groups aggregated concurrently, results of groups are aggregated again
+        (until one aggregation remains). Sample sizes of local models are passed
+        to every aggregation ("sample_sizes"), group results are weighted by
+        total samples of the group, so the result equals flat FedAvg.
+
+        Returns:
+            final aggregation and list of group aggregations
+        """
+        level, sizes = trainings, None
+        all_groups: List[ComputeJob] = []
+        fan_out = self.aggregation_fan_out
+        if fan_out and len(trainings) > fan_out:
+            sizes = self._sample_sizes(trainings, account)
+
+        while fan_out and len(level) > fan_out:
+            starts = range(0, len(level), fan_out)
+            groups = [level[i : i + fan_out] for i in starts]
+            group_sizes = [sizes[i : i + fan_out] for i in starts]
+
+            def aggregate_group(index: int) -> ComputeJob:
+                return self.run_aggregation(
+                    round, groups[index], account, group_sizes[index]
+                )
+
+            def restart_group(job: ComputeJob) -> None:
+                index = aggregations.index(job)
+                self._start_aggregation(
+                    round, job, groups[index], account, group_sizes[index]
+                )
+
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                aggregations = list(executor.map(aggregate_group, range(len(groups))))
+            self._wait_for_compute(aggregations, account, restart_group)
+
+            all_groups.extend(aggregations)
+            level = aggregations
+            sizes = [sum(g) for g in group_sizes]
+
+        aggregation = self.run_aggregation(round, level, account, sizes)
+        self._wait_for_compute(
+            [aggregation],
+            account,
+            lambda job: self._start_aggregation(round, job, level, account, sizes),
+        )
+        return aggregation, all_groups
+
+    def _sample_sizes(
+        self, trainings: List[ComputeJob], account: LocalAccount
+    ) -> List[int]:
+        """Read sample size of local models, groups can't be weighted without it."""
+        ComputeJob.prefetch_files(trainings, ["model"], account)
+        sizes = [
+            job.get_json("model", account, self.model_schema).get("sample_size")
+            for job in trainings
+        ]
+        if None in sizes:
+            raise Exception(
+                "Hierarchical aggregation requires sample_size in local models, "
+                "without it the result differs from flat aggregation"
+            )
+        return sizes
+
+    def _start_aggregation(
+        self,
+        round: str,
+        aggregation: ComputeJob,
+        local_trainings: List[ComputeJob],
+        account: LocalAccount,
+        sample_sizes: Optional[List[int]] = None,
+    ) -> None:
+        """Start (or resubmit failed) aggregation with newly signed model URLs."""
+        while True:
+            # Nonce trick - urls have higher nonce that compute job start
+            nonce = CustomDataServiceProvider.get_nonce()
+            url_nonce = str(CustomDataServiceProvider.get_nonce(ahead=1000))
+
+            urls = ComputeJob.get_file_urls(
+                local_trainings, ["model"], account, url_nonce
+            )
+            # Models are already downloaded, hashes are computed from cached content
+            hashes = ComputeJob.prefetch_files(local_trainings, ["model"], account)
+            aggregation.algocustomdata = {
+                "model_urls": [u["model"] for u in urls],
+                "model_hashes": [h["model"] for h in hashes],
+            }
+            if sample_sizes:
+                aggregation.algocustomdata["sample_sizes"] = sample_sizes
+
+            try:
+                if aggregation.state == "failed":
+                    job_info, auth_token = aggregation.retry(account, str(nonce))
+                else:
+                    job_info, auth_token = aggregation.start(account, str(nonce))
+                break
+            except Exception as e:
+                if not aggregation.can_retry():
+                    raise
+                delay = aggregation.retry_delay()
+                print(f"Start of aggregation failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
 
         # Store job in FELT cloud
         self.storage.add_aggregation(
@@ -93,7 +296,19 @@ class FederatedTraining:
             job_info,
         )
 
-        return aggregation
+    def _start_local_training(
+        self, round: str, compute: ComputeJob, account: LocalAccount
+    ) -> None:
+        """Start (or resubmit failed) local training and store it in FELT cloud."""
+        job_info, auth_token = compute.start_with_retry(account)
+        self.storage.add_local_training(
+            round,
+            compute.algocustomdata["seed"],
+            encrypt_nacl(auth_token, self.public_key),
+            compute.did,
+            job_info,
+            self._seed_key(self.dataset_dids.index(compute.did)),
+        )
 
     def run(self, account: LocalAccount, iterations: int = 1) -> None:
         """Run the federated training for specified number of iterations.
@@ -102,86 +317,236 @@ class FederatedTraining:
             account: account used for starting the compute jobs
             iterations: number of iterations to be executed
         """
+        if self.journal is None and self.round + iterations > self.history_size:
+            print(
+                f"WARNING: Only last {self.history_size} rounds are kept without "
+                f"journal, records of older rounds will be dropped."
+            )
+
         # Init job in FELT storage
         self.storage.create_job()
+        if self.journal:
+            self.journal.append("seeds", {"entropy": str(self.seed_stream.entropy)})
 
-        for iter in range(iterations):
+        for _ in range(iterations):
+            round_bytes = self._model_bytes()
+            self.backend.start_round()
             # Get latest algocustomdata (model)
             trainings, seeds = self._local_jobs(self.latest_model(account))
-            iteration = {
-                "training": trainings,
-                "seeds": seeds,
-                "aggregation": None,
-                "final_job": None,
-            }
-            self.iterations_data.append(iteration)
 
             # Start local training
-            for compute, seed in zip(trainings, seeds):
-                job_info, auth_token = compute.start(account)
-                # Store job in FELT cloud
-                self.storage.add_local_training(
-                    str(iter),
-                    seed,
-                    encrypt_nacl(auth_token, self.public_key),
-                    compute.did,
-                    job_info,
-                )
-
-            # Wait for local training finish
-            self._wait_for_compute(trainings, account)
+            for compute in trainings:
+                self._start_local_training(str(self.round), compute, account)
+
+            # Wait for local training finish, failed trainings are resubmitted
+            self._wait_for_compute(
+                trainings,
+                account,
+                lambda job: self._start_local_training(str(self.round), job, account),
+            )
 
+            aggregation, groups = None, []
             if self.type == "multi":
-                # Aggregation job and start aggregation
-                iteration["aggregation"] = self.run_aggregation(
-                    str(iter), trainings, account
+                # Run aggregation (of groups if needed) and wait for it to finish
+                aggregation, groups = self._aggregate(
+                    str(self.round), trainings, account
                 )
-                # Wait for aggregation to finish
-                self._wait_for_compute([iteration["aggregation"]], account)
-                iteration["final_job"] = iteration["aggregation"]
+                self.final_job = aggregation
             else:
-                iteration["final_job"] = iteration["training"][0]
+                self.final_job = trainings[0]
+
+            self._add_iteration(self.round, trainings, seeds, aggregation, groups)
+            ROUND_MODEL_BYTES.observe(self._model_bytes() - round_bytes)
+            self.round += 1
 
             print("Finished with outputs:")
-            print(iteration["final_job"].get_outputs())
+            print(self.final_job.get_outputs())
             print("Model data:\n", self.latest_model(account))
 
+    def _add_iteration(
+        self,
+        round: int,
+        trainings: List[ComputeJob],
+        seeds: List[int],
+        aggregation: Optional[ComputeJob],
+        groups: Optional[List[ComputeJob]] = None,
+    ) -> None:
+        """Store compact records of finished round into history and journal."""
+        groups = groups or []
+        iteration = {
+            "round": round,
+            "training": [JobRecord.from_job(c) for c in trainings],
+            "seeds": seeds,
+            "aggregation": JobRecord.from_job(aggregation) if aggregation else None,
+            "aggregation_groups": [JobRecord.from_job(g) for g in groups],
+            "compression": self.compression_stats,
+        }
+        iteration["final_job"] = iteration["aggregation"] or iteration["training"][0]
+        self.iterations_data.append(iteration)
+        records = iteration["training"]
+        self.training_duration += max(r.finished_at for r in records) - min(
+            r.started_at for r in records
+        )
+
+        if self.journal:
+            self.journal.append(
+                "round",
+                {
+                    "round": round,
+                    "training": [r.to_dict() for r in iteration["training"]],
+                    "seeds": seeds,
+                    "aggregation": (
+                        iteration["aggregation"].to_dict()
+                        if iteration["aggregation"]
+                        else None
+                    ),
+                    "aggregation_groups": [
+                        r.to_dict() for r in iteration["aggregation_groups"]
+                    ],
+                    "compression": self.compression_stats,
+                },
+            )
+
+    def _model_payload(self, model: dict) -> dict:
+        """Create algocustomdata passing the model to local trainings.
+
+        If artifact store is set, the model is stored only once and jobs reference
+        it by URL and hash (same way as aggregation gets model_urls).
+
+        If compression is set, model weights are replaced by compressed update
+        ("weights_update", against "base_model" artifact in delta mode), which can
+        be decoded by `feltflow.compression.decode_model`. Local trainings of
+        multi training are asked to return their models compressed to same dtype
+        ("compress_output", see `feltflow.compression.encode_model`).
+
+        Args:
+            model: model definition used for local training
+        """
+        if self.compression and "weights" in model:
+            model = self._compress_model(model)
+
+        if self.artifact_store:
+            # Artifact store counts bytes it actually uploads
+            artifact = self.artifact_store.put_json(model)
+            return {
+                "model_url": {"url": artifact["url"], "headers": {}},
+                "model_hash": artifact["hash"],
+            }
+
+        # Model is sent inline to every local training
+        size = len(json.dumps(model, separators=(",", ":"))) * len(self.dataset_dids)
+        MODEL_BYTES.inc(size, direction="upload")
+        return model
+
+    def _compress_model(self, model: dict) -> dict:
+        """Replace model weights by compressed update and record bytes saved."""
+        base = self.compression.base_payload()
+        update, stats = self.compression.compress(model["weights"])
+
+        model = {k: v for k, v in model.items() if k != "weights"}
+        model["weights_update"] = update
+        if base is not None:
+            artifact = self.artifact_store.put_json(base)
+            model["base_model"] = {
+                "url": {"url": artifact["url"], "headers": {}},
+                "hash": artifact["hash"],
+            }
+
+        # Models returned for aggregation are quantized by the trainings
+        if self.type == "multi":
+            model["compress_output"] = {"dtype": self.compression.dtype}
+
+        # Update and base model are downloaded by every local training, savings
+        # are compared with model quantized to same dtype (without delta)
+        n_jobs = len(self.dataset_dids)
+        sent = stats["compressed_bytes"] + stats["base_bytes"]
+        self.compression_stats = {
+            "raw_bytes": stats["raw_bytes"] * n_jobs,
+            "baseline_bytes": stats["baseline_bytes"] * n_jobs,
+            "compressed_bytes": sent * n_jobs,
+            "saved_bytes": (stats["baseline_bytes"] - sent) * n_jobs,
+        }
+        print("Compression:", self.compression_stats)
+        return model
+
+    @staticmethod
+    def _model_bytes() -> float:
+        """Total bytes of model data moved (uploaded and downloaded) so far."""
+        return MODEL_BYTES.value(direction="upload") + MODEL_BYTES.value(
+            direction="download"
+        )
+
     def _local_jobs(self, algocustomdata: dict) -> Tuple[List[ComputeJob], List[int]]:
         """Initialize local training jobs for each dataset.
 
         Args:
             algocustomdata: model definition used for local training
         """
-        seeds = [self._get_seed() for _ in self.dataset_dids]
+        algocustomdata = self._model_payload(algocustomdata)
+
+        seeds = self._get_seeds()
         jobs = []
         for did, seed in zip(self.dataset_dids, seeds):
-            algocustomdata["seed"] = seed
             jobs.append(
                 ComputeJob(
                     self.ocean,
                     [did],
                     self.algorithm_config["assets"]["training"],
-                    algocustomdata,
+                    {**algocustomdata, "seed": seed},
+                    self.backend,
+                    owner=self,
                 )
             )
         return jobs, seeds
 
-    def _wait_for_compute(self, compute_jobs: List[ComputeJob], account: LocalAccount):
-        """Wait for all compute jobs to finish."""
+    def _wait_for_compute(
+        self,
+        compute_jobs: List[ComputeJob],
+        account: LocalAccount,
+        restart: Callable[[ComputeJob], None],
+    ):
+        """Wait for all compute jobs to finish.
+
+        Failed jobs are resubmitted (using `restart`) after backoff delay, unless
+        they failed because of the algorithm or run out of retries.
+        """
+        retry_at: Dict[int, float] = {}
         while True:
-            stats = [c.check_status(account) for c in compute_jobs]
+            stats = check_statuses(compute_jobs, account)
             print("Stats", stats)
 
-            if any(map(lambda x: x == "failed", stats)):
-                raise Exception(f"Some compute job failed: {stats}")
+            for job in compute_jobs:
+                if job.state != "failed":
+                    continue
+
+                if id(job) not in retry_at:
+                    failure = job.classify_failure()
+                    if not job.can_retry():
+                        raise Exception(
+                            f"Compute job {job.job_id} failed ({failure}): {stats}"
+                        )
+                    retry_at[id(job)] = time.time() + job.retry_delay()
+                    print(f"Compute job {job.job_id} failed ({failure}), resubmitting")
+                elif time.time() >= retry_at[id(job)]:
+                    del retry_at[id(job)]
+                    restart(job)
 
             if all(map(lambda x: x == "finished", stats)):
                 break
 
-            time.sleep(5)
+            time.sleep(self.poll_interval)
 
     def _timestamp(self):
         return int(datetime.now().timestamp() * 1000)
 
-    def _get_seed(self) -> int:
-        return int.from_bytes(os.urandom(1), "big") if self.type == "multi" else 0
+    def _get_seeds(self) -> List[int]:
+        """Get seeds of local trainings in current round."""
+        if self.type == "solo":
+            return [0]
+        return self.seed_stream.seeds(self.round, len(self.dataset_dids))
+
+    def _seed_key(self, client: int) -> Optional[dict]:
+        """Description of client's seed in current round (None for solo training)."""
+        if self.type == "solo":
+            return None
+        return self.seed_stream.key(self.round, client)
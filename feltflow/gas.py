@@ -0,0 +1,171 @@
+"""Gas price strategy (EIP-1559 fees) and replacement of stuck transactions."""
+import time
+from statistics import median
+from typing import Any, Callable, Dict, Optional
+
+from brownie import web3
+from ocean_lib.ocean.ocean import Ocean
+from web3.exceptions import TransactionNotFound
+
+from feltflow.metrics import TRANSACTIONS, record_transaction
+from feltflow.rpc import get_reader
+
+# Percentile of priority fees paid in recent blocks by speed of the strategy
+SPEEDS = {"slow": 25, "standard": 50, "fast": 90}
+
+
+class GasStrategy:
+    """Strategy estimating fees from recent blocks and speeding up stuck transactions.
+
+    Max priority fee is percentile (by speed) of priority fees in recent blocks,
+    max fee covers base fee doubling. Chains without EIP-1559 use legacy gas price.
+    Transactions pending longer than `stuck_after` seconds are replaced by same
+    transaction with fees multiplied by `increment` (replace-by-fee).
+    """
+
+    def __init__(
+        self,
+        speed: str = "standard",
+        blocks: int = 10,
+        max_fee: Optional[int] = None,
+        stuck_after: float = 120.0,
+        increment: float = 1.125,
+        max_replacements: int = 3,
+    ):
+        """
+        Args:
+            speed: "slow", "standard" or "fast"
+            blocks: number of recent blocks used for estimation
+            max_fee: cap of max fee per gas in wei (None for no cap)
+            stuck_after: seconds after which pending transaction is replaced
+            increment: multiplier of fees of replacement transaction (at least 1.1)
+            max_replacements: maximal number of replacements of one transaction
+        """
+        assert speed in SPEEDS, f"Unknown gas speed {speed}, use one of {list(SPEEDS)}"
+        assert increment >= 1.1, "Replacement fees must be at least 10% higher"
+        self.speed = speed
+        self.blocks = blocks
+        self.max_fee = max_fee
+        self.stuck_after = stuck_after
+        self.increment = increment
+        self.max_replacements = max_replacements
+
+    def fees(self, ocean: Ocean) -> Dict[str, int]:
+        """Get fee parameters of transaction (max_fee and priority_fee or gas_price)."""
+        reader = get_reader(ocean)
+        try:
+            history = reader.fee_history(self.blocks, SPEEDS[self.speed])
+        except Exception:
+            history = {}
+
+        base_fees = [int(fee, 16) for fee in history.get("baseFeePerGas", [])]
+        if not base_fees or not any(base_fees):
+            # Chain doesn't support EIP-1559
+            return {"gas_price": reader.gas_price()}
+
+        rewards = [int(r[0], 16) for r in history.get("reward", []) if r]
+        priority_fee = int(median(rewards)) if rewards else 0
+        # Last base fee is the base fee of the next block
+        max_fee = 2 * base_fees[-1] + priority_fee
+        if self.max_fee:
+            max_fee = min(max_fee, self.max_fee)
+            priority_fee = min(priority_fee, max_fee)
+        return {"max_fee": max_fee, "priority_fee": priority_fee}
+
+    def confirm(self, tx: Any) -> Any:
+        """Wait for confirmation of transaction sent with required_confs=0.
+
+        Transaction is replaced at most `max_replacements` times, exception is
+        raised if the last replacement isn't confirmed within `stuck_after`.
+
+        Returns:
+            receipt of confirmed transaction (replacement if it was replaced)
+        """
+        replacements = 0
+        deadline = time.time() + self.stuck_after
+        while tx.status == -1:
+            if time.time() >= deadline:
+                if replacements >= self.max_replacements:
+                    raise Exception(
+                        f"Transaction {tx.txid} wasn't confirmed after "
+                        f"{replacements} replacements"
+                    )
+                tx = self._replace(tx)
+                replacements += 1
+                deadline = time.time() + self.stuck_after
+            time.sleep(1)
+
+        if tx.status != 1:
+            raise Exception(f"Transaction {tx.txid} failed (status {tx.status})")
+        return tx
+
+    def _replace(self, tx: Any) -> Any:
+        """Replace transaction with higher fee, return original one if it's mined."""
+        print(f"Transaction {tx.txid} is stuck, replacing it with higher fee")
+        try:
+            replacement = tx.replace(increment=self.increment)
+        except Exception as e:
+            # Transaction could be mined in the meantime (nonce is already used)
+            try:
+                web3.eth.get_transaction_receipt(tx.txid)
+            except TransactionNotFound:
+                raise e
+            tx.wait(1)
+            return tx
+
+        TRANSACTIONS.inc(type="replacement")
+        return replacement
+
+
+# Strategies by chainId (None if chain uses brownie defaults)
+_STRATEGIES: Dict[int, Optional[GasStrategy]] = {}
+
+
+def get_gas_strategy(ocean: Ocean) -> Optional[GasStrategy]:
+    """Get gas strategy configured for chain of the ocean (GAS_* config fields)."""
+    chain_id = ocean.config_dict["chainId"]
+    if chain_id not in _STRATEGIES:
+        config = ocean.config_dict
+        _STRATEGIES[chain_id] = (
+            GasStrategy(
+                config["GAS_SPEED"],
+                max_fee=config.get("GAS_MAX_FEE"),
+                stuck_after=config.get("GAS_STUCK_AFTER", 120.0),
+            )
+            if config.get("GAS_SPEED")
+            else None
+        )
+    return _STRATEGIES[chain_id]
+
+
+def send_transaction(
+    ocean: Ocean,
+    tx_dict: dict,
+    type: str,
+    send: Callable[[dict], Any],
+    replaceable: bool = False,
+) -> Any:
+    """Send transaction using gas strategy of the chain and record it in metrics.
+
+    Args:
+        ocean: ocean of the chain
+        tx_dict: transaction config, must contain key {"from": account}
+        type: type of transaction (for metrics)
+        send: function sending the transaction with given tx_dict
+        replaceable: send function sends single transaction, so it can be sent
+            without waiting for confirmation and replaced if it gets stuck
+
+    Returns:
+        receipt of confirmed transaction
+    """
+    strategy = get_gas_strategy(ocean)
+    if strategy is None:
+        return record_transaction(send(tx_dict), type)
+
+    tx_dict = {**tx_dict, **strategy.fees(ocean)}
+    if replaceable:
+        tx_dict["required_confs"] = 0
+        tx = strategy.confirm(send(tx_dict))
+    else:
+        tx = send(tx_dict)
+    return record_transaction(tx, type)
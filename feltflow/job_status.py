@@ -0,0 +1,69 @@
+"""Module for checking status of many compute jobs with minimal number of requests."""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from brownie.network.account import LocalAccount
+
+from feltflow.comput_job import MAX_WORKERS, ComputeJob
+from feltflow.metrics import STATUS_POLLS
+
+
+def _group_jobs(
+    jobs: List[ComputeJob], account: LocalAccount
+) -> Dict[Tuple[str, str, str], List[ComputeJob]]:
+    """Group running jobs by backend status group (provider) and consumer account."""
+    groups = defaultdict(list)
+    for job in jobs:
+        key = (
+            type(job.backend).__name__,
+            job.backend.status_group(job),
+            account.address,
+        )
+        groups[key].append(job)
+    return groups
+
+
+def _check_group(jobs: List[ComputeJob], account: LocalAccount) -> None:
+    """Update status of jobs from one provider using single status request.
+
+    Jobs missing in the bulk response (or all jobs if the provider doesn't support
+    bulk status) fall back to checking status one by one.
+    """
+    if len(jobs) == 1:
+        jobs[0].check_status(account)
+        return
+
+    STATUS_POLLS.inc()
+    try:
+        # Bulk request has priority of the most important job
+        with min(jobs, key=lambda job: job.priority).scheduled():
+            job_infos = jobs[0].backend.bulk_status(jobs, account)
+    except Exception as e:
+        print(f"Bulk status request failed ({e}), checking jobs one by one")
+        job_infos = {}
+
+    for job in jobs:
+        if job.job_id in job_infos:
+            job.update_status(job_infos[job.job_id])
+        else:
+            job.check_status(account)
+
+
+def check_statuses(jobs: List[ComputeJob], account: LocalAccount) -> List[str]:
+    """Check status of all compute jobs, using one request per provider.
+
+    Args:
+        jobs: started compute jobs
+        account: account which started the jobs
+
+    Returns:
+        list of job states in same order as jobs
+    """
+    running = [job for job in jobs if job.state not in ["finished", "failed"]]
+    groups = list(_group_jobs(running, account).values())
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(lambda group: _check_group(group, account), groups))
+
+    return [job.state for job in jobs]
@@ -0,0 +1,54 @@
+"""Module for storing history of training runs on local disk."""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+
+class RunJournal:
+    """Append-only journal (JSON lines) of one training run.
+
+    Each line is a single event {"event": ..., "time": ..., **data}. Journal is kept
+    in its own run directory, so other run artifacts can be stored next to it.
+    """
+
+    def __init__(self, run_dir: str):
+        """
+        Args:
+            run_dir: directory of the run, created if it doesn't exist
+        """
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.run_dir / "journal.jsonl"
+        self._lock = threading.Lock()
+
+    def append(self, event: str, data: Dict[str, Any]) -> None:
+        """Append new event to the journal.
+
+        Args:
+            event: type of the event (e.g. "round")
+            data: JSON serializable event data
+        """
+        line = json.dumps(
+            {"event": event, "time": time.time(), **data}, separators=(",", ":")
+        )
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+    def read(self, event: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate over journal events.
+
+        Args:
+            event: return only events of this type, all events if None
+        """
+        if not self.path.exists():
+            return
+
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if event is None or data["event"] == event:
+                    yield data
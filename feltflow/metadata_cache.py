@@ -0,0 +1,232 @@
+"""On-disk cache of almost static metadata (job specs, DDOs, datatoken details)."""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from ocean_lib.aquarius.aquarius import Aquarius
+from ocean_lib.assets.ddo import DDO
+from ocean_lib.ocean.ocean import Ocean
+
+from feltflow.metrics import LATENCY, cache_lookup
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT, key TEXT, value TEXT, version TEXT, checked REAL,
+    PRIMARY KEY (kind, key)
+);
+"""
+
+DEFAULT_PATH = Path.home() / ".cache" / "feltflow" / "metadata.sqlite"
+
+# Fields of DDO which change with every update of the asset
+VERSION_FIELDS = ["metadata.updated", "event.tx", "nft.state"]
+
+
+def _ddo_version(ddo: Dict[str, Any]) -> str:
+    """Version of DDO (dictionary) built from VERSION_FIELDS."""
+    values = []
+    for field in VERSION_FIELDS:
+        value: Any = ddo
+        for name in field.split("."):
+            value = value.get(name) if isinstance(value, dict) else None
+        values.append(str(value))
+    return "|".join(values)
+
+
+class MetadataCache:
+    """Class keeping SQLite cache of metadata shared by processes on the host.
+
+    Entries are revalidated before use: HTTP resources by ETag (If-None-Match),
+    DDOs by their version (updated timestamp, last event and NFT state) fetched
+    for all requested DIDs by single Aquarius query. Entries checked less than
+    `ttl` seconds ago are used without any request.
+    """
+
+    def __init__(self, path: str = str(DEFAULT_PATH), ttl: float = 60.0):
+        """
+        Args:
+            path: path to SQLite database file
+            ttl: seconds for which checked entry is used without revalidation
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Entries keyed by plain URL (could contain launch token) are dropped
+            conn.execute("DELETE FROM entries WHERE kind='job' AND key LIKE 'http%'")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, kind: str, key: str) -> Optional[Tuple[Any, str, float]]:
+        """Get cached entry as tuple (value, version, checked) or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, version, checked FROM entries WHERE kind=? AND key=?",
+                (kind, key),
+            ).fetchone()
+        return (json.loads(row[0]), row[1], row[2]) if row else None
+
+    def put(self, kind: str, key: str, value: Any, version: str = "") -> None:
+        """Store entry, it's marked as checked now."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(value), version, time.time()),
+            )
+
+    def touch(self, kind: str, keys: List[str]) -> None:
+        """Mark entries as checked now (revalidated)."""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE entries SET checked=? WHERE kind=? AND key=?",
+                [(time.time(), kind, key) for key in keys],
+            )
+
+    def entries(self, kind: str) -> Dict[str, Any]:
+        """Get values of all entries of given kind {key: value}."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, value FROM entries WHERE kind=?", (kind,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def update(
+        self, kind: str, updates: Dict[str, Callable[[Optional[Any]], Any]]
+    ) -> Dict[str, Any]:
+        """Update entries in single transaction (safe for concurrent processes).
+
+        Args:
+            kind: kind of the entries
+            updates: function computing new value from current value (None if
+                entry doesn't exist) for each key
+
+        Returns:
+            dictionary with new values {key: value}
+        """
+        values = {}
+        with self._connect() as conn:
+            # Lock database for writing before reading current values
+            conn.execute("BEGIN IMMEDIATE")
+            for key, fn in updates.items():
+                row = conn.execute(
+                    "SELECT value FROM entries WHERE kind=? AND key=?", (kind, key)
+                ).fetchone()
+                values[key] = fn(json.loads(row[0]) if row else None)
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (kind, key, json.dumps(values[key]), "", time.time()),
+                )
+        return values
+
+    def _fresh(self, entry: Optional[Tuple[Any, str, float]]) -> bool:
+        return entry is not None and time.time() - entry[2] < self.ttl
+
+    def fetch_json(self, kind: str, url: str, service: str) -> Any:
+        """GET JSON resource, cached response is always revalidated by its ETag.
+
+        Args:
+            kind: kind of the entry (e.g. "job")
+            url: URL of the resource, its hash is used as the key (URL can contain
+                secrets, e.g. launch token)
+            service: name of the service for latency metrics
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        entry = self.get(kind, key)
+        headers = {"If-None-Match": entry[1]} if entry and entry[1] else {}
+        with LATENCY.time(service=service):
+            res = requests.get(url, headers=headers)
+
+        if res.status_code == 304 and entry:
+            cache_lookup(kind, True)
+            self.touch(kind, [key])
+            return entry[0]
+
+        cache_lookup(kind, False)
+        if not res.ok:
+            raise Exception(f"Request to {service} failed (error: {res.status_code})")
+        value = res.json()
+        if res.headers.get("ETag"):
+            self.put(kind, key, value, res.headers["ETag"])
+        return value
+
+    def resolve_ddos(self, ocean: Ocean, dids: List[str]) -> Dict[str, DDO]:
+        """Resolve DDOs of assets using cached DDOs which weren't updated.
+
+        Versions of cached DDOs are revalidated by one query, DDOs which are
+        missing or outdated are downloaded by another query.
+
+        Returns:
+            dictionary {did: DDO} (assets which can't be resolved are missing)
+        """
+        aquarius = Aquarius.get_instance(ocean.config_dict["METADATA_CACHE_URI"])
+        dids = list(dict.fromkeys(dids))
+        entries = {did: self.get("ddo", did) for did in dids}
+
+        stale = [did for did, e in entries.items() if e and not self._fresh(e)]
+        if stale:
+            with LATENCY.time(service="aquarius"):
+                hits = aquarius.query_search(
+                    {
+                        "query": {"terms": {"_id": stale}},
+                        "_source": ["id"] + VERSION_FIELDS,
+                        "size": len(stale),
+                    }
+                )
+            versions = {
+                hit["_source"]["id"]: _ddo_version(hit["_source"]) for hit in hits
+            }
+            valid = [did for did in stale if versions.get(did) == entries[did][1]]
+            self.touch("ddo", valid)
+            for did in stale:
+                if did not in valid:
+                    entries[did] = None
+
+        missing = [did for did, e in entries.items() if e is None]
+        for did in dids:
+            cache_lookup("ddo", did not in missing)
+
+        if missing:
+            with LATENCY.time(service="aquarius"):
+                hits = aquarius.query_search(
+                    {"query": {"terms": {"_id": missing}}, "size": len(missing)}
+                )
+            for hit in hits:
+                ddo = hit["_source"]
+                self.put("ddo", ddo["id"], ddo, _ddo_version(ddo))
+                entries[ddo["id"]] = (ddo, "", 0)
+
+        return {did: DDO.from_dict(entry[0]) for did, entry in entries.items() if entry}
+
+    def cached(self, kind: str, key: str, ttl: float, fn: Callable[[], Any]) -> Any:
+        """Get value checked less than ttl seconds ago or compute and store it.
+
+        Used for data without revalidation mechanism (e.g. subgraph queries).
+        """
+        entry = self.get(kind, key)
+        fresh = entry is not None and time.time() - entry[2] < ttl
+        cache_lookup(kind, fresh)
+        if fresh:
+            return entry[0]
+
+        value = fn()
+        self.put(kind, key, value)
+        return value
+
+
+_CACHE: Optional[MetadataCache] = None
+
+
+def get_metadata_cache() -> MetadataCache:
+    """Get metadata cache shared by the whole process."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = MetadataCache()
+    return _CACHE
@@ -0,0 +1,251 @@
+"""Prometheus metrics of the process (HTTP endpoint or textfile exporter)."""
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Buckets of latency histograms (seconds)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Buckets of size histograms (bytes)
+SIZE_BUCKETS = tuple(1024 * 4**i for i in range(10))
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metric(ABC):
+    """Base of metrics, values are kept per combination of label values."""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Lines of samples in Prometheus text format."""
+
+    def render(self) -> str:
+        header = (
+            f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        )
+        return header + "".join(f"{s}\n" for s in self.samples())
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {value}"
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    """Value which can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Histogram of observed values (cumulative buckets, sum and count)."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per key: counts of buckets (last one is +Inf), sum of values
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe duration of the code block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(k, list(c), t[0]) for k, (c, t) in self._values.items()]
+
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                labels = _format_labels(self.labels, key, le=le)
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            samples.append(f"{self.name}_sum{labels} {total}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+REGISTRY: List[Metric] = []
+
+JOBS = Counter(
+    "feltflow_jobs_total",
+    "Compute jobs by state (started, failed, finished).",
+    ["state"],
+)
+STATUS_POLLS = Counter(
+    "feltflow_status_polls_total", "Status requests sent to compute backends."
+)
+TRANSACTIONS = Counter(
+    "feltflow_transactions_total", "Transactions sent by type.", ["type"]
+)
+GAS_USED = Counter("feltflow_gas_used_total", "Gas used by sent transactions.")
+LATENCY = Histogram(
+    "feltflow_request_duration_seconds",
+    "Latency of requests to external services (subgraph, provider, felt_api, rpc).",
+    ["service"],
+)
+CACHE_REQUESTS = Counter(
+    "feltflow_cache_requests_total",
+    "Lookups of caches by result (hit, miss).",
+    ["cache", "result"],
+)
+MODEL_BYTES = Counter(
+    "feltflow_model_bytes_total",
+    "Bytes of model data sent to jobs (upload) and downloaded from jobs (download).",
+    ["direction"],
+)
+ROUND_MODEL_BYTES = Histogram(
+    "feltflow_round_model_bytes",
+    "Bytes of model data moved per training round.",
+    buckets=SIZE_BUCKETS,
+)
+SCHEDULER_QUEUE = Gauge(
+    "feltflow_scheduler_queue_depth",
+    "Requests waiting for scheduler slot by host.",
+    ["host"],
+)
+SCHEDULER_WAIT = Histogram(
+    "feltflow_scheduler_wait_seconds",
+    "Time requests waited for scheduler slot (concurrency and rate limit).",
+    ["host"],
+)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Record hit or miss of cache."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_transaction(tx, type: str):
+    """Record sent transaction (receipt) and its gas, returns the receipt."""
+    TRANSACTIONS.inc(type=type)
+    gas_used = getattr(tx, "gas_used", None)
+    if gas_used:
+        GAS_USED.inc(gas_used)
+    return tx
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int, address: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Start HTTP server exposing metrics (in background thread)."""
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_textfile(path: str) -> None:
+    """Write metrics to file (for node exporter textfile collector) atomically."""
+    path = Path(path)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(render())
+    tmp_path.replace(path)
+
+
+def start_textfile_writer(path: str, interval: float = 15.0) -> threading.Event:
+    """Periodically write metrics to file in background thread.
+
+    Returns:
+        event which stops the writer
+    """
+    stop = threading.Event()
+
+    def writer():
+        while not stop.wait(interval):
+            write_textfile(path)
+
+    threading.Thread(target=writer, daemon=True).start()
+    return stop
@@ -1,6 +1,6 @@
+import gzip
 import json
 import logging
-from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 from enforce_typing import enforce_types
@@ -10,17 +10,29 @@ from ocean_lib.data_provider.data_service_provider import DataServiceProvider
 from ocean_lib.models.compute_input import ComputeInput
 from ocean_lib.structures.algorithm_metadata import AlgorithmMetadata
 from ocean_lib.web3_internal.utils import sign_with_key
+from requests import PreparedRequest
 from web3.main import Web3
 
+from feltflow.signing import get_nonce_allocator
+
 logger = logging.getLogger("ocean")
 
+# Payloads smaller than this are sent uncompressed (gzip overhead isn't worth it)
+GZIP_MIN_SIZE = 64 * 1024
+
 
 class CustomDataServiceProvider(DataServiceProvider):
     """Customization of original DataServiceProvider from ocean.py adding custom nonce."""
 
+    # Providers which rejected gzip encoded start payload (by service endpoint)
+    _no_gzip_providers = set()
+    # Providers which don't support status of all jobs at once (by service endpoint)
+    _no_bulk_status_providers = set()
+
     @staticmethod
-    def get_nonce() -> float:
-        return datetime.now().timestamp() * 1000
+    def get_nonce(ahead: int = 0) -> int:
+        """Get unique, increasing nonce (safe to call from parallel threads)."""
+        return get_nonce_allocator().next(ahead)
 
     @staticmethod
     @enforce_types
@@ -72,6 +84,7 @@ class CustomDataServiceProvider(DataServiceProvider):
         algorithm_custom_data: Optional[dict] = None,
         input_datasets: Optional[List[ComputeInput]] = None,
         nonce: Optional[str] = None,
+        compress: bool = False,
     ) -> Dict[str, Any]:
         """
         Start a compute job.
@@ -86,6 +99,7 @@ class CustomDataServiceProvider(DataServiceProvider):
         :param algorithm_meta: AlgorithmMetadata algorithm metadata
         :param algorithm_custom_data: dict customizable algo parameters (ie. no of iterations, etc)
         :param input_datasets: List[ComputeInput] additional input datasets
+        :param compress: bool send large payload gzip encoded if provider accepts it
         :return job_info dict and auth_token string
         """
         assert (
@@ -111,22 +125,24 @@ class CustomDataServiceProvider(DataServiceProvider):
             nonce=nonce,
         )
 
-        logger.info(f"invoke start compute endpoint with this url: {payload}")
         _, compute_endpoint = DataServiceProvider.build_compute_endpoint(
             dataset_compute_service.service_endpoint
         )
-        response = DataServiceProvider._http_method(
-            "post",
+
+        # Payload is serialized only once, it can contain the whole model
+        body = CustomDataServiceProvider._encode_compute_payload(payload)
+        response = CustomDataServiceProvider._post_compute(
             compute_endpoint,
-            data=json.dumps(payload),
-            headers={
-                "content-type": "application/json",
-                "AuthToken": auth_token,
-            },
+            dataset_compute_service.service_endpoint,
+            body,
+            auth_token,
+            compress,
         )
 
         logger.debug(
-            f"got DataProvider execute response: {response.content} with status-code {response.status_code} "
+            "got DataProvider execute response: %s with status-code %s",
+            response.content,
+            response.status_code,
         )
 
         DataServiceProviderBase.check_response(
@@ -145,6 +161,117 @@ class CustomDataServiceProvider(DataServiceProvider):
             logger.error(f"Failed to parse response json: {err}")
             raise
 
+    @staticmethod
+    def compute_jobs_status(service_endpoint: str, consumer) -> List[Dict[str, Any]]:
+        """Get status of all compute jobs of consumer at provider in single request.
+
+        :param service_endpoint: str service endpoint of the provider
+        :param consumer: account of the consumer
+        :return: list of job info dicts, empty if provider doesn't support it
+        """
+        if service_endpoint in CustomDataServiceProvider._no_bulk_status_providers:
+            return []
+
+        _, compute_status_endpoint = DataServiceProvider.build_compute_endpoint(
+            service_endpoint
+        )
+        # Without jobId and documentId, provider signs only address and nonce
+        nonce, signature = CustomDataServiceProvider.sign_message(
+            consumer, f"{consumer.address}"
+        )
+
+        req = PreparedRequest()
+        req.prepare_url(
+            compute_status_endpoint,
+            {
+                "consumerAddress": consumer.address,
+                "nonce": nonce,
+                "signature": signature,
+            },
+        )
+
+        logger.info("invoke compute status endpoint for all jobs: %s", req.url)
+        response = DataServiceProvider._http_method("get", req.url)
+        if response.status_code in [400, 404, 405]:
+            # Older providers require jobId, status is then checked job by job
+            logger.warning(
+                "provider %s doesn't support status of all jobs: %s",
+                service_endpoint,
+                response.text,
+            )
+            CustomDataServiceProvider._no_bulk_status_providers.add(service_endpoint)
+            return []
+        DataServiceProviderBase.check_response(
+            response, "compute Endpoint", req.url, {"consumerAddress": consumer.address}
+        )
+
+        jobs = json.loads(response.content.decode("utf-8"))
+        return jobs if isinstance(jobs, list) else [jobs]
+
+    @staticmethod
+    def _post_compute(
+        compute_endpoint: str,
+        provider_uri: str,
+        body: bytes,
+        auth_token: str,
+        compress: bool,
+    ):
+        """Send start payload, gzip encoded if requested and provider accepts it."""
+        compress = (
+            compress
+            and len(body) >= GZIP_MIN_SIZE
+            and provider_uri not in CustomDataServiceProvider._no_gzip_providers
+        )
+        logger.info(
+            "invoke start compute endpoint %s with payload of %d bytes",
+            compute_endpoint,
+            len(body),
+        )
+        response = CustomDataServiceProvider._post_compute_payload(
+            compute_endpoint, body, auth_token, compress
+        )
+        if compress and CustomDataServiceProvider._gzip_rejected(response):
+            # Provider doesn't understand gzip encoded body, fallback to plain JSON
+            response = CustomDataServiceProvider._post_compute_payload(
+                compute_endpoint, body, auth_token, False
+            )
+            if response.status_code in [200, 201]:
+                CustomDataServiceProvider._no_gzip_providers.add(provider_uri)
+        return response
+
+    @staticmethod
+    def _gzip_rejected(response) -> bool:
+        """Check if provider rejected request because it couldn't decode the body.
+
+        Other errors (e.g. validation of the request) are returned as they are, so
+        the payload isn't uploaded again.
+        """
+        if response.status_code == 415:
+            return True
+        return response.status_code == 400 and "decode" in response.text.lower()
+
+    @staticmethod
+    def _encode_compute_payload(payload: Dict[str, Any]) -> bytes:
+        """Serialize compute payload into compact JSON request body."""
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def _post_compute_payload(
+        compute_endpoint: str, body: bytes, auth_token: str, compress: bool
+    ):
+        """Send pre-encoded payload to start endpoint, optionally gzip encoded."""
+        headers = {
+            "content-type": "application/json",
+            "AuthToken": auth_token,
+        }
+        if compress:
+            body = gzip.compress(body, compresslevel=6)
+            headers["content-encoding"] = "gzip"
+
+        return DataServiceProvider._http_method(
+            "post", compute_endpoint, data=body, headers=headers
+        )
+
     @staticmethod
     # @enforce_types omitted due to subscripted generics error
     def _prepare_compute_payload(
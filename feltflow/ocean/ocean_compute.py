@@ -35,6 +35,7 @@ class CustomOceanCompute(OceanCompute):
         algorithm_algocustomdata: Optional[dict] = None,
         additional_datasets: List[ComputeInput] = [],
         nonce: Optional[str] = None,
+        compress: bool = False,
     ) -> Dict[str, Any]:
         metadata_cache_uri = self._config_dict.get("METADATA_CACHE_URI")
         ddo = Aquarius.get_instance(metadata_cache_uri).get_ddo(dataset.did)
@@ -63,5 +64,6 @@ class CustomOceanCompute(OceanCompute):
             algorithm_custom_data=algorithm_algocustomdata,
             input_datasets=additional_datasets,
             nonce=nonce,
+            compress=compress,
         )
         return job_info, auth_token
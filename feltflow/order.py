@@ -3,11 +3,18 @@ from typing import List, Optional, Tuple, Union
 
 from ocean_lib.data_provider.data_service_provider import DataServiceProvider
 from ocean_lib.models.compute_input import ComputeInput
+from ocean_lib.models.datatoken1 import Datatoken1
+from ocean_lib.models.datatoken2 import Datatoken2
 from ocean_lib.models.datatoken_base import DatatokenBase, TokenFeeInfo
+from ocean_lib.models.fixed_rate_exchange import BtNeeded, ExchangeDetails
 from ocean_lib.ocean.ocean import Ocean
 from ocean_lib.ocean.util import to_wei
 
 from feltflow.approve import Approve
+from feltflow.gas import send_transaction
+from feltflow.profiling import profiled
+from feltflow.rpc import get_reader
+from feltflow.scheduler import get_scheduler
 
 
 def get_valid_until_time(
@@ -24,6 +31,13 @@ def get_valid_until_time(
     return int((datetime.now(timezone.utc) + timedelta(minutes=min_time)).timestamp())
 
 
+def get_typed_datatoken(ocean: Ocean, address: str) -> DatatokenBase:
+    """Same as DatatokenBase.get_typed, but with cached template id."""
+    datatoken = Datatoken1(ocean.config, address)
+    template_id = get_reader(ocean).template_id(datatoken)
+    return datatoken if template_id == 1 else Datatoken2(ocean.config, address)
+
+
 def _start_or_reuse_order_based_on_initialize_response(
     asset_compute_input: ComputeInput,
     item: dict,
@@ -36,6 +50,7 @@ def _start_or_reuse_order_based_on_initialize_response(
     valid_order = item.get("validOrder")
 
     approvals = Approve()
+    reader = get_reader(ocean)
 
     # TODO: Here it depends on when was the order, if it is still valid we don't need to reuse order
     # if valid_order and (not provider_fees or provider_fees["providerFeeAmount"] == "0"):
@@ -44,7 +59,8 @@ def _start_or_reuse_order_based_on_initialize_response(
         return
 
     service = asset_compute_input.service
-    dt = DatatokenBase.get_typed(ocean.config, service.datatoken)
+    dt = get_typed_datatoken(ocean, service.datatoken)
+    service_index = asset_compute_input.ddo.get_index_of_service(service)
 
     if provider_fees:
         approvals.add_approve(
@@ -54,68 +70,126 @@ def _start_or_reuse_order_based_on_initialize_response(
         )
 
     if valid_order and provider_fees:
-        approvals.appprove_all(ocean, tx_dict)
-        asset_compute_input.transfer_tx_id = dt.reuse_order(
-            valid_order, provider_fees=provider_fees, tx_dict=tx_dict
-        ).txid
+        with approvals.approved(ocean, tx_dict):
+            tx = send_transaction(
+                ocean,
+                tx_dict,
+                "reuse_order",
+                lambda tx_dict: dt.reuse_order(
+                    valid_order, provider_fees=provider_fees, tx_dict=tx_dict
+                ),
+                replaceable=True,
+            )
+        asset_compute_input.transfer_tx_id = tx.txid
         return
 
+    # Template 2 buys (or dispenses) and orders datatoken in single transaction
+    single_transaction = reader.template_id(dt) == 2
+
     # TODO: Add some requirements on extended DDO with access_details
     if asset_compute_input.ddo.access_details["type"] == "fixed":
-        exchange = dt.get_exchanges()[0]
-        amount_needed = exchange.BT_needed(to_wei(1), consume_market_fees.amount)
+        exchange = reader.exchanges(dt)[0]
+        amount_needed = BtNeeded(
+            reader.call(
+                exchange.FRE.calcBaseInGivenOutDT,
+                exchange.exchange_id,
+                to_wei(1),
+                consume_market_fees.amount,
+            )
+        ).base_token_amount
+        details = ExchangeDetails(
+            reader.call(exchange.FRE.getExchange, exchange.exchange_id)
+        )
 
         # Run purchase depending on datatoken type
-        if dt.getId() == 2:
+        if single_transaction:
             # Approve base token for buying data token
             approvals.add_approve(
-                exchange.details.base_token,
+                details.base_token,
                 dt.address,
                 amount_needed,
             )
-            approvals.appprove_all(ocean, tx_dict)
-            total_amount = approvals.get_amount(exchange.details.base_token, dt.address)
-
-            asset_compute_input.transfer_tx_id = dt.buy_DT_and_order(
-                consumer=consumer_address,
-                service_index=asset_compute_input.ddo.get_index_of_service(service),
-                provider_fees=provider_fees,
-                exchange=exchange,
-                max_base_token_amount=total_amount,
-                consume_market_swap_fee_amount=consume_market_fees.amount,
-                consume_market_swap_fee_address=consume_market_fees.address,
-                tx_dict=tx_dict,
-            ).txid
+            with approvals.approved(ocean, tx_dict):
+                total_amount = approvals.get_amount(details.base_token, dt.address)
+
+                tx = send_transaction(
+                    ocean,
+                    tx_dict,
+                    "buy_and_order",
+                    lambda tx_dict: dt.buy_DT_and_order(
+                        consumer=consumer_address,
+                        service_index=service_index,
+                        provider_fees=provider_fees,
+                        exchange=exchange,
+                        max_base_token_amount=total_amount,
+                        consume_market_swap_fee_amount=consume_market_fees.amount,
+                        consume_market_swap_fee_address=consume_market_fees.address,
+                        tx_dict=tx_dict,
+                    ),
+                    replaceable=True,
+                )
+            asset_compute_input.transfer_tx_id = tx.txid
         else:
             # Approve base token for buying data token
             approvals.add_approve(
-                exchange.details.base_token,
+                details.base_token,
                 exchange.address,
                 amount_needed,
             )
-            approvals.appprove_all(ocean, tx_dict)
-
-            asset_compute_input.transfer_tx_id = dt.buy_DT_and_order(
-                consumer=consumer_address,
-                service_index=asset_compute_input.ddo.get_index_of_service(service),
-                provider_fees=provider_fees,
-                exchange=exchange,
-                tx_dict=tx_dict,
-            ).txid
+            with approvals.approved(ocean, tx_dict):
+                tx = send_transaction(
+                    ocean,
+                    tx_dict,
+                    "buy_and_order",
+                    lambda tx_dict: dt.buy_DT_and_order(
+                        consumer=consumer_address,
+                        service_index=service_index,
+                        provider_fees=provider_fees,
+                        exchange=exchange,
+                        tx_dict=tx_dict,
+                    ),
+                )
+            asset_compute_input.transfer_tx_id = tx.txid
 
     elif asset_compute_input.ddo.access_details["type"] == "free":
-        approvals.appprove_all(ocean, tx_dict)
-
-        asset_compute_input.transfer_tx_id = dt.dispense_and_order(
-            consumer=consumer_address,
-            service_index=asset_compute_input.ddo.get_index_of_service(service),
-            provider_fees=provider_fees,
-            tx_dict=tx_dict,
-        ).txid
+        with approvals.approved(ocean, tx_dict):
+            tx = send_transaction(
+                ocean,
+                tx_dict,
+                "dispense_and_order",
+                lambda tx_dict: dt.dispense_and_order(
+                    consumer=consumer_address,
+                    service_index=service_index,
+                    provider_fees=provider_fees,
+                    tx_dict=tx_dict,
+                ),
+                replaceable=single_transaction,
+            )
+        asset_compute_input.transfer_tx_id = tx.txid
     else:
         raise Exception("Unsupported asset access details.")
 
 
+def initialize_compute(
+    datasets: List[ComputeInput],
+    algorithm_data: ComputeInput,
+    compute_environment: str,
+    valid_until: int,
+    consumer_address: str,
+) -> dict:
+    """Initialize compute at provider, get provider fees and valid orders."""
+    initialize_response = DataServiceProvider.initialize_compute(
+        [x.as_dictionary() for x in datasets],
+        algorithm_data.as_dictionary(),
+        datasets[0].service.service_endpoint,
+        consumer_address,
+        compute_environment,
+        valid_until,
+    )
+    return initialize_response.json()
+
+
+@profiled("pay_for_compute_service")
 def pay_for_compute_service(
     datasets: List[ComputeInput],
     algorithm_data: ComputeInput,
@@ -125,22 +199,39 @@ def pay_for_compute_service(
     tx_dict: dict,
     consumer_address: str,
     ocean: Ocean,
+) -> Tuple[List[ComputeInput], Optional[ComputeInput]]:
+    # Orders of one chain are limited by scheduler (priority of the started job)
+    with get_scheduler().slot(f"chain:{ocean.config_dict['chainId']}"):
+        return _pay_for_compute_service(
+            datasets,
+            algorithm_data,
+            compute_environment,
+            valid_until,
+            consume_market_order_fee_address,
+            tx_dict,
+            consumer_address,
+            ocean,
+        )
+
+
+def _pay_for_compute_service(
+    datasets: List[ComputeInput],
+    algorithm_data: ComputeInput,
+    compute_environment: str,
+    valid_until: int,
+    consume_market_order_fee_address: str,
+    tx_dict: dict,
+    consumer_address: str,
+    ocean: Ocean,
 ) -> Tuple[List[ComputeInput], Optional[ComputeInput]]:
     wallet_address = tx_dict["from"]
 
     if not consumer_address:
         consumer_address = wallet_address
 
-    initialize_response = DataServiceProvider.initialize_compute(
-        [x.as_dictionary() for x in datasets],
-        algorithm_data.as_dictionary(),
-        datasets[0].service.service_endpoint,
-        consumer_address,
-        compute_environment,
-        valid_until,
+    result = initialize_compute(
+        datasets, algorithm_data, compute_environment, valid_until, consumer_address
     )
-
-    result = initialize_response.json()
     for i, item in enumerate(result["datasets"]):
         _start_or_reuse_order_based_on_initialize_response(
             datasets[i],
@@ -155,6 +246,9 @@ def pay_for_compute_service(
             ocean,
         )
 
+    # Orders changed balances, drop cached block state
+    get_reader(ocean).invalidate()
+
     if "algorithm" in result:
         _start_or_reuse_order_based_on_initialize_response(
             algorithm_data,
@@ -169,6 +263,7 @@ def pay_for_compute_service(
             ocean,
         )
 
+        get_reader(ocean).invalidate()
         return datasets, algorithm_data
 
     return datasets, None
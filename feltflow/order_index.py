@@ -0,0 +1,245 @@
+"""Local index of orders (and order reuses) of account, synced from Ocean subgraph."""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from feltflow.metrics import LATENCY
+
+ORDERS_QUERY = """
+  query OrdersQuery($account: String, $cursor: BigInt, $skip: Int, $first: Int) {
+    orders(
+      where: { payer: $account, createdTimestamp_gte: $cursor }
+      orderBy: createdTimestamp
+      orderDirection: asc
+      skip: $skip
+      first: $first
+    ) {
+      id
+      tx
+      serviceIndex
+      createdTimestamp
+      datatoken {
+        id
+      }
+    }
+  }
+"""
+
+REUSES_QUERY = """
+  query OrderReusesQuery($account: String, $cursor: BigInt, $skip: Int, $first: Int) {
+    orderReuses(
+      where: { caller: $account, createdTimestamp_gte: $cursor }
+      orderBy: createdTimestamp
+      orderDirection: asc
+      skip: $skip
+      first: $first
+    ) {
+      id
+      tx
+      createdTimestamp
+      order {
+        id
+      }
+    }
+  }
+"""
+
+# Version of the schema, index with older version is dropped and synced again
+SCHEMA_VERSION = 2
+
+# Entities are keyed by subgraph id, one transaction can contain several orders
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    subgraph TEXT, id TEXT, payer TEXT, tx TEXT, datatoken TEXT,
+    service_index INTEGER, created INTEGER, PRIMARY KEY (subgraph, id)
+);
+CREATE INDEX IF NOT EXISTS orders_lookup
+    ON orders (subgraph, payer, datatoken, created);
+CREATE TABLE IF NOT EXISTS reuses (
+    subgraph TEXT, id TEXT, caller TEXT, tx TEXT, order_id TEXT, created INTEGER,
+    PRIMARY KEY (subgraph, id)
+);
+CREATE INDEX IF NOT EXISTS reuses_lookup ON reuses (subgraph, order_id, created);
+CREATE INDEX IF NOT EXISTS reuses_cursor ON reuses (subgraph, caller, created);
+"""
+
+DEFAULT_PATH = Path.home() / ".cache" / "feltflow" / "orders.sqlite"
+
+
+class OrderIndex:
+    """Class keeping local SQLite index of orders of accounts.
+
+    Index is synced incrementally (by createdTimestamp cursor, page by page), so
+    only new orders and reuses are downloaded from the subgraph.
+    """
+
+    def __init__(
+        self, path: str = str(DEFAULT_PATH), page_size: int = 1000, min_interval=2.0
+    ):
+        """
+        Args:
+            path: path to SQLite database file
+            page_size: number of entities fetched per subgraph request
+            min_interval: minimal time in seconds between syncs of same account
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.page_size = page_size
+        self.min_interval = min_interval
+        self._synced: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS orders;")
+                conn.executescript("DROP TABLE IF EXISTS reuses;")
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _query(self, subgraph_url: str, query: str, variables: dict) -> dict:
+        with LATENCY.time(service="subgraph"):
+            res = requests.post(
+                f"{subgraph_url}/subgraphs/name/oceanprotocol/ocean-subgraph",
+                json={"query": query, "variables": variables},
+            )
+        if res.status_code != 200:
+            raise Exception(f"Unable to sync orders (error: {res.status_code}")
+        return res.json()["data"]
+
+    def _cursor(self, conn, subgraph_url: str, account: str, table: str):
+        """Get cursor (latest timestamp) and number of indexed entities at it."""
+        column = "payer" if table == "orders" else "caller"
+        return conn.execute(
+            f"SELECT created, COUNT(*) FROM {table} "
+            f"WHERE subgraph=? AND {column}=? "
+            f"AND created=(SELECT MAX(created) FROM {table} "
+            f"WHERE subgraph=? AND {column}=?)",
+            (subgraph_url, account, subgraph_url, account),
+        ).fetchone()
+
+    def _sync_entity(
+        self, subgraph_url: str, account: str, entity: str, query: str
+    ) -> None:
+        """Download all new entities (orders or reuses) of the account."""
+        table = "orders" if entity == "orders" else "reuses"
+        while True:
+            with self._connect() as conn:
+                cursor, skip = self._cursor(conn, subgraph_url, account, table)
+
+            # Entities with cursor timestamp which are already indexed are skipped
+            items = self._query(
+                subgraph_url,
+                query,
+                {
+                    "account": account,
+                    "cursor": cursor or 0,
+                    "skip": skip if cursor else 0,
+                    "first": self.page_size,
+                },
+            )[entity]
+
+            if entity == "orders":
+                rows = [
+                    (
+                        subgraph_url,
+                        o["id"],
+                        account,
+                        o["tx"],
+                        o["datatoken"]["id"],
+                        int(o["serviceIndex"]),
+                        int(o["createdTimestamp"]),
+                    )
+                    for o in items
+                ]
+            else:
+                rows = [
+                    (
+                        subgraph_url,
+                        r["id"],
+                        account,
+                        r["tx"],
+                        r["order"]["id"],
+                        int(r["createdTimestamp"]),
+                    )
+                    for r in items
+                ]
+
+            with self._connect() as conn:
+                placeholders = ", ".join("?" * (7 if entity == "orders" else 6))
+                inserted = conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} VALUES ({placeholders})", rows
+                ).rowcount
+
+            if len(items) < self.page_size:
+                break
+            if inserted == 0:
+                # Full page of already indexed entities, cursor wouldn't move
+                raise Exception(f"Unable to sync {entity}, subgraph repeats entities")
+
+    def sync(self, subgraph_url: str, account: str) -> None:
+        """Sync new orders and reuses of account from subgraph."""
+        account = account.lower()
+        key = (subgraph_url, account)
+        with self._lock:
+            if time.time() - self._synced.get(key, 0) < self.min_interval:
+                return
+
+            self._sync_entity(subgraph_url, account, "orders", ORDERS_QUERY)
+            self._sync_entity(subgraph_url, account, "orderReuses", REUSES_QUERY)
+            self._synced[key] = time.time()
+
+    def latest_order(
+        self, subgraph_url: str, account: str, datatoken: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get latest order of datatoken by the account with its latest reuse.
+
+        Returns:
+            order in same format as the subgraph (tx, serviceIndex, createdTimestamp,
+            reuses) or None if the account has no order of the datatoken
+        """
+        with self._connect() as conn:
+            order = conn.execute(
+                "SELECT id, tx, service_index, created FROM orders "
+                "WHERE subgraph=? AND payer=? AND datatoken=? "
+                "ORDER BY created DESC LIMIT 1",
+                (subgraph_url, account.lower(), datatoken.lower()),
+            ).fetchone()
+            if order is None:
+                return None
+
+            reuse = conn.execute(
+                "SELECT tx, caller, created FROM reuses "
+                "WHERE subgraph=? AND order_id=? ORDER BY created DESC LIMIT 1",
+                (subgraph_url, order[0]),
+            ).fetchone()
+
+        reuses: List[dict] = []
+        if reuse:
+            reuses.append(
+                {"tx": reuse[0], "caller": reuse[1], "createdTimestamp": reuse[2]}
+            )
+
+        return {
+            "tx": order[1],
+            "serviceIndex": order[2],
+            "createdTimestamp": order[3],
+            "reuses": reuses,
+        }
+
+
+_INDEX: Optional[OrderIndex] = None
+
+
+def get_order_index() -> OrderIndex:
+    """Get order index shared by the whole process."""
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = OrderIndex()
+    return _INDEX
@@ -0,0 +1,99 @@
+"""Checks of job outputs (result metadata) and schema validation of models."""
+import json
+from typing import Any, Dict, List, Optional
+
+# Default limits of output sizes in bytes {filename: max size}
+OUTPUT_LIMITS = {"model": 512 * 1024**2}
+
+# Opening and closing characters of JSON values by schema type
+_ENVELOPES = {"object": (b"{", b"}"), "array": (b"[", b"]")}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+    "integer": int,
+    "number": (int, float),
+}
+
+
+def check_results(
+    results: List[dict], limits: Dict[str, int] = OUTPUT_LIMITS
+) -> Optional[str]:
+    """Check result metadata of finished job before anything is downloaded.
+
+    Args:
+        results: results list of job info ({"filename", "filesize", ...})
+        limits: expected output files and their maximal sizes in bytes
+
+    Returns:
+        description of the problem or None if outputs are valid
+    """
+    files = {file.get("filename"): file for file in results}
+    for name, max_size in limits.items():
+        if name not in files:
+            return f"Missing output {name}"
+
+        size = files[name].get("filesize")
+        if size is None:
+            continue
+        if int(size) == 0:
+            return f"Output {name} is empty"
+        if int(size) > max_size:
+            return f"Output {name} has {size} bytes, limit is {max_size}"
+    return None
+
+
+def check_envelope(content: bytes, schema: Optional[dict] = None) -> None:
+    """Check that content looks like complete JSON value of the schema type.
+
+    Only first and last non-whitespace bytes are checked, so truncated or
+    non-JSON outputs (e.g. HTML error pages) are rejected without parsing.
+    """
+    data = content.strip()
+    opening, closing = _ENVELOPES.get((schema or {}).get("type", "object"), (b"", b""))
+    if not data or not data.startswith(opening) or not data.endswith(closing):
+        raise Exception(f"Output isn't complete JSON {opening + closing!r} value")
+
+
+def validate(value: Any, schema: dict, path: str = "model") -> None:
+    """Validate value against schema (subset of JSON schema).
+
+    Supported keywords: type, properties, required, items, minItems, maxItems.
+    """
+    expected = schema.get("type")
+    if expected:
+        types = _TYPES[expected]
+        # bool is subclass of int, but it isn't a number in JSON schema
+        if not isinstance(value, types) or (
+            isinstance(value, bool) and expected in ("integer", "number")
+        ):
+            raise Exception(f"Invalid {path}: expected {expected}")
+
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                raise Exception(f"Invalid {path}: missing {key}")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value:
+                validate(value[key], subschema, f"{path}.{key}")
+
+    if isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            raise Exception(f"Invalid {path}: less than {schema['minItems']} items")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            raise Exception(f"Invalid {path}: more than {schema['maxItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(value):
+                validate(item, schema["items"], f"{path}[{i}]")
+
+
+def parse_model(content: bytes, schema: Optional[dict] = None) -> Any:
+    """Parse model output and validate it against schema (if provided)."""
+    check_envelope(content, schema)
+    model = json.loads(content.decode("utf-8"))
+    if schema:
+        validate(model, schema)
+    return model
@@ -0,0 +1,204 @@
+"""Module for estimating cost and duration of training without sending transactions."""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from statistics import mean
+from typing import Any, Dict, List, Optional
+
+from ocean_lib.models.compute_input import ComputeInput
+from ocean_lib.models.fixed_rate_exchange import BtNeeded, ExchangeDetails
+from ocean_lib.ocean.ocean import Ocean
+from ocean_lib.ocean.util import to_wei
+
+from feltflow.comput_job import MAX_WORKERS, ComputeJob
+from feltflow.journal import RunJournal
+from feltflow.order import get_typed_datatoken, initialize_compute
+from feltflow.rpc import get_reader
+
+
+def _plan_order(
+    compute_input: ComputeInput, item: dict, ocean: Ocean
+) -> Dict[str, Any]:
+    """Estimate transactions and spend of single order (mirrors order.py logic)."""
+    provider_fees = item.get("providerFee")
+    valid_order = item.get("validOrder")
+
+    plan = {"did": compute_input.did, "reuse": False, "transactions": 0}
+    spend = defaultdict(int)
+    approvals = set()
+
+    if valid_order and not provider_fees:
+        plan.update({"reuse": True, "spend": {}})
+        return plan
+
+    reader = get_reader(ocean)
+    dt = get_typed_datatoken(ocean, compute_input.service.datatoken)
+
+    if provider_fees and int(provider_fees["providerFeeAmount"]) > 0:
+        approvals.add((provider_fees["providerFeeToken"], dt.address))
+        spend[provider_fees["providerFeeToken"]] += int(
+            provider_fees["providerFeeAmount"]
+        )
+
+    if valid_order and provider_fees:
+        plan["reuse"] = True
+    elif compute_input.ddo.access_details["type"] == "fixed":
+        exchange = reader.exchanges(dt)[0]
+        amount_needed = BtNeeded(
+            reader.call(
+                exchange.FRE.calcBaseInGivenOutDT,
+                exchange.exchange_id,
+                to_wei(1),
+                compute_input.consume_market_order_fee_amount,
+            )
+        ).base_token_amount
+        details = ExchangeDetails(
+            reader.call(exchange.FRE.getExchange, exchange.exchange_id)
+        )
+        spender = dt.address if reader.template_id(dt) == 2 else exchange.address
+        approvals.add((details.base_token, spender))
+        spend[details.base_token] += amount_needed
+    elif compute_input.ddo.access_details["type"] != "free":
+        raise Exception("Unsupported asset access details.")
+
+    # Approvals + order (or reuse order) transaction
+    plan["transactions"] = len(approvals) + 1
+    plan["spend"] = dict(spend)
+    return plan
+
+
+def plan_compute(
+    ocean: Ocean, dataset_dids: List[str], algorithm_did: str, address: str
+) -> Dict[str, Any]:
+    """Resolve assets and estimate orders of single compute job.
+
+    Args:
+        ocean: ocean object with config
+        dataset_dids: DIDs of datasets used by the job
+        algorithm_did: DID of algorithm
+        address: address of account which would order the job
+
+    Returns:
+        dictionary with environment and planned orders of the job
+    """
+    job = ComputeJob(ocean, dataset_dids, algorithm_did, {})
+    data_input, algo_input, valid_until = job.backend.prepare_inputs(job, address)
+    result = initialize_compute(
+        data_input,
+        algo_input,
+        job.compute_env["id"],
+        valid_until,
+        job.compute_env["consumerAddress"] or address,
+    )
+
+    orders = [
+        _plan_order(d, item, ocean) for d, item in zip(data_input, result["datasets"])
+    ]
+    if "algorithm" in result:
+        orders.append(_plan_order(algo_input, result["algorithm"], ocean))
+
+    return {
+        "datasets": dataset_dids,
+        "algorithm": algorithm_did,
+        "environment": job.compute_env["id"],
+        "orders": orders,
+    }
+
+
+def historical_timings(journal_dir: str) -> Dict[str, Dict[str, float]]:
+    """Compute average duration of job stages from journals of previous runs.
+
+    Returns:
+        {"training": {"orders": ..., "start": ..., "run": ...}, "aggregation": ...}
+    """
+    stages = {"training": defaultdict(list), "aggregation": defaultdict(list)}
+    for path in Path(journal_dir).glob("*/journal.jsonl"):
+        for event in RunJournal(str(path.parent)).read("round"):
+            records = [("training", r) for r in event["training"]]
+            if event.get("aggregation"):
+                records.append(("aggregation", event["aggregation"]))
+            for record in event.get("aggregation_groups", []):
+                records.append(("aggregation", record))
+
+            for kind, record in records:
+                for stage, duration in record.get("timings", {}).items():
+                    stages[kind][stage].append(duration)
+                if record.get("started_at") and record.get("finished_at"):
+                    stages[kind]["run"].append(
+                        record["finished_at"] - record["started_at"]
+                    )
+
+    return {
+        kind: {stage: mean(values) for stage, values in durations.items()}
+        for kind, durations in stages.items()
+    }
+
+
+def plan_training(
+    ocean: Ocean, job: Dict[str, Any], address: str, journal_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """Estimate transactions, spend and duration of one training round.
+
+    All lookups (DDOs, access details, initialize compute, exchange quotes) run
+    in parallel and no transaction is sent.
+
+    Args:
+        ocean: ocean object with config
+        job: job definition obtained from FELT storage (launch token)
+        address: address of account which would run the training
+        journal_dir: directory with journals of previous runs (for timings)
+    """
+    assets = job["algoConfig"]["assets"]
+    computes = [([did], assets["training"]) for did in job["dataDIDs"]]
+    if len(job["dataDIDs"]) > 1:
+        computes.append(([assets["emptyDataset"]], assets["aggregation"]))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        jobs = list(
+            executor.map(lambda c: plan_compute(ocean, c[0], c[1], address), computes)
+        )
+
+    spend = defaultdict(int)
+    orders = [order for j in jobs for order in j["orders"]]
+    for order in orders:
+        for token, amount in order["spend"].items():
+            spend[token] += amount
+
+    # Local trainings are ordered and started one by one, then run in parallel
+    timings = historical_timings(journal_dir) if journal_dir else {}
+    n_local = len(job["dataDIDs"])
+    wall_time = {}
+    for kind, count in [("training", n_local), ("aggregation", len(jobs) - n_local)]:
+        stats = timings.get(kind, {})
+        if count and stats:
+            wall_time[kind] = {
+                "orders": stats.get("orders", 0) * count,
+                "start": stats.get("start", 0) * count,
+                "run": stats.get("run", 0),
+            }
+
+    return {
+        "jobs": jobs,
+        "transactions": sum(order["transactions"] for order in orders),
+        "reused_orders": sum(order["reuse"] for order in orders),
+        "orders": len(orders),
+        "spend": dict(spend),
+        "wall_time": wall_time,
+    }
+
+
+def print_plan(plan: Dict[str, Any]) -> None:
+    """Print training plan in human readable form."""
+    print("FELT Labs: Training plan (no transactions were sent)")
+    print(f"  Compute jobs: {len(plan['jobs'])}")
+    print(f"  Orders: {plan['orders']} (reusable: {plan['reused_orders']})")
+    print(f"  Transactions: {plan['transactions']}")
+    for token, amount in plan["spend"].items():
+        print(f"  Spend of token {token}: {amount}")
+
+    if not plan["wall_time"]:
+        print("  Expected duration: unknown (no previous runs)")
+    for kind, stages in plan["wall_time"].items():
+        print(f"  Expected duration of {kind}:")
+        for stage, duration in stages.items():
+            print(f"    {stage}: {duration:.1f} s")
@@ -0,0 +1,245 @@
+"""Opt-in profiling of CPU time, memory and open sockets of the process."""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Peak of traced memory can be reset only since Python 3.9, without it the peak
+# is global maximum of the process and sections don't record any peak
+RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+
+def _rss() -> Optional[int]:
+    """Current resident set size in bytes (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _open_sockets() -> Optional[int]:
+    """Number of open sockets of the process (Linux only)."""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+
+    count = 0
+    for fd in fds:
+        try:
+            count += os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+        except OSError:
+            pass
+    return count
+
+
+def _stack(frame) -> str:
+    """Stack of the frame in folded format (root first, separated by ';')."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """Sampling profiler of the whole process.
+
+    Background thread samples stacks of all threads (written as folded stacks,
+    input format of flamegraph tools) and periodically records CPU time, RSS and
+    number of open sockets. Sections (see `profiled`) additionally record memory
+    allocated by them using tracemalloc.
+
+    Peak memory and top allocations (snapshots) are recorded only by sections
+    started while no other section is running, because tracemalloc peak is
+    global. Nested and concurrent sections record only allocated memory (change
+    of traced memory) and the peak of outer section includes their allocations.
+    Peak is None on Python 3.8, which can't reset it.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        stack_interval: float = 0.01,
+        resource_interval: float = 1.0,
+    ):
+        """
+        Args:
+            output_dir: directory where report is written (run directory)
+            stack_interval: seconds between stack samples
+            resource_interval: seconds between resource usage samples
+        """
+        self.output_dir = Path(output_dir)
+        self.stack_interval = stack_interval
+        self.resource_interval = resource_interval
+
+        self.stacks: Counter = Counter()
+        self.resources: List[Dict[str, Any]] = []
+        self.sections: Dict[str, Dict[str, Any]] = defaultdict(
+            lambda: {
+                "calls": 0,
+                "time": 0.0,
+                "allocated": 0,
+                "peak": 0 if RESET_PEAK else None,
+                "top": [],
+            }
+        )
+        self._lock = threading.Lock()
+        self._active = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = 0.0
+        self._start_cpu = os.times()
+
+    def start(self) -> None:
+        global _PROFILER
+        self._start_time = time.time()
+        self._start_cpu = os.times()
+        tracemalloc.start()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        _PROFILER = self
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop profiling and write the report.
+
+        Returns:
+            summary of the report
+        """
+        global _PROFILER
+        _PROFILER = None
+        self._stop.set()
+        self._thread.join()
+        self._sample_resources()
+        tracemalloc.stop()
+        return self.write()
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _sample_resources(self) -> None:
+        cpu = os.times()
+        self.resources.append(
+            {
+                "time": round(time.time() - self._start_time, 3),
+                "cpu_user": round(cpu.user - self._start_cpu.user, 3),
+                "cpu_system": round(cpu.system - self._start_cpu.system, 3),
+                "rss": _rss(),
+                "open_sockets": _open_sockets(),
+                "threads": threading.active_count(),
+            }
+        )
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        next_resources = 0.0
+        while not self._stop.wait(self.stack_interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[_stack(frame)] += 1
+
+            if time.time() >= next_resources:
+                self._sample_resources()
+                next_resources = time.time() + self.resource_interval
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        """Measure duration and memory allocated by the code block."""
+        with self._lock:
+            # Only section running alone can use global peak and take snapshots
+            outermost = self._active == 0
+            self._active += 1
+        before = None
+        if outermost:
+            if RESET_PEAK:
+                tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            duration = time.time() - start_time
+            memory, peak = tracemalloc.get_traced_memory()
+            top = (
+                tracemalloc.take_snapshot().compare_to(before, "lineno")[:5]
+                if before is not None
+                else []
+            )
+
+            with self._lock:
+                self._active -= 1
+                stats = self.sections[name]
+                stats["calls"] += 1
+                stats["time"] += duration
+                stats["allocated"] += memory - start_memory
+                if before is not None:
+                    if RESET_PEAK:
+                        stats["peak"] = max(stats["peak"], peak - start_memory)
+                    stats["top"] = [str(s) for s in top]
+
+    def summary(self) -> Dict[str, Any]:
+        usage = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+        samples = self.resources
+        return {
+            "duration": round(time.time() - self._start_time, 3),
+            "cpu_user": samples[-1]["cpu_user"] if samples else None,
+            "cpu_system": samples[-1]["cpu_system"] if samples else None,
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss": usage.ru_maxrss * 1024 if usage else None,
+            "max_open_sockets": max(
+                (s["open_sockets"] or 0 for s in samples), default=None
+            ),
+            "max_threads": max((s["threads"] for s in samples), default=None),
+            "stack_samples": sum(self.stacks.values()),
+            "sections": dict(self.sections),
+            "resources": samples,
+        }
+
+    def write(self) -> Dict[str, Any]:
+        """Write folded stacks (profile.folded) and summary (profile.json)."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.output_dir / "profile.folded", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        summary = self.summary()
+        with open(self.output_dir / "profile.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+_PROFILER: Optional[Profiler] = None
+
+
+def profiled(name: str) -> Callable:
+    """Decorator measuring function as profiler section (if profiling is active)."""
+
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _PROFILER
+            with profiler.section(name) if profiler else nullcontext():
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,248 @@
+"""Recording and replay of outbound HTTP requests for offline performance tests."""
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from feltflow.scheduler import Scheduler
+
+# Request fields which change on every run (JSON-RPC ids, provider nonces, auth
+# token expiration derived from the nonce and validity of provider fees)
+VOLATILE_FIELDS = {"id", "nonce", "signature", "expiration", "validUntil"}
+# Fields encrypted with ephemeral key (auth tokens stored in FELT storage)
+ENCRYPTED_FIELDS = {"authToken"}
+
+
+def _strip_url(url: str) -> str:
+    """Remove volatile query parameters from URL (e.g. signed result URLs)."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_FIELDS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _strip(value: Any) -> Any:
+    """Remove volatile fields from JSON body at any depth.
+
+    Values of encrypted fields are replaced by placeholder and volatile query
+    parameters are removed from nested URLs (model URLs in algocustomdata).
+    """
+    if isinstance(value, dict):
+        return {
+            k: "<encrypted>" if k in ENCRYPTED_FIELDS else _strip(v)
+            for k, v in value.items()
+            if k not in VOLATILE_FIELDS
+        }
+    if isinstance(value, list):
+        return [_strip(item) for item in value]
+    if isinstance(value, str) and value.startswith(("http://", "https://")):
+        return _strip_url(value)
+    return value
+
+
+def _json_body(body: Any) -> Any:
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except (TypeError, ValueError):
+        return None
+
+
+def _request_body(request: requests.PreparedRequest) -> bytes:
+    """Body of request, gzip encoded body (compute start payload) is decoded."""
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if request.headers.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    return body
+
+
+def _rpc_ids(data: Any) -> Optional[List[Any]]:
+    """Ids of JSON-RPC request (or batch) in request order."""
+    items = data if isinstance(data, list) else [data]
+    if items and all(isinstance(item, dict) and "jsonrpc" in item for item in items):
+        return [item.get("id") for item in items]
+    return None
+
+
+def request_key(request: requests.PreparedRequest) -> Tuple[str, str]:
+    """Key matching recorded and replayed request.
+
+    Returns:
+        tuple (method and URL, hash of body) without volatile and encrypted fields
+    """
+    url = _strip_url(request.url)
+    body = _request_body(request)
+    data = _json_body(body)
+    if data is not None:
+        body = json.dumps(_strip(data), sort_keys=True).encode("utf-8")
+    return f"{request.method} {url}", hashlib.sha256(body).hexdigest()[:16]
+
+
+class Recorder:
+    """Record every outbound HTTP request of the process with its timing.
+
+    All clients (FELT API, subgraph, provider, Aquarius and JSON-RPC through
+    web3) use requests, so requests are captured on the transport adapter.
+    Recording is written as gzipped JSON lines, one exchange per line.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: path of recording file
+        """
+        self.path = path
+        self.exchanges: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._send = HTTPAdapter.send
+        self._start_time = 0.0
+
+    def _record(self, adapter: HTTPAdapter, request, *args, **kwargs):
+        start = time.time()
+        response = self._send(adapter, request, *args, **kwargs)
+        elapsed = time.time() - start
+
+        method_url, body = request_key(request)
+        exchange = {
+            "key": method_url,
+            "body": body,
+            "host": Scheduler.host(request.url),
+            "ids": _rpc_ids(_json_body(_request_body(request))),
+            "offset": round(start - self._start_time, 4),
+            "elapsed": round(elapsed, 4),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "content": base64.b64encode(response.content).decode("ascii"),
+        }
+        with self._lock:
+            self.exchanges.append(exchange)
+        return response
+
+    def __enter__(self) -> "Recorder":
+        recorder = self
+        self._start_time = time.time()
+
+        def send(adapter, request, *args, **kwargs):
+            return recorder._record(adapter, request, *args, **kwargs)
+
+        HTTPAdapter.send = send
+        return self
+
+    def __exit__(self, *args) -> None:
+        HTTPAdapter.send = self._send
+        with gzip.open(self.path, "wt") as f:
+            for exchange in self.exchanges:
+                f.write(json.dumps(exchange) + "\n")
+        print_summary(self.exchanges, f"Recorded requests ({self.path})")
+
+
+class Replayer:
+    """Serve recorded responses instead of sending requests.
+
+    Requests are matched by method, URL and body (without volatile and encrypted
+    fields, see `request_key`), same requests get recorded responses in recorded
+    order and the last response is repeated once they run out (e.g. additional
+    status polls). Responses are delayed by recorded latency multiplied by
+    `latency_scale`. Request missing in the recording raises an exception,
+    nothing is sent to the network.
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0):
+        """
+        Args:
+            path: path of recording file
+            latency_scale: multiplier of recorded latencies (0 for no delays)
+        """
+        self.path = path
+        self.latency_scale = latency_scale
+        self.served: List[Dict[str, Any]] = []
+        self._queues: Dict[Tuple[str, str], Deque[dict]] = defaultdict(deque)
+        self._last: Dict[Tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self._send = HTTPAdapter.send
+
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                exchange = json.loads(line)
+                self._queues[(exchange["key"], exchange["body"])].append(exchange)
+
+    def _response(self, request: requests.PreparedRequest, exchange: dict):
+        content = base64.b64decode(exchange["content"])
+        recorded_ids = exchange["ids"]
+        ids = _rpc_ids(_json_body(_request_body(request)))
+        if recorded_ids and ids and len(recorded_ids) == len(ids):
+            # Map JSON-RPC ids of recorded requests to ids of current requests
+            mapping = dict(zip(recorded_ids, ids))
+            data = json.loads(content)
+            for item in data if isinstance(data, list) else [data]:
+                if isinstance(item, dict) and item.get("id") in mapping:
+                    item["id"] = mapping[item["id"]]
+            content = json.dumps(data).encode("utf-8")
+
+        response = requests.Response()
+        response.status_code = exchange["status"]
+        response.reason = exchange["reason"]
+        # Content is stored decoded, drop encoding headers of original response
+        headers = CaseInsensitiveDict(exchange["headers"])
+        headers.pop("Content-Encoding", None)
+        headers["Content-Length"] = str(len(content))
+        response.headers = headers
+        response._content = content
+        response.encoding = requests.utils.get_encoding_from_headers(headers)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=exchange["elapsed"] * self.latency_scale)
+        return response
+
+    def _replay(self, adapter: HTTPAdapter, request, *args, **kwargs):
+        key = request_key(request)
+        with self._lock:
+            queue = self._queues.get(key)
+            exchange = queue.popleft() if queue else self._last.get(key)
+            if exchange is None:
+                raise Exception(f"Request {key[0]} (body {key[1]}) isn't recorded")
+            self._last[key] = exchange
+            self.served.append(exchange)
+
+        time.sleep(exchange["elapsed"] * self.latency_scale)
+        return self._response(request, exchange)
+
+    def __enter__(self) -> "Replayer":
+        replayer = self
+
+        def send(adapter, request, *args, **kwargs):
+            return replayer._replay(adapter, request, *args, **kwargs)
+
+        HTTPAdapter.send = send
+        return self
+
+    def __exit__(self, *args) -> None:
+        HTTPAdapter.send = self._send
+        unused = sum(len(queue) for queue in self._queues.values())
+        print_summary(self.served, f"Replayed requests ({unused} recorded unused)")
+
+
+def print_summary(exchanges: List[Dict[str, Any]], title: str) -> None:
+    """Print number of requests and total recorded latency by host."""
+    counts: Counter = Counter()
+    latency: Counter = Counter()
+    for exchange in exchanges:
+        counts[exchange["host"]] += 1
+        latency[exchange["host"]] += exchange["elapsed"]
+
+    print(f"{title}:")
+    for host, count in counts.most_common():
+        print(f"  {host}: {count} requests, {latency[host]:.2f} s")
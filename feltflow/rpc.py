@@ -0,0 +1,233 @@
+"""Module for batched and cached reads of on-chain state through JSON-RPC."""
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from brownie import web3
+from ocean_lib.ocean.ocean import Ocean
+
+from feltflow.metrics import LATENCY, cache_lookup
+from feltflow.scheduler import Scheduler, get_scheduler
+
+TIMEOUT = 30
+
+
+class RpcReader:
+    """Class coalescing JSON-RPC reads into batch requests and caching results.
+
+    Reads submitted within short `window` (e.g. from multiple threads) are sent
+    together as single JSON-RPC batch request. Batching is used only with HTTP
+    nodes, other connections (websocket, IPC) send the requests one by one through
+    the web3 provider. Immutable reads (symbols, template
+    ids, exchange ids) are cached permanently, other reads are cached per block.
+    """
+
+    def __init__(
+        self,
+        rpc_url: str,
+        block_time: float = 2.0,
+        window: float = 0.005,
+        provider: Optional[Any] = None,
+    ):
+        """
+        Args:
+            rpc_url: URL of JSON-RPC node
+            block_time: average block time, used as lifetime of cached block number
+            window: time in seconds for collecting calls into one batch
+            provider: web3 provider used for sending requests if the node isn't
+                connected over HTTP
+        """
+        self.rpc_url = rpc_url
+        self.provider = provider
+        self.block_time = block_time
+        self.window = window
+
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[dict, Future]] = []
+
+        self._immutable: Dict[Any, Any] = {}
+        self._mutable: Dict[Any, Tuple[int, Any]] = {}
+        self._block: Optional[Tuple[float, int]] = None
+
+    def request(self, method: str, params: list) -> Any:
+        """Send JSON-RPC request, it's batched with other concurrent requests."""
+        future = Future()
+        with self._lock:
+            self._pending.append(
+                ({"jsonrpc": "2.0", "method": method, "params": params}, future)
+            )
+            leader = len(self._pending) == 1
+
+        if leader:
+            # First caller waits for other calls and sends the whole batch
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            self._send_batch(batch)
+
+        return future.result()
+
+    def _send_batch(self, batch: List[Tuple[dict, Future]]) -> None:
+        """Send batch of JSON-RPC requests and resolve futures of the callers."""
+        futures = {}
+        payload = []
+        for req, future in batch:
+            req_id = next(self._ids)
+            futures[req_id] = future
+            payload.append({**req, "id": req_id})
+
+        try:
+            with get_scheduler().slot(Scheduler.host(self.rpc_url)):
+                with LATENCY.time(service="rpc"):
+                    responses = self._post(payload)
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+            return
+
+        for response in responses:
+            future = futures.pop(response.get("id"), None)
+            if future is None:
+                continue
+            if "error" in response:
+                future.set_exception(Exception(f"RPC error: {response['error']}"))
+            else:
+                future.set_result(response["result"])
+
+        for future in futures.values():
+            future.set_exception(Exception("Missing response in RPC batch."))
+
+    def _post(self, payload: List[dict]) -> List[dict]:
+        """Send requests as one batch (HTTP) or one by one through web3 provider."""
+        if self.provider is not None:
+            return [
+                {
+                    **self.provider.make_request(req["method"], req["params"]),
+                    "id": req["id"],
+                }
+                for req in payload
+            ]
+
+        res = requests.post(self.rpc_url, json=payload, timeout=TIMEOUT)
+        if res.status_code != 200:
+            raise Exception(f"RPC batch request failed (error: {res.status_code})")
+        responses = res.json()
+        if isinstance(responses, dict):
+            raise Exception(f"RPC batch request failed: {responses}")
+        return responses
+
+    def block_number(self) -> int:
+        """Get current block number, it's cached for duration of one block."""
+        if self._block is None or time.time() - self._block[0] > self.block_time:
+            self._block = (time.time(), int(self.request("eth_blockNumber", []), 16))
+        return self._block[1]
+
+    def invalidate(self) -> None:
+        """Drop cached block state, should be called after sending transaction."""
+        self._block = None
+        self._mutable = {}
+
+    def _cached(self, key: Any, immutable: bool, read):
+        """Return cached value or read and cache new value."""
+        if immutable:
+            hit = key in self._immutable
+            cache_lookup("rpc", hit)
+            if not hit:
+                self._immutable[key] = read()
+            return self._immutable[key]
+
+        block = self.block_number()
+        cached = self._mutable.get(key)
+        hit = cached is not None and cached[0] == block
+        cache_lookup("rpc", hit)
+        if not hit:
+            cached = (block, read())
+            self._mutable[key] = cached
+        return cached[1]
+
+    def call(self, fn: Any, *args, immutable: bool = False) -> Any:
+        """Call read-only contract function (eth_call).
+
+        Args:
+            fn: brownie contract function (e.g. token.balanceOf)
+            args: arguments of the function
+            immutable: cache result permanently instead of per block
+
+        Returns:
+            decoded result of the function
+        """
+        key = (fn._address.lower(), fn.signature, args)
+
+        def read():
+            data = fn.encode_input(*args)
+            result = self.request(
+                "eth_call", [{"to": fn._address, "data": data}, "latest"]
+            )
+            return fn.decode_output(result)
+
+        return self._cached(key, immutable, read)
+
+    def balance(self, address: str) -> int:
+        """Get balance of base currency of account (cached per block)."""
+        return self._cached(
+            ("balance", address.lower()),
+            False,
+            lambda: int(self.request("eth_getBalance", [address, "latest"]), 16),
+        )
+
+    def fee_history(self, blocks: int, percentile: float) -> dict:
+        """Get fee history of recent blocks (eth_feeHistory, cached per block)."""
+        return self._cached(
+            ("fee_history", blocks, percentile),
+            False,
+            lambda: self.request(
+                "eth_feeHistory", [hex(blocks), "latest", [percentile]]
+            ),
+        )
+
+    def gas_price(self) -> int:
+        """Get legacy gas price (cached per block)."""
+        return self._cached(
+            ("gas_price",), False, lambda: int(self.request("eth_gasPrice", []), 16)
+        )
+
+    def exchanges(self, datatoken) -> list:
+        """Get all exchanges of the datatoken (exchange ids are immutable)."""
+        return self._cached(
+            ("exchanges", datatoken.address.lower()), True, datatoken.get_exchanges
+        )
+
+    def template_id(self, datatoken) -> int:
+        """Get template id of the datatoken."""
+        return self.call(datatoken.getId, immutable=True)
+
+    def symbol(self, token) -> str:
+        """Get symbol of ERC20 token."""
+        return self.call(token.symbol, immutable=True)
+
+
+# Readers by chainId
+_READERS: Dict[int, RpcReader] = {}
+
+
+def endpoint_uri(provider: Any) -> str:
+    """Get URI of node of web3 provider (URL or path of IPC socket)."""
+    uri = getattr(provider, "endpoint_uri", None) or getattr(provider, "ipc_path", "")
+    return str(uri)
+
+
+def get_reader(ocean: Ocean) -> RpcReader:
+    """Get shared reader for chain of given ocean object."""
+    chain_id = ocean.config_dict["chainId"]
+    if chain_id not in _READERS:
+        uri = endpoint_uri(web3.provider)
+        _READERS[chain_id] = RpcReader(
+            uri,
+            ocean.config_dict.get("BLOCK_TIME", 2.0),
+            provider=None if uri.startswith("http") else web3.provider,
+        )
+    return _READERS[chain_id]
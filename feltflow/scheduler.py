@@ -0,0 +1,202 @@
+"""Scheduler limiting concurrency and rate of requests to providers and chains."""
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from feltflow.metrics import SCHEDULER_QUEUE, SCHEDULER_WAIT
+
+# Priorities of requests, lower value is served first
+PRIORITY_AGGREGATION = 0
+PRIORITY_TRAINING = 1
+
+
+@dataclass
+class Limits:
+    """Limits of one host.
+
+    Args:
+        concurrency: maximal number of requests running at once
+        rate: maximal average number of requests per second (None for unlimited)
+        burst: number of requests which can be sent at once above the rate
+    """
+
+    concurrency: int = 4
+    rate: Optional[float] = 5.0
+    burst: int = 10
+
+
+class TokenBucket:
+    """Token bucket rate limiter, it isn't thread-safe (used under scheduler lock)."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take one token.
+
+        Returns:
+            seconds to wait before the token can be used
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Negative tokens are reservations of following requests
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+class _Host:
+    def __init__(self, limits: Limits):
+        self.limits = limits
+        self.bucket = TokenBucket(limits.rate, limits.burst) if limits.rate else None
+        self.active = 0
+        self.active_by_owner: Counter = Counter()
+        # Waiting requests (priority, sequence number, owner)
+        self.waiting: List[Tuple[int, int, Any]] = []
+
+    def next(self) -> Tuple[int, int, Any]:
+        """Request which should get the next free slot."""
+        return min(
+            self.waiting,
+            key=lambda entry: (entry[0], self.active_by_owner[entry[2]], entry[1]),
+        )
+
+
+class Scheduler:
+    """Central scheduler of requests to provider endpoints, RPC nodes and chains.
+
+    Each host (provider or RPC host, "chain:<chainId>" for transactions) has limit
+    of concurrent requests and token bucket rate limit (configured per chain by
+    `ChainConfig.limits`, defaults by command line). Rate limit is waited out
+    before request waits for concurrency slot, so sleeping requests don't hold
+    slots. Waiting requests get free
+    slots by priority (aggregations before local trainings), requests of same
+    priority are shared fairly among owners (trainings) - owner with fewer running
+    requests goes first, then first come first served.
+
+    Priority and owner are taken from the scheduling context of the thread, so
+    nested requests (e.g. transactions sent while starting job) inherit them.
+    Slot of host already held by the thread is reused, nested request doesn't wait.
+    """
+
+    def __init__(
+        self,
+        default_limits: Optional[Limits] = None,
+        limits: Optional[Dict[str, Limits]] = None,
+    ):
+        """
+        Args:
+            default_limits: limits of hosts without explicit limits
+            limits: limits of specific hosts {host: Limits}
+        """
+        self.default_limits = default_limits or Limits()
+        self.limits = dict(limits or {})
+        self._hosts: Dict[str, _Host] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._local = threading.local()
+
+    @staticmethod
+    def host(url: str) -> str:
+        """Host key of URL (host and port), other keys are kept unchanged."""
+        return urlparse(url).netloc or url
+
+    def configure(self, host: str, limits: Limits) -> None:
+        """Set limits of host, must be called before first request to the host."""
+        with self._cond:
+            self.limits[host] = limits
+            self._hosts.pop(host, None)
+
+    def configure_default(self, limits: Limits) -> None:
+        """Set limits of hosts without explicit limits (before first request)."""
+        with self._cond:
+            self.default_limits = limits
+            for host in list(self._hosts):
+                if host not in self.limits:
+                    del self._hosts[host]
+
+    @contextmanager
+    def context(self, priority: int, owner: Any = None) -> Iterator[None]:
+        """Set priority and owner of requests made by the thread in the block."""
+        previous = getattr(self._local, "context", None)
+        self._local.context = (priority, owner)
+        try:
+            yield
+        finally:
+            self._local.context = previous
+
+    @contextmanager
+    def slot(self, host: str, priority: Optional[int] = None) -> Iterator[None]:
+        """Wait for free slot of the host and hold it during the block.
+
+        Args:
+            host: host key (see `Scheduler.host`)
+            priority: priority of request, priority of thread context by default
+        """
+        held = self._local.__dict__.setdefault("held", set())
+        if host in held:
+            yield
+            return
+
+        context_priority, owner = getattr(self._local, "context", None) or (
+            PRIORITY_TRAINING,
+            None,
+        )
+        entry = (
+            context_priority if priority is None else priority,
+            next(self._seq),
+            owner,
+        )
+
+        start = time.time()
+        with self._cond:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host(
+                    self.limits.get(host, self.default_limits)
+                )
+            delay = state.bucket.reserve() if state.bucket else 0.0
+
+        # Rate limit is waited out before taking concurrency slot
+        if delay:
+            time.sleep(delay)
+
+        with self._cond:
+            state.waiting.append(entry)
+            SCHEDULER_QUEUE.set(len(state.waiting), host=host)
+            while state.active >= state.limits.concurrency or state.next() is not entry:
+                self._cond.wait()
+
+            state.waiting.remove(entry)
+            state.active += 1
+            state.active_by_owner[owner] += 1
+            SCHEDULER_QUEUE.set(len(state.waiting), host=host)
+            # Next waiting request can take another free slot
+            self._cond.notify_all()
+
+        try:
+            SCHEDULER_WAIT.observe(time.time() - start, host=host)
+            held.add(host)
+            yield
+        finally:
+            held.discard(host)
+            with self._cond:
+                state.active -= 1
+                state.active_by_owner[owner] -= 1
+                self._cond.notify_all()
+
+
+_SCHEDULER = Scheduler()
+
+
+def get_scheduler() -> Scheduler:
+    """Get scheduler shared by the whole process."""
+    return _SCHEDULER
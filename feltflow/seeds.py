@@ -0,0 +1,33 @@
+"""Reproducible seeds of local trainings."""
+from typing import List, Optional
+
+import numpy as np
+
+
+class SeedStream:
+    """Stream of seeds derived from single run entropy using NumPy SeedSequence.
+
+    Seed of each local training is spawned by key (round, client), so same entropy
+    gives same seeds independently of order or number of rounds and clients.
+    """
+
+    def __init__(self, entropy: Optional[int] = None):
+        """
+        Args:
+            entropy: entropy of the run, random if not provided
+        """
+        self.entropy: int = np.random.SeedSequence(entropy).entropy
+
+    def seed(self, round: int, client: int) -> int:
+        """Get seed of client's local training in given round."""
+        sequence = np.random.SeedSequence(self.entropy, spawn_key=(round, client))
+        # 53 bits, so the seed is exactly representable in JavaScript (FELT backend)
+        return int(sequence.generate_state(1, np.uint64)[0] >> 11)
+
+    def seeds(self, round: int, n_clients: int) -> List[int]:
+        """Get seeds of all clients in given round."""
+        return [self.seed(round, client) for client in range(n_clients)]
+
+    def key(self, round: int, client: int) -> dict:
+        """Description of the seed which allows reproducing it."""
+        return {"entropy": str(self.entropy), "round": round, "client": client}
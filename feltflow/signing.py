@@ -0,0 +1,33 @@
+"""Nonce allocation for signed provider requests."""
+import threading
+import time
+
+
+class NonceAllocator:
+    """Thread-safe allocator of strictly increasing nonces (millisecond timestamps).
+
+    Nonces follow the clock, but two calls never get the same nonce, even if they
+    happen in the same millisecond or the clock goes backwards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = 0
+
+    def next(self, ahead: int = 0) -> int:
+        """Allocate new nonce.
+
+        Args:
+            ahead: milliseconds by which the nonce should be ahead of current time
+        """
+        with self._lock:
+            self._last = max(self._last + 1, int(time.time() * 1000) + ahead)
+            return self._last
+
+
+_ALLOCATOR = NonceAllocator()
+
+
+def get_nonce_allocator() -> NonceAllocator:
+    """Get nonce allocator shared by the whole process."""
+    return _ALLOCATOR
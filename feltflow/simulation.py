@@ -0,0 +1,284 @@
+"""Federated simulation running many virtual clients on one multi-core machine."""
+import json
+import os
+import time
+from base64 import b64encode
+from multiprocessing import get_start_method, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import numpy as np
+from nacl.public import PrivateKey
+
+from feltflow.backends.local import LocalBackend
+from feltflow.compression import decode_model
+from feltflow.federated_training import FederatedTraining
+
+
+class SharedModel:
+    """Model weights (NumPy arrays) stored in single shared memory block.
+
+    Clients get only small descriptor of the block instead of serialized weights.
+    """
+
+    def __init__(self, weights: Dict[str, Any]):
+        arrays = {k: np.asarray(v, dtype=np.float64) for k, v in weights.items()}
+        self.shm = SharedMemory(
+            create=True, size=max(sum(a.nbytes for a in arrays.values()), 1)
+        )
+
+        self.layout = []
+        offset = 0
+        for name, array in arrays.items():
+            view = np.ndarray(array.shape, np.float64, self.shm.buf, offset)
+            view[...] = array
+            self.layout.append([name, list(array.shape), offset])
+            offset += array.nbytes
+
+    def descriptor(self) -> Dict[str, Any]:
+        return {"name": self.shm.name, "layout": self.layout}
+
+    def release(self) -> None:
+        """Free the shared memory block."""
+        self.shm.close()
+        self.shm.unlink()
+
+
+def load_weights(descriptor: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Copy model weights from shared memory block (used by clients)."""
+    shm = SharedMemory(name=descriptor["name"])
+    # Block is owned by the parent process, spawned workers have own resource
+    # tracker which would unlink the block on exit (forked share parent's one)
+    if get_start_method() != "fork":
+        resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        return {
+            name: np.ndarray(shape, np.float64, shm.buf, offset).copy()
+            for name, shape, offset in descriptor["layout"]
+        }
+    finally:
+        shm.close()
+
+
+def _read_url(url: str) -> bytes:
+    """Read content of model URL (file:// URLs from local backend)."""
+    return Path(url2pathname(urlparse(url).path)).read_bytes()
+
+
+def train_linear(data_paths: List[str], algocustomdata: dict, output_dir: str):
+    """Reference training algorithm - linear regression by gradient descent.
+
+    Last column of the client data is used as target.
+    """
+    data = np.load(data_paths[0])
+    X, y = data[:, :-1], data[:, -1]
+
+    weights = load_weights(algocustomdata["shared_weights"])
+    coef, intercept = weights["coef"], weights["intercept"]
+    rng = np.random.default_rng(algocustomdata.get("seed", 0))
+    lr = algocustomdata.get("learning_rate", 0.01)
+
+    for _ in range(algocustomdata.get("epochs", 10)):
+        idx = rng.permutation(len(y))
+        error = X[idx] @ coef + intercept - y[idx]
+        coef = coef - lr * X[idx].T @ error / len(y)
+        intercept = intercept - lr * error.mean()
+
+    model = {
+        "weights": {"coef": coef.tolist(), "intercept": intercept.tolist()},
+        "sample_size": len(y),
+    }
+    with open(os.path.join(output_dir, "model"), "w") as f:
+        json.dump(model, f)
+
+
+def aggregate_mean(data_paths: List[str], algocustomdata: dict, output_dir: str):
+    """Reference aggregation algorithm - FedAvg weighted by sample size.
+
+    Local models can be compressed ("weights_update", see `ModelCompressor`).
+    """
+    models = [json.loads(_read_url(u["url"])) for u in algocustomdata["model_urls"]]
+    for model in models:
+        if "weights_update" in model:
+            model["weights"] = decode_model(model.pop("weights_update"))
+    sizes = np.array(
+        algocustomdata.get("sample_sizes") or [m["sample_size"] for m in models],
+        dtype=np.float64,
+    )
+
+    weights = {
+        name: np.tensordot(
+            sizes / sizes.sum(),
+            np.array([m["weights"][name] for m in models]),
+            axes=1,
+        ).tolist()
+        for name in models[0]["weights"]
+    }
+    model = {"weights": weights, "sample_size": int(sizes.sum())}
+    with open(os.path.join(output_dir, "model"), "w") as f:
+        json.dump(model, f)
+
+
+# Schema of models produced by the reference algorithms
+MODEL_SCHEMA = {
+    "type": "object",
+    "required": ["weights", "sample_size"],
+    "properties": {"weights": {"type": "object"}, "sample_size": {"type": "integer"}},
+}
+
+
+class SimulationStorage:
+    """Storage replacement keeping jobs data in memory instead of FELT backend."""
+
+    def __init__(self):
+        self.local_trainings = []
+        self.aggregations = []
+
+    def create_job(self) -> None:
+        pass
+
+    def add_local_training(self, round: str, seed: int, *args, **kwargs) -> None:
+        self.local_trainings.append((round, seed))
+
+    def add_aggregation(self, round: str, *args, **kwargs) -> None:
+        self.aggregations.append(round)
+
+
+class SimulatedTraining(FederatedTraining):
+    """Federated training passing model weights to clients through shared memory."""
+
+    def __init__(self, *args, **kwargs):
+        self._shared: List[SharedModel] = []
+        super().__init__(*args, **kwargs)
+
+    def _model_payload(self, model: dict) -> dict:
+        # Weights of previous round are not used by any client anymore
+        self.release()
+        shared = SharedModel(model["weights"])
+        self._shared.append(shared)
+
+        payload = {k: v for k, v in model.items() if k != "weights"}
+        payload["shared_weights"] = shared.descriptor()
+        return payload
+
+    def release(self) -> None:
+        """Free shared memory used by the model weights."""
+        while self._shared:
+            self._shared.pop().release()
+
+
+class Simulation:
+    """Simulation of federated learning over local dataset split into N clients.
+
+    It reuses the round structure of FederatedTraining (local trainings,
+    aggregation, latest model) with local backend running on all cores.
+    """
+
+    def __init__(
+        self,
+        data_path: str,
+        n_clients: int,
+        model: Dict[str, Any],
+        training: str = "feltflow.simulation:train_linear",
+        aggregation: str = "feltflow.simulation:aggregate_mean",
+        work_dir: str = ".feltflow/simulation",
+        max_workers: Optional[int] = None,
+        seed: int = 0,
+        aggregation_fan_out: Optional[int] = None,
+    ):
+        """
+        Args:
+            data_path: path to dataset (.npy or .csv file), samples are rows
+            n_clients: number of virtual clients
+            model: initial model {"weights": {name: array}, ...}
+            training: training function ("module:function")
+            aggregation: aggregation function ("module:function")
+            work_dir: directory for client data and job outputs
+            max_workers: number of worker processes (number of CPUs by default)
+            seed: seed used for partitioning the dataset and seeds of clients
+            aggregation_fan_out: maximal number of models per aggregation job
+        """
+        assert n_clients >= 2, "Simulation requires at least 2 clients"
+        self.n_clients = n_clients
+        self.work_dir = Path(work_dir)
+
+        datasets = self._partition(data_path, seed)
+        datasets["empty"] = ""
+        self.backend = LocalBackend(
+            datasets,
+            {"training": training, "aggregation": aggregation},
+            str(self.work_dir / "jobs"),
+            max_workers,
+        )
+        self.storage = SimulationStorage()
+        self.training = SimulatedTraining(
+            None,
+            self.storage,
+            b64encode(bytes(PrivateKey.generate().public_key)).decode("utf-8"),
+            "simulation",
+            [f"client-{i}" for i in range(n_clients)],
+            {
+                "assets": {
+                    "training": "training",
+                    "aggregation": "aggregation",
+                    "emptyDataset": "empty",
+                },
+                "modelSchema": MODEL_SCHEMA,
+            },
+            model,
+            backend=self.backend,
+            seed=seed,
+            aggregation_fan_out=aggregation_fan_out,
+        )
+        self.training.poll_interval = 0.05
+        # Local backend doesn't sign anything, account only identifies jobs owner
+        self.account = SimpleNamespace(address="simulation")
+
+    def _partition(self, data_path: str, seed: int) -> Dict[str, str]:
+        """Shuffle dataset and split it into client shards stored as .npy files."""
+        if data_path.endswith(".npy"):
+            data = np.load(data_path)
+        else:
+            data = np.loadtxt(data_path, delimiter=",", ndmin=2)
+
+        shards_dir = self.work_dir / "clients"
+        shards_dir.mkdir(parents=True, exist_ok=True)
+
+        indices = np.random.default_rng(seed).permutation(len(data))
+        datasets = {}
+        for i, shard in enumerate(np.array_split(indices, self.n_clients)):
+            path = shards_dir / f"client-{i}.npy"
+            np.save(path, data[shard])
+            datasets[f"client-{i}"] = str(path)
+        return datasets
+
+    def run(self, rounds: int = 1) -> Dict[str, Any]:
+        """Run simulation and measure its throughput.
+
+        Returns:
+            final model, duration of rounds and throughput in client updates per
+            second (of local training stage and of whole rounds)
+        """
+        start = time.time()
+        try:
+            self.training.run(self.account, iterations=rounds)
+            model = self.training.latest_model(self.account)
+        finally:
+            self.training.release()
+            self.backend.close()
+        duration = time.time() - start
+
+        # History of rounds is bounded, total is accumulated by the training
+        training_time = self.training.training_duration
+        updates = self.n_clients * rounds
+        return {
+            "model": model,
+            "duration": duration,
+            "training_duration": training_time,
+            "client_updates_per_second": updates / training_time,
+            "round_updates_per_second": updates / duration,
+        }
@@ -1,38 +1,26 @@
 import time
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional
 
 import requests
 from ocean_lib.services.service import Service
 
-query = """
- query TokenPriceQuery($datatokenId: ID!, $account: String) {
+from feltflow.metadata_cache import get_metadata_cache
+from feltflow.metrics import LATENCY
+from feltflow.order_index import get_order_index
+
+# Seconds for which immutable datatoken details (exchanges, dispensers) are cached
+TOKEN_TTL = 24 * 3600
+
+# Details of datatoken which don't change (price and state are queried separately)
+token_query = """
+ query TokenQuery($datatokenId: ID!) {
     token(id: $datatokenId) {
       id
       symbol
       name
       templateId
-      publishMarketFeeAddress
-      publishMarketFeeToken
-      publishMarketFeeAmount
-      orders(
-        where: { payer: $account }
-        orderBy: createdTimestamp
-        orderDirection: desc
-      ) {
-        tx
-        serviceIndex
-        createdTimestamp
-        reuses(orderBy: createdTimestamp, orderDirection: desc) {
-          id
-          caller
-          createdTimestamp
-          tx
-          block
-        }
-      }
       dispensers {
         id
-        active
         isMinter
         maxBalance
         token {
@@ -44,8 +32,6 @@ query = """
       fixedRateExchanges {
         id
         exchangeId
-        price
-        publishMarketSwapFee
         baseToken {
           symbol
           name
@@ -57,13 +43,71 @@ query = """
           name
           address
         }
+      }
+    }
+  }
+"""
+
+# Current prices, fees and state of exchanges and dispensers of datatoken
+price_query = """
+ query TokenPriceQuery($datatokenId: ID!) {
+    token(id: $datatokenId) {
+      publishMarketFeeAddress
+      publishMarketFeeToken
+      publishMarketFeeAmount
+      dispensers {
+        id
+        active
+      }
+      fixedRateExchanges {
+        id
+        price
+        publishMarketSwapFee
         active
       }
     }
   }
 """
 
-SUBGRAPH_URLS = {"polygon-test": "https://v4.subgraph.mumbai.oceanprotocol.com"}
+
+def _query_token(subgraph_url: str, query: str, datatoken_id: str) -> Dict[str, Any]:
+    with LATENCY.time(service="subgraph"):
+        res = requests.post(
+            f"{subgraph_url}/subgraphs/name/oceanprotocol/ocean-subgraph",
+            "",
+            json={"query": query, "variables": {"datatokenId": datatoken_id}},
+        )
+
+    if res.status_code != 200:
+        raise Exception(f"Unable to collect access details (error: {res.status_code}")
+    token = res.json()["data"]["token"]
+    if token is None:
+        raise Exception(f"Datatoken {datatoken_id} not found in subgraph")
+    return token
+
+
+def _merge_price(
+    token: Dict[str, Any], price: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Merge cached token details with current prices and state.
+
+    Returns:
+        merged token data or None if exchanges or dispensers of the token changed
+    """
+    merged = {**token}
+    for name in [
+        "publishMarketFeeAddress",
+        "publishMarketFeeToken",
+        "publishMarketFeeAmount",
+    ]:
+        merged[name] = price[name]
+
+    for name in ["dispensers", "fixedRateExchanges"]:
+        current = {item["id"]: item for item in price[name]}
+        if set(current) != {item["id"] for item in token[name]}:
+            return None
+        merged[name] = [{**item, **current[item["id"]]} for item in token[name]]
+    return merged
 
 
 def _access_details_from_token_price(
@@ -137,26 +181,56 @@ def _access_details_from_token_price(
     return access_details
 
 
+def _uncached(key: Any, fn: Callable[[], Any]) -> Any:
+    return fn()
+
+
 def get_access_details(
     service: Service,
-    chain_id: str,
+    subgraph_url: str,
     account: str,
+    cached: Callable[[Any, Callable[[], Any]], Any] = _uncached,
 ) -> Dict[str, Any]:
-    datatoken_id = service.datatoken
-    res = requests.post(
-        f"{SUBGRAPH_URLS[chain_id]}/subgraphs/name/oceanprotocol/ocean-subgraph",
-        "",
-        json={
-            "query": query,
-            "variables": {
-                "account": account.lower(),
-                "datatokenId": datatoken_id.lower(),
-            },
-        },
+    """Get access details (price and valid order) of service datatoken.
+
+    Args:
+        service: service which datatoken is used
+        subgraph_url: URL of ocean subgraph
+        account: address of account ordering the service
+        cached: function `cached(key, fn)` memoizing price and sync of orders,
+            used by backends to query them only once per round
+
+    Returns:
+        access details in same format as ocean.js
+    """
+    datatoken_id = service.datatoken.lower()
+    cache = get_metadata_cache()
+    key = f"{subgraph_url}|{datatoken_id}"
+
+    token = cache.cached(
+        "token",
+        key,
+        TOKEN_TTL,
+        lambda: _query_token(subgraph_url, token_query, datatoken_id),
+    )
+    price = cached(
+        ("price", key),
+        lambda: _query_token(subgraph_url, price_query, datatoken_id),
     )
+    token_price_data = _merge_price(token, price)
+    if token_price_data is None:
+        # Exchange or dispenser was added, cached details are outdated
+        token = _query_token(subgraph_url, token_query, datatoken_id)
+        cache.put("token", key, token)
+        token_price_data = _merge_price(token, price)
 
-    if res.status_code != 200:
-        raise Exception(f"Unable to collect access details (error: {res.status_code}")
+    # Orders are taken from local index synced incrementally from subgraph
+    order_index = get_order_index()
+    cached(
+        ("orders", subgraph_url, account.lower()),
+        lambda: order_index.sync(subgraph_url, account),
+    )
+    order = order_index.latest_order(subgraph_url, account, datatoken_id)
+    token_price_data["orders"] = [order] if order else []
 
-    token_price_data = res.json()["data"]["token"]
     return _access_details_from_token_price(token_price_data, service.timeout)
@@ -1,21 +1,33 @@
 import argparse
+import hashlib
 import json
 import logging
 import os
 import sys
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 from typing import List, Optional, cast
 
-# Turn off info logging (must be before ocean_lib imports)
-logging.basicConfig(level=logging.ERROR)
-
 from brownie.network import accounts
 from dotenv import load_dotenv
 
+from feltflow.artifact_store import ArtifactStore
+from feltflow.backends.ocean_c2d import OceanBackend
 from feltflow.cloud_storage import CloudStorage
-from feltflow.config import get_ocean
+from feltflow.compression import ModelCompressor
+from feltflow.config import get_ocean, load_chains
+from feltflow.environments import get_selector
 from feltflow.federated_training import FederatedTraining
+from feltflow.journal import RunJournal
+from feltflow.metrics import serve, start_textfile_writer, write_textfile
+from feltflow.plan import plan_training, print_plan
+from feltflow.profiling import Profiler
+from feltflow.replay import Recorder, Replayer
+from feltflow.rpc import get_reader
+from feltflow.scheduler import Limits, get_scheduler
 
+# Turn off info logging, force replaces handlers set up by ocean_lib on import
+logging.basicConfig(level=logging.ERROR, force=True)
 load_dotenv()
 
 # Use environment variables to set infura and private key
@@ -28,6 +40,28 @@ class Config:
     launch_token: str
     api_endpoint: str
     algocustomdata: dict = field(default_factory=dict)
+    compress_payload: bool = False
+    allow_paid_environments: bool = False
+    artifact_url: Optional[str] = None
+    artifact_upload_url: Optional[str] = None
+    artifact_dir: str = ".feltflow/artifacts"
+    journal_dir: str = ".feltflow/runs"
+    chains_file: Optional[str] = None
+    plan: bool = False
+    compression: Optional[str] = None
+    compression_delta: bool = False
+    compression_top_k: Optional[float] = None
+    compression_tolerance: float = 0.05
+    seed: Optional[int] = None
+    profile: bool = False
+    metrics_port: Optional[int] = None
+    metrics_file: Optional[str] = None
+    aggregation_fan_out: Optional[int] = None
+    record: Optional[str] = None
+    replay: Optional[str] = None
+    replay_latency_scale: float = 1.0
+    request_concurrency: int = 4
+    request_rate: Optional[float] = 5.0
 
 
 def _help_exit(parser, error_msg=None):
@@ -65,7 +99,10 @@ def _parse_training_args(args_str: Optional[List[str]] = None) -> Config:
         "--algocustomdata",
         type=lambda s: json.loads(s),
         default={},
-        help="Custom data which will be passed to algorithm during run (passed as string representing JSON).",
+        help=(
+            "Custom data which will be passed to algorithm during run (passed as "
+            "string representing JSON)."
+        ),
     )
     parser.add_argument(
         "--api_endpoint",
@@ -73,8 +110,183 @@ def _parse_training_args(args_str: Optional[List[str]] = None) -> Config:
         default="https://app.feltlabs.ai",
         help="API endpoint URL for storing jobs data.",
     )
+    parser.add_argument(
+        "--compress_payload",
+        action="store_true",
+        help=(
+            "Send large compute start payloads (models) gzip encoded if provider "
+            "accepts it."
+        ),
+    )
+    parser.add_argument(
+        "--allow_paid_environments",
+        action="store_true",
+        help=(
+            "Use paid compute environments when provider has no suitable free "
+            "environment."
+        ),
+    )
+    parser.add_argument(
+        "--artifact_url",
+        type=str,
+        default=None,
+        help=(
+            "Base URL (reachable by provider) serving model artifacts. If set, models "
+            "are passed to jobs by URL and hash."
+        ),
+    )
+    parser.add_argument(
+        "--artifact_upload_url",
+        type=str,
+        default=None,
+        help="URL of HTTP server accepting PUT uploads of model artifacts.",
+    )
+    parser.add_argument(
+        "--artifact_dir",
+        type=str,
+        default=".feltflow/artifacts",
+        help="Local directory for storing model artifacts.",
+    )
+    parser.add_argument(
+        "--journal_dir",
+        type=str,
+        default=".feltflow/runs",
+        help="Local directory for storing journals of training runs.",
+    )
+    parser.add_argument(
+        "--chains_file",
+        type=str,
+        default=None,
+        help=(
+            "JSON file with extra chain configurations (RPC, subgraph, aquarius, "
+            "providers)."
+        ),
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=["float32", "float16", "int8"],
+        default=None,
+        help="Exchange model weights with local trainings quantized to given dtype.",
+    )
+    parser.add_argument(
+        "--compression_delta",
+        action="store_true",
+        help=(
+            "Send compressed weights as delta against previous round together with "
+            "base model (requires --artifact_url)."
+        ),
+    )
+    parser.add_argument(
+        "--compression_top_k",
+        type=float,
+        default=None,
+        help=(
+            "Fraction of largest values of compressed delta sent each round (top-k "
+            "sparsification, requires --compression_delta)."
+        ),
+    )
+    parser.add_argument(
+        "--compression_tolerance",
+        type=float,
+        default=0.05,
+        help=(
+            "Maximal relative error of aggregation with compressed weights checked "
+            "before training."
+        ),
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help=(
+            "Entropy of local training seeds, same value reproduces seeds of all "
+            "rounds (random by default)."
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Profile CPU, memory and sockets of the run, report is stored next to the "
+            "run journal."
+        ),
+    )
+    parser.add_argument(
+        "--aggregation_fan_out",
+        type=int,
+        default=None,
+        help=(
+            "Maximal number of models aggregated by one job, more models are "
+            "aggregated hierarchically in groups."
+        ),
+    )
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        default=None,
+        help="Expose Prometheus metrics of the run on http://127.0.0.1:<port>/metrics.",
+    )
+    parser.add_argument(
+        "--metrics_file",
+        type=str,
+        default=None,
+        help=(
+            "Periodically write Prometheus metrics to file (node exporter textfile "
+            "collector)."
+        ),
+    )
+    parser.add_argument(
+        "--request_concurrency",
+        type=int,
+        default=4,
+        help="Default limit of concurrent requests per host (provider, RPC node).",
+    )
+    parser.add_argument(
+        "--request_rate",
+        type=float,
+        default=5.0,
+        help="Default limit of requests per second per host.",
+    )
+    parser.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        help=(
+            "Record all outbound requests with their timings to file (gzipped JSON "
+            "lines)."
+        ),
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        help=(
+            "Serve responses from recording instead of network (use with same --seed)."
+        ),
+    )
+    parser.add_argument(
+        "--replay_latency_scale",
+        type=float,
+        default=1.0,
+        help="Multiplier of recorded latencies during replay (0 for no delays).",
+    )
+
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only estimate transactions, spend and duration of training (dry run).",
+    )
 
     args = parser.parse_args(args_str)
+    if args.record and args.replay:
+        _help_exit(parser, "Options --record and --replay can't be used together.")
+    if (args.compression_delta or args.compression_top_k) and not args.compression:
+        _help_exit(parser, "Compression options require --compression.")
+    if args.compression_delta and not args.artifact_url:
+        _help_exit(parser, "Option --compression_delta requires --artifact_url.")
+    if args.compression_top_k and not args.compression_delta:
+        _help_exit(parser, "Option --compression_top_k requires --compression_delta.")
     return cast(Config, args)
 
 
@@ -82,6 +294,31 @@ def main(config: Optional[Config] = None, args_str: Optional[List[str]] = None)
     if config is None:
         config = _parse_training_args(args_str)
 
+    if config.chains_file:
+        load_chains(config.chains_file)
+    get_scheduler().configure_default(
+        Limits(concurrency=config.request_concurrency, rate=config.request_rate)
+    )
+    get_selector().allow_paid = config.allow_paid_environments
+
+    network = nullcontext()
+    if config.record:
+        network = Recorder(config.record)
+    elif config.replay:
+        network = Replayer(config.replay, config.replay_latency_scale)
+
+    with network:
+        _run(config)
+
+
+def _run(config: Config) -> None:
+    """Run training of the job (all outbound requests are made from here)."""
+    if config.metrics_port is not None:
+        serve(config.metrics_port)
+    metrics_writer = (
+        start_textfile_writer(config.metrics_file) if config.metrics_file else None
+    )
+
     storage = CloudStorage(config.api_endpoint, config.launch_token)
     job = storage.get_job()
 
@@ -96,7 +333,29 @@ def main(config: Optional[Config] = None, args_str: Optional[List[str]] = None)
     print("FELT Labs: Starting training")
     print(f"  Chain ID: {job['chainId']}")
     print(f"  Using account: {account.address}")
-    print(f"    Account balance: {account.balance()}")
+    print(f"    Account balance: {get_reader(ocean).balance(account.address)}")
+
+    if config.plan:
+        print_plan(plan_training(ocean, job, account.address, config.journal_dir))
+        return
+
+    artifact_store = None
+    if config.artifact_url:
+        artifact_store = ArtifactStore(
+            config.artifact_url, config.artifact_dir, config.artifact_upload_url
+        )
+
+    compression = None
+    if config.compression:
+        compression = ModelCompressor(
+            config.compression,
+            config.compression_top_k,
+            config.compression_delta,
+            tolerance=config.compression_tolerance,
+        )
+
+    run_id = hashlib.sha256(config.launch_token.encode("utf-8")).hexdigest()[:16]
+    journal = RunJournal(os.path.join(config.journal_dir, run_id))
 
     federated_training = FederatedTraining(
         ocean,
@@ -106,7 +365,20 @@ def main(config: Optional[Config] = None, args_str: Optional[List[str]] = None)
         job["dataDIDs"],
         job["algoConfig"],
         job["algoCustomData"] if not config.algocustomdata else config.algocustomdata,
+        artifact_store,
+        journal,
+        compression=compression,
+        seed=config.seed,
+        backend=OceanBackend(ocean, compress_payload=config.compress_payload),
+        aggregation_fan_out=config.aggregation_fan_out,
     )
-    federated_training.run(account, iterations=1)
+    profiler = Profiler(journal.run_dir) if config.profile else nullcontext()
+    try:
+        with profiler:
+            federated_training.run(account, iterations=1)
+    finally:
+        if metrics_writer:
+            metrics_writer.set()
+            write_textfile(config.metrics_file)
 
     print(f"Training finished! View the results at: {config.api_endpoint}/jobs")
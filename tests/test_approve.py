@@ -0,0 +1,102 @@
+"""Test approvals of concurrent orders."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from feltflow import approve
+from feltflow.approve import Approve
+
+OWNER = "0xowner"
+SPENDER = "0xdatatoken"
+
+
+class _Token:
+    """ERC20 stand-in, order spends allowance of the spender."""
+
+    def __init__(self, balance: int):
+        self.balance = balance
+        self.allowances = {}
+        self.approvals = 0
+        self.lock = threading.Lock()
+
+    def balanceOf(self, owner):
+        return self.balance
+
+    def allowance(self, owner, spender):
+        return self.allowances.get(spender, 0)
+
+    def approve(self, spender, amount, tx_dict):
+        # Approve overwrites the allowance
+        time.sleep(0.01)
+        self.allowances[spender] = amount
+        self.approvals += 1
+
+    def order(self, spender, amount):
+        time.sleep(0.01)
+        with self.lock:
+            if self.allowances.get(spender, 0) < amount:
+                raise Exception("ERC20: insufficient allowance")
+            self.allowances[spender] -= amount
+            self.balance -= amount
+
+
+class _Reader:
+    def call(self, fn, *args, immutable=False):
+        return fn(*args)
+
+    def symbol(self, token):
+        return "OCEAN"
+
+    def invalidate(self):
+        pass
+
+
+@pytest.fixture
+def token(monkeypatch):
+    token = _Token(100)
+    monkeypatch.setattr(approve, "Datatoken1", lambda config, address: token)
+    monkeypatch.setattr(approve, "get_reader", lambda ocean: _Reader())
+    monkeypatch.setattr(
+        approve,
+        "send_transaction",
+        lambda ocean, tx_dict, type, send, replaceable=False: send(tx_dict),
+    )
+    return token
+
+
+@pytest.mark.parametrize("ahead", [1, 3])
+def test_concurrent_orders(token, ahead):
+    ocean = SimpleNamespace(config={}, config_dict={"APPROVE_AHEAD": ahead})
+    errors = []
+
+    def order():
+        approvals = Approve()
+        approvals.add_approve("0xtoken", SPENDER, 10)
+        try:
+            with approvals.approved(ocean, {"from": OWNER}):
+                token.order(SPENDER, 10)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=order) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert token.balance == 40
+    # Allowance approved ahead is reused by following orders
+    assert token.approvals == 6 // ahead
+
+
+def test_insufficient_balance(token):
+    token.balance = 5
+    approvals = Approve()
+    approvals.add_approve("0xtoken", SPENDER, 10)
+    ocean = SimpleNamespace(config={}, config_dict={})
+    with pytest.raises(ValueError, match="balance 5 OCEAN"):
+        with approvals.approved(ocean, {"from": OWNER}):
+            pass
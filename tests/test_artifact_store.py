@@ -0,0 +1,70 @@
+"""Test deduplication of stored and uploaded model artifacts."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from feltflow.artifact_store import ArtifactStore
+from feltflow.metrics import MODEL_BYTES
+
+
+class _Server(BaseHTTPRequestHandler):
+    """Artifact server keeping uploaded artifacts in memory."""
+
+    def do_HEAD(self):
+        self.send_response(200 if self.path in self.server.artifacts else 404)
+        self.end_headers()
+
+    def do_PUT(self):
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.artifacts[self.path] = data
+        self.server.puts += 1
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Server)
+    server.artifacts = {}
+    server.puts = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def _store(tmp_path, server=None) -> ArtifactStore:
+    upload_url = f"http://127.0.0.1:{server.server_port}" if server else None
+    return ArtifactStore("https://artifacts.example.com/", str(tmp_path), upload_url)
+
+
+def test_same_content_stored_once(tmp_path):
+    store = _store(tmp_path)
+    uploaded = MODEL_BYTES.value(direction="upload")
+
+    ref = store.put_json({"b": 1, "a": [1, 2]})
+    assert ref == store.put_json({"a": [1, 2], "b": 1})
+    assert ref["url"] == f"https://artifacts.example.com/{ref['hash']}"
+    assert store.get(ref["hash"]) == b'{"a":[1,2],"b":1}'
+    assert ArtifactStore.hash(store.get(ref["hash"])) == ref["hash"]
+
+    assert [p.name for p in tmp_path.iterdir()] == [ref["hash"]]
+    assert MODEL_BYTES.value(direction="upload") - uploaded == len(b'{"a":[1,2],"b":1}')
+
+
+def test_uploaded_once(tmp_path, server):
+    store = _store(tmp_path / "a", server)
+    uploaded = MODEL_BYTES.value(direction="upload")
+
+    ref = store.put(b"model")
+    store.put(b"model")
+    assert server.artifacts == {f"/{ref['hash']}": b"model"}
+    assert server.puts == 1
+
+    # Artifact already present at server (uploaded by other process) isn't sent
+    _store(tmp_path / "b", server).put(b"model")
+    assert server.puts == 1
+    assert MODEL_BYTES.value(direction="upload") - uploaded == len(b"model")
@@ -0,0 +1,72 @@
+"""Test compression of model weights."""
+import numpy as np
+import pytest
+
+from feltflow.compression import ModelCompressor, decode_model, encode_model
+
+
+def _weights(seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {"coef": rng.normal(size=(20, 50)), "intercept": rng.normal(size=50)}
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+@pytest.mark.parametrize(
+    "delta, top_k",
+    [(False, None), (True, None), (True, 0.5), (True, 0.1), (True, 0.01)],
+)
+def test_verify_default_tolerance(dtype, delta, top_k):
+    compressor = ModelCompressor(dtype, top_k, delta)
+    assert compressor.verify(_weights()) <= compressor.tolerance
+
+
+def test_verify_fails_above_tolerance():
+    compressor = ModelCompressor("int8", 0.01, delta=True, tolerance=1e-4)
+    with pytest.raises(Exception, match="tolerance"):
+        compressor.verify(_weights())
+
+
+def test_top_k_requires_delta():
+    with pytest.raises(AssertionError):
+        ModelCompressor("float16", 0.1)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_encode_model(dtype):
+    weights = _weights()
+    decoded = decode_model(encode_model(weights, dtype))
+    for name, value in weights.items():
+        np.testing.assert_allclose(decoded[name], value, atol=0.05)
+
+
+def test_absolute_compression():
+    compressor = ModelCompressor("float16")
+    weights = _weights()
+    for _ in range(3):
+        assert compressor.base_payload() is None
+        payload, stats = compressor.compress(weights)
+        decoded = decode_model(payload)
+        for name, value in weights.items():
+            np.testing.assert_allclose(decoded[name], value, atol=0.01)
+        assert stats["compressed_bytes"] == stats["baseline_bytes"]
+        assert stats["compressed_bytes"] < stats["raw_bytes"] / 4
+        assert stats["base_bytes"] == 0
+        weights = {k: v + 0.01 for k, v in weights.items()}
+
+
+def test_delta_reconstruction():
+    compressor = ModelCompressor("float16", 0.1, delta=True)
+    weights = _weights()
+    for i in range(5):
+        base = compressor.base_payload()
+        payload, stats = compressor.compress(weights)
+        received = decode_model(payload, base)
+
+        # Receivers reconstruct exactly the model tracked by the compressor
+        flat = np.concatenate([received[k].ravel() for k in weights])
+        np.testing.assert_array_equal(flat, compressor.reference)
+        for name, value in weights.items():
+            np.testing.assert_allclose(received[name], value, atol=0.05)
+        # Base model is sent together with every delta update
+        assert (stats["base_bytes"] > 0) == (i > 0)
+        weights = {k: v + 0.01 for k, v in weights.items()}
@@ -0,0 +1,78 @@
+"""Test registry of chains and caching of Ocean objects."""
+import json
+
+import pytest
+
+from feltflow import config
+
+
+class _Network:
+    def __init__(self):
+        self.active = None
+        self.connects = 0
+
+    def show_active(self):
+        return self.active
+
+    def connect(self, name: str):
+        self.connects += 1
+        self.active = name
+
+
+class _Web3:
+    class provider:
+        endpoint_uri = "http://localhost:8545"
+
+    def connect(self, uri: str):
+        self.provider.endpoint_uri = uri
+
+
+@pytest.fixture
+def chains(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CHAINS", dict(config.CHAINS))
+    monkeypatch.setattr(config, "_OCEANS", {})
+    monkeypatch.setattr(config, "network", _Network())
+    monkeypatch.setattr(config, "web3", _Web3())
+    monkeypatch.setattr(config, "get_config_dict", lambda name: {"NETWORK": name})
+    monkeypatch.setattr(config, "Ocean", lambda conf: {"config": conf})
+
+    path = tmp_path / "chains.json"
+    path.write_text(
+        json.dumps(
+            {
+                "1337": {
+                    "network_name": "development",
+                    "subgraph_url": "http://localhost:9000",
+                    "provider_uris": ["http://localhost:8030"],
+                    "block_time": 1,
+                }
+            }
+        )
+    )
+    config.load_chains(str(path))
+
+
+def test_load_chains(chains):
+    chain = config.get_chain(1337)
+    assert chain.network_name == "development"
+    assert chain.block_time == 1
+    assert config.get_chain(80001).network_name == "polygon-test"
+
+    with pytest.raises(Exception, match="not supported"):
+        config.get_chain(1)
+
+
+def test_ocean_cached(chains):
+    ocean = config.get_ocean(1337)
+    assert ocean is config.get_ocean(1337)
+    assert config.network.connects == 1
+    assert ocean["config"]["chainId"] == 1337
+    assert ocean["config"]["SUBGRAPH_URL"] == "http://localhost:9000"
+    assert ocean["config"]["PROVIDER_URL"] == "http://localhost:8030"
+
+
+def test_one_chain_per_process(chains):
+    config.get_ocean(1337)
+    with pytest.raises(Exception, match="only one chain"):
+        config.get_ocean(80001)
+    assert config.network.active == "development"
@@ -0,0 +1,156 @@
+"""Test requests to provider (gzip encoded start payload and bulk job status)."""
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from feltflow.ocean import data_service_provider
+from feltflow.ocean.data_service_provider import (
+    GZIP_MIN_SIZE,
+    CustomDataServiceProvider,
+)
+
+
+class _Provider(BaseHTTPRequestHandler):
+    """Provider stand-in, gzip and bulk status support are set per server."""
+
+    def do_GET(self):
+        self.server.requests.append("status")
+        if "jobId" in self.path or self.server.bulk:
+            self._reply(200, [{"jobId": "job-1"}, {"jobId": "job-2"}])
+        else:
+            self._reply(400, {"error": "jobId is required"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append(self.headers.get("content-encoding"))
+        if self.headers.get("content-encoding") == "gzip":
+            if not self.server.gzip:
+                self._reply(400, {"error": "Failed to decode JSON object"})
+                return
+            body = gzip.decompress(body)
+
+        payload = json.loads(body)
+        if "dataset" not in payload:
+            self._reply(400, {"error": "dataset is required"})
+        else:
+            self._reply(200, [{"jobId": "job-1"}])
+
+    def _reply(self, status: int, data):
+        content = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(
+        data_service_provider.DataServiceProvider,
+        "_http_method",
+        staticmethod(
+            lambda method, url, **kwargs: requests.request(method, url, **kwargs)
+        ),
+        raising=False,
+    )
+    monkeypatch.setattr(
+        data_service_provider.DataServiceProvider,
+        "build_compute_endpoint",
+        staticmethod(lambda url: ("GET", f"{url}/api/services/compute")),
+        raising=False,
+    )
+    monkeypatch.setattr(
+        data_service_provider.DataServiceProviderBase,
+        "check_response",
+        staticmethod(lambda response, *args: None),
+        raising=False,
+    )
+    monkeypatch.setattr(
+        CustomDataServiceProvider,
+        "sign_message",
+        staticmethod(lambda wallet, msg: ("1", "signature")),
+    )
+    monkeypatch.setattr(CustomDataServiceProvider, "_no_gzip_providers", set())
+    monkeypatch.setattr(CustomDataServiceProvider, "_no_bulk_status_providers", set())
+
+    def serve(gzip_support: bool, bulk: bool = True) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Provider)
+        server.gzip = gzip_support
+        server.bulk = bulk
+        server.requests = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    servers = []
+    yield serve
+    for server in servers:
+        server.shutdown()
+
+
+def _start(server, payload: dict, compress: bool = True) -> requests.Response:
+    url = f"http://127.0.0.1:{server.server_port}"
+    body = json.dumps(payload).encode("utf-8")
+    return CustomDataServiceProvider._post_compute(
+        f"{url}/api/services/compute", url, body, "token", compress
+    )
+
+
+def _payload(**kwargs) -> dict:
+    return {"algocustomdata": {"model": "x" * GZIP_MIN_SIZE}, **kwargs}
+
+
+def test_gzip_accepted(provider):
+    server = provider(True)
+    assert _start(server, _payload(dataset={})).status_code == 200
+    assert server.requests == ["gzip"]
+
+
+def test_small_payload_not_compressed(provider):
+    server = provider(True)
+    assert _start(server, {"dataset": {}}).status_code == 200
+    assert _start(server, _payload(dataset={}), compress=False).status_code == 200
+    assert server.requests == [None, None]
+
+
+def test_gzip_fallback(provider):
+    server = provider(False)
+    assert _start(server, _payload(dataset={})).status_code == 200
+    # Provider is remembered, following payloads are sent as plain JSON at once
+    assert _start(server, _payload(dataset={})).status_code == 200
+    assert server.requests == ["gzip", None, None]
+
+
+def test_validation_error_not_retried(provider):
+    server = provider(True)
+    response = _start(server, _payload())
+    assert response.status_code == 400
+    assert server.requests == ["gzip"]
+
+
+def _status(server) -> list:
+    consumer = type("Consumer", (), {"address": "0x0"})()
+    url = f"http://127.0.0.1:{server.server_port}"
+    return CustomDataServiceProvider.compute_jobs_status(url, consumer)
+
+
+def test_bulk_status(provider):
+    server = provider(True)
+    assert [job["jobId"] for job in _status(server)] == ["job-1", "job-2"]
+    assert [job["jobId"] for job in _status(server)] == ["job-1", "job-2"]
+    assert server.requests == ["status", "status"]
+
+
+def test_bulk_status_unsupported(provider):
+    server = provider(True, bulk=False)
+    assert _status(server) == []
+    # Provider is remembered, no more bulk requests are sent to it
+    assert _status(server) == []
+    assert server.requests == ["status"]
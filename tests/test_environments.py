@@ -0,0 +1,64 @@
+"""Test scoring and selection of compute environments."""
+import pytest
+
+from feltflow.environments import EnvironmentSelector
+from feltflow.metadata_cache import MetadataCache
+
+PROVIDER = "https://provider.example.com"
+
+
+def _env(id: str, **kwargs) -> dict:
+    return {"id": id, "consumerAddress": "0xC", "maxJobDuration": 3600, **kwargs}
+
+
+def test_unsuitable_environments():
+    selector = EnvironmentSelector(persistent=False)
+    assert selector.score(PROVIDER, _env("short"), min_duration=7200) is None
+    assert selector.score(PROVIDER, _env("none", consumerAddress="")) is None
+    assert selector.score(PROVIDER, _env("paid", priceMin=1)) is None
+    assert selector.score(PROVIDER, _env("free")) is not None
+
+    with pytest.raises(Exception, match="No suitable compute environment"):
+        selector.select(PROVIDER, [_env("paid", priceMin=1)])
+
+
+def test_health_and_queue():
+    selector = EnvironmentSelector(persistent=False)
+    environments = [_env("a"), _env("b")]
+    selector.record_latency(PROVIDER, "start", 40.0, "a")
+    selector.record_latency(PROVIDER, "start", 1.0, "b")
+    assert selector.select(PROVIDER, environments)["id"] == "b"
+
+    # Jobs queued ahead in the environment are waited for
+    environments[1].update({"maxJobs": 1, "currentJobs": 1})
+    assert selector.select(PROVIDER, environments)["id"] == "a"
+
+    # Failures multiply the score
+    for _ in range(5):
+        selector.record_failure(PROVIDER, "a")
+    assert selector.select(PROVIDER, environments)["id"] == "b"
+
+
+def test_paid_only_without_free():
+    selector = EnvironmentSelector(persistent=False, allow_paid=True)
+    paid = _env("paid", priceMin=1)
+    free = _env("free", maxJobs=1, currentJobs=10)
+    selector.record_latency(PROVIDER, "start", 100.0, "free")
+    for _ in range(5):
+        selector.record_failure(PROVIDER, "free")
+
+    # Free environment is selected even when it's much slower
+    assert selector.select(PROVIDER, [paid, free])["id"] == "free"
+    short = _env("short", maxJobDuration=1)
+    assert selector.select(PROVIDER, [paid, short], min_duration=60)["id"] == "paid"
+
+
+def test_persistent_health(tmp_path):
+    store = MetadataCache(str(tmp_path / "cache.sqlite"))
+    selector = EnvironmentSelector(store, save_interval=3600)
+    selector.record_latency(PROVIDER, "start", 2.0)
+    assert store.entries("health") == {}
+
+    selector.save()
+    other = EnvironmentSelector(store)
+    assert other.health[PROVIDER]["start"] == 2.0
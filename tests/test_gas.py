@@ -0,0 +1,63 @@
+"""Test estimation of transaction fees."""
+import pytest
+
+from feltflow import gas
+from feltflow.gas import GasStrategy
+
+GWEI = 10**9
+
+
+class _Reader:
+    def __init__(self, history=None, error: bool = False):
+        self.history = history
+        self.error = error
+        self.requests = []
+
+    def fee_history(self, blocks: int, percentile: float) -> dict:
+        self.requests.append((blocks, percentile))
+        if self.error:
+            raise Exception("eth_feeHistory isn't supported")
+        return self.history
+
+    def gas_price(self) -> int:
+        return 7 * GWEI
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    reader = _Reader(
+        {
+            "baseFeePerGas": [hex(10 * GWEI), hex(12 * GWEI), hex(15 * GWEI)],
+            "reward": [[hex(1 * GWEI)], [hex(3 * GWEI)], []],
+        }
+    )
+    monkeypatch.setattr(gas, "get_reader", lambda ocean: reader)
+    return reader
+
+
+def test_eip1559_fees(reader):
+    fees = GasStrategy("fast", blocks=3).fees(None)
+    # Median priority fee of blocks, base fee of next block can double
+    assert fees == {"max_fee": 2 * 15 * GWEI + 2 * GWEI, "priority_fee": 2 * GWEI}
+    assert reader.requests == [(3, 90)]
+
+
+def test_max_fee_cap(reader):
+    fees = GasStrategy(max_fee=GWEI).fees(None)
+    assert fees == {"max_fee": GWEI, "priority_fee": GWEI}
+
+
+@pytest.mark.parametrize(
+    "history, error",
+    [({"baseFeePerGas": ["0x0", "0x0"], "reward": []}, False), (None, True)],
+)
+def test_legacy_gas_price(monkeypatch, history, error):
+    monkeypatch.setattr(gas, "get_reader", lambda ocean: _Reader(history, error))
+    assert GasStrategy().fees(None) == {"gas_price": 7 * GWEI}
+
+
+def test_invalid_strategy():
+    with pytest.raises(AssertionError):
+        GasStrategy("instant")
+    with pytest.raises(AssertionError):
+        GasStrategy(increment=1.05)
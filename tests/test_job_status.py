@@ -0,0 +1,68 @@
+"""Test multiplexed status polling of compute jobs."""
+from contextlib import nullcontext
+
+from feltflow.job_status import check_statuses
+
+
+class _Backend:
+    def __init__(self, bulk):
+        self.bulk = bulk
+        self.bulk_calls = 0
+
+    def status_group(self, job) -> str:
+        return "provider"
+
+    def bulk_status(self, jobs, account) -> dict:
+        self.bulk_calls += 1
+        return self.bulk(jobs)
+
+
+class _Job:
+    def __init__(self, job_id: str, backend: _Backend):
+        self.job_id = job_id
+        self.backend = backend
+        self.priority = 0
+        self.state = "running"
+        self.checked = 0
+
+    def scheduled(self):
+        return nullcontext()
+
+    def update_status(self, job_info: dict):
+        self.state = job_info["state"]
+
+    def check_status(self, account):
+        self.checked += 1
+        self.state = "finished"
+
+
+class _Account:
+    address = "0x0"
+
+
+def _jobs(bulk) -> list:
+    backend = _Backend(bulk)
+    return [_Job(f"job-{i}", backend) for i in range(3)]
+
+
+def test_bulk_status():
+    jobs = _jobs(lambda jobs: {job.job_id: {"state": "finished"} for job in jobs})
+    assert check_statuses(jobs, _Account()) == ["finished"] * 3
+    assert jobs[0].backend.bulk_calls == 1
+    assert [job.checked for job in jobs] == [0, 0, 0]
+
+
+def test_missing_jobs_checked_one_by_one():
+    jobs = _jobs(lambda jobs: {"job-0": {"state": "running"}})
+    assert check_statuses(jobs, _Account()) == ["running", "finished", "finished"]
+    assert [job.checked for job in jobs] == [0, 1, 1]
+
+
+def test_failed_bulk_status(capsys):
+    def bulk(jobs):
+        raise Exception("provider unavailable")
+
+    jobs = _jobs(bulk)
+    assert check_statuses(jobs, _Account()) == ["finished"] * 3
+    assert [job.checked for job in jobs] == [1, 1, 1]
+    assert "provider unavailable" in capsys.readouterr().out
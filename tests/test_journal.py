@@ -0,0 +1,50 @@
+"""Test run journal and bounded history of training rounds."""
+from collections import deque
+
+import numpy as np
+import pytest
+
+from feltflow.federated_training import FederatedTraining
+from feltflow.journal import RunJournal
+from feltflow.simulation import Simulation
+
+
+def test_append_read(tmp_path):
+    journal = RunJournal(str(tmp_path / "run"))
+    assert list(journal.read()) == []
+
+    journal.append("seeds", {"entropy": "1"})
+    journal.append("round", {"round": 0})
+    journal.append("round", {"round": 1})
+
+    assert [e["event"] for e in journal.read()] == ["seeds", "round", "round"]
+    assert [e["round"] for e in journal.read("round")] == [0, 1]
+
+
+def test_history_size_at_least_one():
+    with pytest.raises(AssertionError, match="at least one round"):
+        FederatedTraining(None, None, "", "", ["did"], {}, {}, history_size=0)
+
+
+def test_rounds_kept_in_journal(tmp_path):
+    data_path = str(tmp_path / "data.npy")
+    rng = np.random.default_rng(0)
+    np.save(data_path, rng.normal(size=(40, 4)))
+
+    simulation = Simulation(
+        data_path,
+        n_clients=2,
+        model={"weights": {"coef": np.zeros(3), "intercept": 0.0}},
+        work_dir=str(tmp_path / "simulation"),
+        max_workers=2,
+    )
+    journal = RunJournal(str(tmp_path / "run"))
+    simulation.training.journal = journal
+    simulation.training.iterations_data = deque(maxlen=1)
+    simulation.run(rounds=3)
+
+    # Only last round is kept in memory, all rounds are in the journal
+    assert [r["round"] for r in simulation.training.iterations_data] == [2]
+    rounds = list(journal.read("round"))
+    assert [r["round"] for r in rounds] == [0, 1, 2]
+    assert all(len(r["training"]) == 2 for r in rounds)
@@ -0,0 +1,133 @@
+"""Test on-disk metadata cache and per round caching of access details."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from feltflow import subgraph
+from feltflow.metadata_cache import MetadataCache
+
+
+class _Api(BaseHTTPRequestHandler):
+    """Job spec endpoint with ETag revalidation."""
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        content = json.dumps(self.server.job).encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Api)
+    server.requests = 0
+    server.etag = '"1"'
+    server.job = {"iterations": 2}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def test_fetch_json_revalidated(api, tmp_path):
+    cache = MetadataCache(str(tmp_path / "cache.sqlite"))
+    url = f"http://127.0.0.1:{api.server_port}/jobs?launchToken=secret"
+    assert cache.fetch_json("job", url, "felt_api") == {"iterations": 2}
+    assert cache.fetch_json("job", url, "felt_api") == {"iterations": 2}
+    assert api.requests == 2
+
+    api.etag, api.job = '"2"', {"iterations": 3}
+    assert cache.fetch_json("job", url, "felt_api") == {"iterations": 3}
+
+
+def test_launch_token_not_stored(api, tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = MetadataCache(str(path))
+    url = f"http://127.0.0.1:{api.server_port}/jobs?launchToken=secret"
+    cache.fetch_json("job", url, "felt_api")
+    assert list(cache.entries("job").values()) == [{"iterations": 2}]
+    assert not any("secret" in key for key in cache.entries("job"))
+
+
+def test_plain_url_entries_dropped(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    MetadataCache(path).put("job", "http://api/jobs?launchToken=secret", {})
+    assert MetadataCache(path).entries("job") == {}
+
+
+def test_cached(tmp_path):
+    cache = MetadataCache(str(tmp_path / "cache.sqlite"))
+    calls = []
+    assert cache.cached("token", "a", 60, lambda: calls.append(1) or 1) == 1
+    assert cache.cached("token", "a", 60, lambda: calls.append(2) or 2) == 1
+    assert cache.cached("token", "a", 0, lambda: calls.append(3) or 3) == 3
+    assert calls == [1, 3]
+
+
+class _OrderIndex:
+    def __init__(self):
+        self.syncs = 0
+
+    def sync(self, subgraph_url: str, account: str):
+        self.syncs += 1
+
+    def latest_order(self, subgraph_url: str, account: str, datatoken: str):
+        return None
+
+
+class _Service:
+    datatoken = "0xToken"
+    timeout = 0
+
+
+def test_access_details_per_round(monkeypatch, tmp_path):
+    queries = []
+
+    def query(subgraph_url, query, datatoken_id):
+        queries.append(query)
+        return {
+            "templateId": 1,
+            "publishMarketFeeAddress": "0x0",
+            "publishMarketFeeToken": "0x0",
+            "publishMarketFeeAmount": "0",
+            "dispensers": [],
+            "fixedRateExchanges": [],
+        }
+
+    index = _OrderIndex()
+    monkeypatch.setattr(subgraph, "_query_token", query)
+    monkeypatch.setattr(subgraph, "get_order_index", lambda: index)
+    monkeypatch.setattr(
+        subgraph,
+        "get_metadata_cache",
+        lambda: MetadataCache(str(tmp_path / "cache.sqlite")),
+    )
+
+    round_cache = {}
+
+    def cached(key, fn):
+        if key not in round_cache:
+            round_cache[key] = fn()
+        return round_cache[key]
+
+    for _ in range(3):
+        subgraph.get_access_details(_Service(), "http://subgraph", "0xA", cached)
+    # Token details, price and order sync are queried once in the round
+    assert queries == [subgraph.token_query, subgraph.price_query]
+    assert index.syncs == 1
+
+    subgraph.get_access_details(_Service(), "http://subgraph", "0xA")
+    assert queries[2:] == [subgraph.price_query]
+    assert index.syncs == 2
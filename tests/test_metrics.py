@@ -0,0 +1,46 @@
+"""Test rendering of metrics in Prometheus text format."""
+from feltflow.metrics import Counter, Gauge, Histogram
+
+
+def test_counter():
+    counter = Counter("test_jobs_total", "Jobs by state.", ["state"])
+    counter.inc(state="started")
+    counter.inc(2, state="started")
+    counter.inc(state="failed")
+    assert counter.value(state="started") == 3
+    assert counter.render() == (
+        "# HELP test_jobs_total Jobs by state.\n"
+        "# TYPE test_jobs_total counter\n"
+        'test_jobs_total{state="started"} 3\n'
+        'test_jobs_total{state="failed"} 1\n'
+    )
+
+
+def test_gauge():
+    gauge = Gauge("test_queue", "Queue length.")
+    gauge.inc(5)
+    gauge.set(2)
+    assert gauge.render().splitlines()[1:] == [
+        "# TYPE test_queue gauge",
+        "test_queue 2",
+    ]
+
+
+def test_histogram():
+    histogram = Histogram("test_latency", "Latency.", ["service"], buckets=(1, 0.1))
+    histogram.observe(0.05, service="rpc")
+    histogram.observe(0.1, service="rpc")
+    histogram.observe(5, service="rpc")
+    assert histogram.samples() == [
+        'test_latency_bucket{service="rpc",le="0.1"} 2',
+        'test_latency_bucket{service="rpc",le="1.0"} 2',
+        'test_latency_bucket{service="rpc",le="+Inf"} 3',
+        'test_latency_sum{service="rpc"} 5.15',
+        'test_latency_count{service="rpc"} 3',
+    ]
+
+
+def test_label_escaping():
+    counter = Counter("test_escaped_total", "Escaped labels.", ["host"])
+    counter.inc(host='a"b\\c\nd')
+    assert counter.samples() == ['test_escaped_total{host="a\\"b\\\\c\\nd"} 1']
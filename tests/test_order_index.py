@@ -0,0 +1,137 @@
+"""Test local index of orders synced from subgraph."""
+import pytest
+
+from feltflow.order_index import OrderIndex
+
+SUBGRAPH = "https://subgraph.test"
+
+
+class _Subgraph:
+    """Subgraph stand-in filtering and paging entities like the real one."""
+
+    def __init__(self):
+        self.entities = {"orders": [], "orderReuses": []}
+        self.requests = 0
+        self.downloaded = 0
+
+    def query(self, subgraph_url: str, query: str, variables: dict) -> dict:
+        self.requests += 1
+        entity = "orders" if "orders(" in query else "orderReuses"
+        items = sorted(
+            (
+                e
+                for e in self.entities[entity]
+                if int(e["createdTimestamp"]) >= variables["cursor"]
+            ),
+            key=lambda e: int(e["createdTimestamp"]),
+        )
+        start = variables["skip"]
+        page = items[start : start + variables["first"]]
+        self.downloaded += len(page)
+        return {entity: page}
+
+
+def _order(tx: str, datatoken: str, created: int) -> dict:
+    return {
+        "id": f"{tx}-{datatoken}",
+        "tx": tx,
+        "serviceIndex": "0",
+        "createdTimestamp": str(created),
+        "datatoken": {"id": datatoken},
+    }
+
+
+@pytest.fixture
+def subgraph(tmp_path, monkeypatch):
+    subgraph = _Subgraph()
+    index = OrderIndex(str(tmp_path / "orders.sqlite"), page_size=2, min_interval=0)
+    monkeypatch.setattr(index, "_query", subgraph.query)
+    return index, subgraph
+
+
+def test_latest_order(subgraph):
+    index, subgraph = subgraph
+    # Several orders with same timestamp across page boundaries
+    subgraph.entities["orders"] = [
+        _order("0x1", "0xdt1", 100),
+        _order("0x2", "0xdt2", 100),
+        _order("0x3", "0xdt1", 100),
+        _order("0x4", "0xdt1", 200),
+    ]
+    subgraph.entities["orderReuses"] = [
+        {
+            "id": "0x5-0",
+            "tx": "0x5",
+            "createdTimestamp": "300",
+            "order": {"id": "0x4-0xdt1"},
+        }
+    ]
+    index.sync(SUBGRAPH, "0xABC")
+
+    order = index.latest_order(SUBGRAPH, "0xabc", "0xDT1")
+    assert order == {
+        "tx": "0x4",
+        "serviceIndex": 0,
+        "createdTimestamp": 200,
+        "reuses": [{"tx": "0x5", "caller": "0xabc", "createdTimestamp": 300}],
+    }
+    assert index.latest_order(SUBGRAPH, "0xabc", "0xdt2")["reuses"] == []
+    assert index.latest_order(SUBGRAPH, "0xabc", "0xdt3") is None
+    assert index.latest_order("https://other.test", "0xabc", "0xdt1") is None
+
+
+def test_incremental_sync(subgraph):
+    index, subgraph = subgraph
+    subgraph.entities["orders"] = [_order("0x1", "0xdt1", 100)]
+    index.sync(SUBGRAPH, "0xabc")
+    assert index.latest_order(SUBGRAPH, "0xabc", "0xdt1")["tx"] == "0x1"
+
+    subgraph.entities["orders"].append(_order("0x2", "0xdt1", 100))
+    subgraph.entities["orders"].append(_order("0x3", "0xdt1", 150))
+    subgraph.downloaded = 0
+    index.sync(SUBGRAPH, "0xabc")
+    assert index.latest_order(SUBGRAPH, "0xabc", "0xdt1")["tx"] == "0x3"
+    # Only new orders are downloaded, also the one with the cursor timestamp
+    assert subgraph.downloaded == 2
+
+
+def test_sync_interval(subgraph):
+    index, subgraph = subgraph
+    index.min_interval = 60
+    index.sync(SUBGRAPH, "0xabc")
+    index.sync(SUBGRAPH, "0xABC")
+    assert subgraph.requests == 2
+
+
+@pytest.mark.parametrize("page_size", [2, 10])
+def test_orders_in_one_transaction(subgraph, page_size):
+    index, subgraph = subgraph
+    index.page_size = page_size
+    # Multi-token order, several orders (and reuses) share one transaction
+    subgraph.entities["orders"] = [_order("0x1", f"0xdt{i}", 100) for i in range(3)]
+    subgraph.entities["orderReuses"] = [
+        {
+            "id": f"0x2-{i}",
+            "tx": "0x2",
+            "createdTimestamp": "200",
+            "order": {"id": f"0x1-0xdt{i}"},
+        }
+        for i in range(3)
+    ]
+    index.sync(SUBGRAPH, "0xabc")
+
+    for i in range(3):
+        order = index.latest_order(SUBGRAPH, "0xabc", f"0xdt{i}")
+        assert order["tx"] == "0x1"
+        assert order["reuses"] == [
+            {"tx": "0x2", "caller": "0xabc", "createdTimestamp": 200}
+        ]
+    assert subgraph.requests <= 4
+
+
+def test_repeated_entities(subgraph):
+    index, subgraph = subgraph
+    order = _order("0x1", "0xdt1", 100)
+    subgraph.entities["orders"] = [order, order, order]
+    with pytest.raises(Exception, match="repeats entities"):
+        index.sync(SUBGRAPH, "0xabc")
@@ -0,0 +1,57 @@
+"""Test checks of job outputs and validation of models."""
+import pytest
+
+from feltflow.outputs import check_results, parse_model, validate
+
+SCHEMA = {
+    "type": "object",
+    "required": ["weights", "sample_size"],
+    "properties": {
+        "weights": {"type": "array", "items": {"type": "number"}, "minItems": 1},
+        "sample_size": {"type": "integer"},
+    },
+}
+
+
+def test_check_results():
+    limits = {"model": 100}
+    assert check_results([{"filename": "model", "filesize": 50}], limits) is None
+    assert check_results([{"filename": "model"}], limits) is None
+    assert "Missing" in check_results([{"filename": "log", "filesize": 5}], limits)
+    assert "empty" in check_results([{"filename": "model", "filesize": 0}], limits)
+    assert "limit" in check_results([{"filename": "model", "filesize": 101}], limits)
+
+
+def test_validate():
+    validate({"weights": [1, 2.5], "sample_size": 10}, SCHEMA)
+
+
+@pytest.mark.parametrize(
+    "model, error",
+    [
+        ([], "expected object"),
+        ({"weights": [1]}, "missing sample_size"),
+        ({"weights": [], "sample_size": 1}, "less than 1 items"),
+        ({"weights": ["1"], "sample_size": 1}, r"model.weights\[0\]: expected number"),
+        ({"weights": [1], "sample_size": 1.5}, "expected integer"),
+        # bool isn't number in JSON schema
+        ({"weights": [True], "sample_size": 1}, "expected number"),
+    ],
+)
+def test_validate_invalid(model, error):
+    with pytest.raises(Exception, match=error):
+        validate(model, SCHEMA)
+
+
+def test_parse_model():
+    content = b' {"weights": [1.0], "sample_size": 3}\n'
+    assert parse_model(content, SCHEMA) == {"weights": [1.0], "sample_size": 3}
+
+
+@pytest.mark.parametrize(
+    "content",
+    [b"", b'{"weights": [1.0], "sample', b"<html>Error</html>", b"[1.0]"],
+)
+def test_parse_model_invalid(content):
+    with pytest.raises(Exception, match="complete JSON"):
+        parse_model(content, SCHEMA)
@@ -0,0 +1,115 @@
+"""Test dry run planning of training (orders, spend and duration)."""
+from types import SimpleNamespace
+
+import pytest
+
+from feltflow import plan
+from feltflow.journal import RunJournal
+
+FEE = {"providerFeeToken": "0xOcean", "providerFeeAmount": "5"}
+
+
+def _input(did: str, access_type: str = "free") -> SimpleNamespace:
+    return SimpleNamespace(
+        did=did,
+        service=SimpleNamespace(datatoken="0xDT"),
+        ddo=SimpleNamespace(access_details={"type": access_type}),
+    )
+
+
+@pytest.fixture
+def datatoken(monkeypatch):
+    monkeypatch.setattr(plan, "get_reader", lambda ocean: None)
+    monkeypatch.setattr(
+        plan,
+        "get_typed_datatoken",
+        lambda ocean, address: SimpleNamespace(address=address),
+    )
+
+
+def test_plan_order(datatoken):
+    assert plan._plan_order(_input("a"), {"validOrder": "0x1"}, None) == {
+        "did": "a",
+        "reuse": True,
+        "transactions": 0,
+        "spend": {},
+    }
+    # Reuse of order with new provider fees approves and pays the fees
+    assert plan._plan_order(
+        _input("a"), {"validOrder": "0x1", "providerFee": FEE}, None
+    ) == {"did": "a", "reuse": True, "transactions": 2, "spend": {"0xOcean": 5}}
+    # Free asset with zero fees is ordered by single transaction
+    zero_fee = {**FEE, "providerFeeAmount": "0"}
+    assert plan._plan_order(_input("a"), {"providerFee": zero_fee}, None) == {
+        "did": "a",
+        "reuse": False,
+        "transactions": 1,
+        "spend": {},
+    }
+
+    with pytest.raises(Exception, match="Unsupported"):
+        plan._plan_order(_input("a", "NOT_SUPPORTED"), {"providerFee": FEE}, None)
+
+
+def _record(started: float, finished: float, orders: float) -> dict:
+    return {
+        "started_at": 1000 + started,
+        "finished_at": 1000 + finished,
+        "timings": {"orders": orders, "start": 1.0},
+    }
+
+
+def test_historical_timings(tmp_path):
+    for run, offset in [("run-1", 0), ("run-2", 10)]:
+        RunJournal(str(tmp_path / run)).append(
+            "round",
+            {
+                "round": 0,
+                "training": [_record(0, 100 + offset, 4), _record(0, 100, 2)],
+                "aggregation": _record(200, 230, 6),
+                "aggregation_groups": [],
+            },
+        )
+
+    timings = plan.historical_timings(str(tmp_path))
+    assert timings["training"] == {"orders": 3, "start": 1, "run": 102.5}
+    assert timings["aggregation"] == {"orders": 6, "start": 1, "run": 30}
+
+
+def test_plan_training(monkeypatch, tmp_path):
+    def plan_compute(ocean, dataset_dids, algorithm_did, address):
+        reuse = dataset_dids == ["b"]
+        order = {
+            "did": dataset_dids[0],
+            "reuse": reuse,
+            "transactions": 1,
+            "spend": {} if reuse else {"0xOcean": 5},
+        }
+        return {"datasets": dataset_dids, "algorithm": algorithm_did, "orders": [order]}
+
+    monkeypatch.setattr(plan, "plan_compute", plan_compute)
+    RunJournal(str(tmp_path / "run")).append(
+        "round", {"training": [_record(0, 50, 2)], "aggregation": _record(60, 70, 3)}
+    )
+    job = {
+        "dataDIDs": ["a", "b"],
+        "algoConfig": {
+            "assets": {
+                "training": "train",
+                "aggregation": "aggregate",
+                "emptyDataset": "empty",
+            }
+        },
+    }
+
+    result = plan.plan_training(None, job, "0xA", str(tmp_path))
+    assert [j["algorithm"] for j in result["jobs"]] == ["train", "train", "aggregate"]
+    assert result["orders"] == 3
+    assert result["reused_orders"] == 1
+    assert result["transactions"] == 3
+    assert result["spend"] == {"0xOcean": 10}
+    # Local trainings are ordered and started one by one, then run in parallel
+    assert result["wall_time"] == {
+        "training": {"orders": 4, "start": 2, "run": 50},
+        "aggregation": {"orders": 3, "start": 1, "run": 10},
+    }
@@ -0,0 +1,30 @@
+"""Test memory recorded by profiler sections."""
+import pytest
+
+from feltflow import profiling
+from feltflow.profiling import Profiler
+
+
+def _profile(tmp_path) -> dict:
+    profiler = Profiler(str(tmp_path), stack_interval=0.001, resource_interval=0.01)
+    with profiler:
+        with profiler.section("outer"):
+            with profiler.section("inner"):
+                data = bytearray(10**6)
+            del data
+    return profiler.sections
+
+
+@pytest.mark.skipif(not profiling.RESET_PEAK, reason="Requires Python 3.9+")
+def test_peak_of_outermost_section(tmp_path):
+    sections = _profile(tmp_path)
+    assert sections["outer"]["peak"] >= 10**6
+    assert sections["inner"]["peak"] == 0
+    assert sections["inner"]["allocated"] >= 10**6
+
+
+def test_no_peak_without_reset(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "RESET_PEAK", False)
+    sections = _profile(tmp_path)
+    assert sections["outer"]["peak"] is None
+    assert sections["inner"]["peak"] is None
@@ -0,0 +1,270 @@
+"""Test recording and replay of outbound requests."""
+import gzip
+import hashlib
+import json
+import threading
+from base64 import b64encode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+from nacl.public import PrivateKey
+
+from feltflow.backends.base import ComputeBackend
+from feltflow.cloud_storage import CloudStorage
+from feltflow.federated_training import FederatedTraining
+from feltflow.replay import Recorder, Replayer, request_key
+from feltflow.signing import get_nonce_allocator
+
+
+class _Provider(BaseHTTPRequestHandler):
+    """Provider stand-in answering auth token and compute start requests."""
+
+    def _reply(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body)
+
+    def do_GET(self):
+        self._reply({"token": f"token-{self._body()['nonce']}"})
+
+    def do_POST(self):
+        self._reply([{"jobId": f"job-{self._body()['nonce']}"}])
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(handler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def provider():
+    server = _serve(_Provider)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def _start_job(url: str, nonce: int) -> tuple:
+    """Send requests in same format as CustomDataServiceProvider."""
+    auth = {
+        "address": "0xabc",
+        "expiration": str(int(nonce / 1000 + 3600 * 24 * 5000)),
+        "signature": f"0xsig{nonce}",
+        "nonce": str(nonce),
+    }
+    token = requests.get(
+        f"{url}/api/services/createAuthToken",
+        data=json.dumps(auth),
+        headers={"content-type": "application/json"},
+    ).json()["token"]
+
+    payload = {"dataset": {"documentId": "did:op:1"}, "nonce": nonce}
+    body = gzip.compress(json.dumps(payload).encode("utf-8"), mtime=nonce)
+    job = requests.post(
+        f"{url}/api/services/compute",
+        data=body,
+        headers={"content-type": "application/json", "content-encoding": "gzip"},
+    ).json()
+    return token, job[0]["jobId"]
+
+
+def test_record_replay(provider, tmp_path):
+    path = str(tmp_path / "recording.jsonl.gz")
+    with Recorder(path):
+        recorded = _start_job(provider, 1000)
+
+    with Replayer(path, latency_scale=0) as replayer:
+        # Different nonce, signature, expiration and gzip mtime
+        assert _start_job(provider, 2000) == recorded
+    assert len(replayer.served) == 2
+
+
+def test_replay_unknown_request(provider, tmp_path):
+    path = str(tmp_path / "recording.jsonl.gz")
+    with Recorder(path):
+        requests.get(f"{provider}/api/services/createAuthToken", json={"nonce": 1})
+
+    with Replayer(path, latency_scale=0):
+        with pytest.raises(Exception, match="isn't recorded"):
+            requests.get(f"{provider}/api/services/other", json={"nonce": 1})
+
+
+def test_nested_volatile_fields():
+    def key(nonce: int, token: str):
+        request = requests.Request(
+            "POST",
+            "https://provider.test/api/services/compute",
+            json={
+                "algocustomdata": {
+                    "model_urls": [
+                        {
+                            "url": "https://provider.test/api/services/computeResult"
+                            f"?jobId=1&index=0&nonce={nonce}&signature=0x{nonce}",
+                            "headers": {},
+                        }
+                    ]
+                },
+                "compute": {"env": "env-1", "validUntil": nonce + 3600},
+                "authToken": token,
+            },
+        ).prepare()
+        return request_key(request)
+
+    assert key(1000, "encrypted-1") == key(2000, "encrypted-2")
+
+
+class _Services(BaseHTTPRequestHandler):
+    """Provider and FELT API stand-in, jobs finish immediately."""
+
+    jobs: dict = {}
+    stored: list = []
+
+    def _reply(self, content: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        job = self.jobs[query["jobId"]]
+        if url.path == "/api/services/computeResult":
+            self._reply(job["model"])
+        else:
+            self._reply(json.dumps(job["info"]).encode("utf-8"))
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.startswith("/api/python-flow/"):
+            self.stored.append((self.path, data))
+            self._reply(b"{}")
+            return
+
+        job_id = f"job-{len(self.jobs)}"
+        sizes = data["algocustomdata"].get("sample_sizes") or [10]
+        model = json.dumps(
+            {"weights": {"w": [len(self.jobs)]}, "sample_size": sum(sizes)}
+        )
+        model = model.encode("utf-8")
+        info = {
+            "jobId": job_id,
+            "ok": True,
+            "status": 70,
+            "statusText": "Job finished",
+            "results": [
+                {
+                    "filename": "model",
+                    "filesize": len(model),
+                    "sha256": hashlib.sha256(model).hexdigest(),
+                }
+            ],
+        }
+        self.jobs[job_id] = {"info": info, "model": model}
+        self._reply(json.dumps(info).encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+class _ProviderBackend(ComputeBackend):
+    """Backend signing requests to provider in same way as Ocean C2D backend."""
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def prepare(self, job):
+        pass
+
+    def start(self, job, account, nonce=None):
+        nonce = nonce or str(get_nonce_allocator().next())
+        job_info = requests.post(
+            f"{self.url}/api/services/compute",
+            json={
+                "dataset": job.dataset_dids,
+                "algorithm": job.algorithm_did,
+                "algocustomdata": job.algocustomdata,
+                "nonce": nonce,
+                "signature": f"0xsig{nonce}",
+            },
+        ).json()
+        return job_info, f"token-{job_info['jobId']}"
+
+    def status(self, job, account):
+        return requests.get(
+            f"{self.url}/api/services/compute", params={"jobId": job.job_id}
+        ).json()
+
+    def result_url(self, job, index, account, nonce=None):
+        nonce = nonce or str(get_nonce_allocator().next())
+        return {
+            "url": f"{self.url}/api/services/computeResult?jobId={job.job_id}"
+            f"&index={index}&nonce={nonce}&signature=0xsig{nonce}",
+            "headers": {},
+        }
+
+    def result(self, job, index, account):
+        return requests.get(self.result_url(job, index, account)["url"]).content
+
+
+def _training(url: str) -> FederatedTraining:
+    training = FederatedTraining(
+        None,
+        CloudStorage(url, "launch-token"),
+        b64encode(bytes(PrivateKey.generate().public_key)).decode("utf-8"),
+        "replay",
+        ["did:op:1", "did:op:2", "did:op:3"],
+        {
+            "assets": {
+                "training": "did:op:training",
+                "aggregation": "did:op:aggregation",
+                "emptyDataset": "did:op:empty",
+            }
+        },
+        {"weights": {"w": [0.0]}},
+        backend=_ProviderBackend(url),
+        seed=1234,
+    )
+    training.poll_interval = 0.01
+    return training
+
+
+def test_record_replay_training(tmp_path):
+    path = str(tmp_path / "recording.jsonl.gz")
+    account = SimpleNamespace(address="0xabc")
+    _Services.jobs, _Services.stored = {}, []
+    server = _serve(_Services)
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    with Recorder(path) as recorder:
+        training = _training(url)
+        training.run(account, iterations=2)
+        model = training.latest_model(account)
+    # Stored auth tokens are encrypted by ephemeral key, they differ on replay
+    aggregations = [d for p, d in _Services.stored if p.endswith("/aggregation")]
+    assert len(aggregations) == 2 and "ciphertext" in aggregations[0]["authToken"]
+    server.shutdown()
+    server.server_close()
+
+    # Services are down, everything (incl. signed URLs and tokens) is replayed
+    with Replayer(path, latency_scale=0) as replayer:
+        training = _training(url)
+        training.run(account, iterations=2)
+        assert training.latest_model(account) == model
+    assert len(replayer.served) == len(recorder.exchanges)
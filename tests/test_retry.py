@@ -0,0 +1,125 @@
+"""Test classification of failed compute jobs and their resubmission."""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from feltflow import comput_job
+from feltflow.backends.base import (
+    FAILURE_ALGORITHM,
+    FAILURE_EXPIRED,
+    FAILURE_TRANSIENT,
+    ComputeBackend,
+)
+from feltflow.backends.ocean_c2d import OceanBackend
+from feltflow.comput_job import MAX_RETRIES, ComputeJob
+
+
+class _Backend(ComputeBackend):
+    """Backend failing first `start_failures` starts."""
+
+    def __init__(self, start_failures: int = 0, failure: str = FAILURE_TRANSIENT):
+        self.start_failures = start_failures
+        self.failure = failure
+        self.starts = 0
+
+    def prepare(self, job):
+        pass
+
+    def start(self, job, account, nonce=None):
+        self.starts += 1
+        if self.starts <= self.start_failures:
+            raise Exception("provider unavailable")
+        return {"jobId": f"job-{self.starts}"}, "token"
+
+    def status(self, job, account):
+        return job.job_info
+
+    def classify_failure(self, job):
+        return self.failure
+
+    def result(self, job, index, account):
+        return b""
+
+    def result_url(self, job, index, account, nonce=None):
+        return {}
+
+
+def _job(backend: _Backend) -> ComputeJob:
+    return ComputeJob(None, ["did"], "algorithm", {}, backend=backend)
+
+
+def _fail(job: ComputeJob) -> None:
+    job.update_status({"ok": False, "status": 31})
+
+
+def test_start_retried(monkeypatch):
+    monkeypatch.setattr(comput_job, "RETRY_BACKOFF", 0)
+    job = _job(_Backend(start_failures=2))
+    job_info, _ = job.start_with_retry(SimpleNamespace(address="0x0"))
+    assert job_info == {"jobId": "job-3"}
+    assert job.attempts == 3
+    assert job.state == "running"
+
+
+def test_start_retries_exhausted(monkeypatch):
+    monkeypatch.setattr(comput_job, "RETRY_BACKOFF", 0)
+    job = _job(_Backend(start_failures=10))
+    with pytest.raises(Exception, match="provider unavailable"):
+        job.start_with_retry(SimpleNamespace(address="0x0"))
+    assert job.attempts == MAX_RETRIES + 1
+    assert job.failure == FAILURE_TRANSIENT
+
+
+def test_failed_job_resubmitted():
+    job = _job(_Backend())
+    job.start(None)
+    _fail(job)
+    assert job.classify_failure() == FAILURE_TRANSIENT
+    assert job.can_retry()
+
+    job.retry(None)
+    assert job.state == "running"
+    assert job.job_id == "job-2"
+
+
+def test_algorithm_failure_not_retried():
+    job = _job(_Backend(failure=FAILURE_ALGORITHM))
+    job.start(None)
+    _fail(job)
+    assert job.classify_failure() == FAILURE_ALGORITHM
+    assert not job.can_retry()
+
+
+def test_invalid_outputs_not_retried():
+    job = _job(_Backend())
+    job.start(None)
+    job.update_status({"ok": True, "status": 70, "results": []})
+    assert job.state == "failed"
+    assert job.classify_failure() == FAILURE_ALGORITHM
+    assert not job.can_retry()
+
+
+def test_retry_delay():
+    job = _job(_Backend())
+    for attempts in range(1, 10):
+        job.attempts = attempts
+        delay = comput_job.RETRY_BACKOFF * 2 ** (attempts - 1)
+        expected = min(delay, comput_job.RETRY_BACKOFF_MAX)
+        assert expected / 2 <= job.retry_delay() <= expected
+
+
+def test_ocean_classification():
+    backend = OceanBackend.__new__(OceanBackend)
+    job = SimpleNamespace(orders_expire_at=None, job_info={"status": 31})
+    assert backend.classify_failure(job) == FAILURE_TRANSIENT
+
+    job.job_info = {"status": 32}
+    assert backend.classify_failure(job) == FAILURE_ALGORITHM
+
+    job.job_info = {"status": 31, "statusText": "Order expired"}
+    assert backend.classify_failure(job) == FAILURE_EXPIRED
+
+    job.job_info = {"status": 32}
+    job.orders_expire_at = time.time() - 1
+    assert backend.classify_failure(job) == FAILURE_EXPIRED
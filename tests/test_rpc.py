@@ -0,0 +1,119 @@
+"""Test batching and caching of JSON-RPC reads."""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from feltflow.rpc import RpcReader
+
+
+class _Node:
+    """JSON-RPC node returning block number and echoing eth_call data."""
+
+    def __init__(self):
+        self.block = 1
+        self.requests = []
+
+    def make_request(self, method: str, params: list) -> dict:
+        self.requests.append(method)
+        if method == "eth_blockNumber":
+            return {"jsonrpc": "2.0", "id": 0, "result": hex(self.block)}
+        if method == "eth_call":
+            return {"jsonrpc": "2.0", "id": 0, "result": params[0]["data"]}
+        return {"jsonrpc": "2.0", "id": 0, "error": {"message": "unknown method"}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        batch = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batches.append(len(batch))
+        responses = [
+            {**self.server.node.make_request(req["method"], req["params"]), **req}
+            for req in batch
+        ]
+        content = json.dumps(responses).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Function:
+    """Contract function returning its argument."""
+
+    _address = "0xToken"
+    signature = "0x12345678"
+
+    def encode_input(self, value: str) -> str:
+        return value
+
+    def decode_output(self, result: str) -> str:
+        return result
+
+
+@pytest.fixture
+def node():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.node = _Node()
+    server.batches = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def _reader(server, **kwargs) -> RpcReader:
+    return RpcReader(f"http://127.0.0.1:{server.server_port}", **kwargs)
+
+
+def test_concurrent_reads_batched(node):
+    reader = _reader(node, window=0.2)
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(
+            executor.map(
+                lambda i: reader.request("eth_call", [{"data": str(i)}, "latest"]),
+                range(5),
+            )
+        )
+
+    assert results == [str(i) for i in range(5)]
+    assert node.batches == [5]
+
+
+def test_immutable_cached(node):
+    reader = _reader(node)
+    assert reader.call(_Function(), "a", immutable=True) == "a"
+    assert reader.call(_Function(), "a", immutable=True) == "a"
+    assert reader.call(_Function(), "b", immutable=True) == "b"
+    assert node.node.requests == ["eth_call", "eth_call"]
+
+
+def test_mutable_cached_per_block(node):
+    reader = _reader(node, block_time=60)
+    reader.call(_Function(), "a")
+    reader.call(_Function(), "a")
+    assert node.node.requests == ["eth_blockNumber", "eth_call"]
+
+    # New block is read after transaction, cached value of old block is dropped
+    node.node.block = 2
+    reader.invalidate()
+    reader.call(_Function(), "a")
+    assert node.node.requests == ["eth_blockNumber", "eth_call"] * 2
+
+
+def test_error_response(node):
+    reader = _reader(node)
+    with pytest.raises(Exception, match="unknown method"):
+        reader.request("eth_unknown", [])
+
+
+def test_non_http_provider():
+    provider = _Node()
+    reader = RpcReader("/tmp/geth.ipc", provider=provider)
+    assert reader.call(_Function(), "a") == "a"
+    assert reader.block_number() == 1
+    assert provider.requests == ["eth_blockNumber", "eth_call"]
@@ -0,0 +1,126 @@
+"""Test scheduling of requests by limits and priorities."""
+import threading
+import time
+
+import pytest
+
+from feltflow import scheduler
+from feltflow.scheduler import (
+    PRIORITY_AGGREGATION,
+    PRIORITY_TRAINING,
+    Limits,
+    Scheduler,
+    TokenBucket,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_token_bucket(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    # Burst is available at once, following requests are spaced by the rate
+    assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 0.5, 1.0]
+
+    clock.now += 1.0
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    # Tokens don't accumulate above burst
+    clock.now += 100.0
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+def test_rate_limit():
+    sched = Scheduler(Limits(concurrency=10, rate=20.0, burst=1))
+    start = time.monotonic()
+    for _ in range(3):
+        with sched.slot("rpc.test"):
+            pass
+    assert time.monotonic() - start >= 0.09
+
+
+def test_priority():
+    sched = Scheduler(Limits(concurrency=1, rate=None))
+    order = []
+    release = threading.Event()
+
+    def request(name: str, priority: int, owner: str):
+        with sched.context(priority, owner):
+            with sched.slot("provider.test"):
+                order.append(name)
+
+    def blocker():
+        with sched.slot("provider.test"):
+            release.wait()
+
+    threads = [threading.Thread(target=blocker)]
+    threads[0].start()
+    time.sleep(0.05)
+    for args in [
+        ("a1", PRIORITY_TRAINING, "a"),
+        ("a2", PRIORITY_TRAINING, "a"),
+        ("b1", PRIORITY_TRAINING, "b"),
+        ("agg", PRIORITY_AGGREGATION, "c"),
+    ]:
+        threads.append(threading.Thread(target=request, args=args))
+        threads[-1].start()
+        time.sleep(0.05)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    # Aggregation goes first, then first come first served
+    assert order == ["agg", "a1", "a2", "b1"]
+
+
+def test_fairness_among_owners():
+    sched = Scheduler(Limits(concurrency=2, rate=None))
+    order = []
+    release = {"blocker": threading.Event(), "a": threading.Event()}
+
+    def request(name: str, owner: str, wait: bool = False):
+        with sched.context(PRIORITY_TRAINING, owner):
+            with sched.slot("provider.test"):
+                order.append(name)
+                if wait:
+                    release[name].wait()
+
+    threads = []
+    for args in [("blocker", None, True), ("a", "a", True), ("a2", "a"), ("b", "b")]:
+        threads.append(threading.Thread(target=request, args=args))
+        threads[-1].start()
+        time.sleep(0.05)
+
+    release["blocker"].set()
+    time.sleep(0.05)
+    release["a"].set()
+    for thread in threads:
+        thread.join()
+    # Owner "b" has no running request, so it goes before second request of "a"
+    assert order == ["blocker", "a", "b", "a2"]
+
+
+def test_nested_slot_reused():
+    sched = Scheduler(Limits(concurrency=1, rate=None))
+    with sched.slot("chain:1"):
+        with sched.slot("chain:1"):
+            pass
+
+
+def test_host():
+    assert Scheduler.host("https://provider.test:8030/api/services") == (
+        "provider.test:8030"
+    )
+    assert Scheduler.host("chain:137") == "chain:137"
@@ -0,0 +1,54 @@
+"""Test reproducible seeds of local trainings."""
+import numpy as np
+
+from feltflow.seeds import SeedStream
+from feltflow.simulation import Simulation
+
+
+def test_same_entropy_same_seeds():
+    stream = SeedStream(1234)
+    assert SeedStream(1234).seeds(3, 5) == stream.seeds(3, 5)
+    assert SeedStream(stream.entropy).seed(3, 4) == stream.seed(3, 4)
+    assert SeedStream(4321).seeds(3, 5) != stream.seeds(3, 5)
+
+
+def test_seeds_independent_of_order():
+    stream = SeedStream(1234)
+    seeds = stream.seeds(2, 4)
+    assert [stream.seed(2, c) for c in reversed(range(4))] == seeds[::-1]
+    assert stream.seeds(2, 8)[:4] == seeds
+    assert len(set(seeds + stream.seeds(3, 4))) == 8
+    # Seeds are exactly representable in JavaScript
+    assert all(0 <= s < 2**53 for s in seeds)
+
+
+def test_key():
+    stream = SeedStream(1234)
+    assert stream.key(1, 2) == {"entropy": "1234", "round": 1, "client": 2}
+
+
+def test_round_labels_across_runs(tmp_path):
+    data_path = str(tmp_path / "data.npy")
+    np.save(data_path, np.random.default_rng(0).normal(size=(40, 4)))
+    simulation = Simulation(
+        data_path,
+        n_clients=2,
+        model={"weights": {"coef": np.zeros(3), "intercept": 0.0}},
+        work_dir=str(tmp_path / "simulation"),
+        max_workers=2,
+        seed=1234,
+    )
+    try:
+        simulation.training.run(simulation.account, iterations=1)
+        simulation.training.run(simulation.account, iterations=1)
+    finally:
+        simulation.training.release()
+        simulation.backend.close()
+
+    # Rounds are numbered over all runs, same as seeds of the rounds
+    stream = SeedStream(1234)
+    storage = simulation.storage
+    assert sorted(storage.local_trainings) == sorted(
+        [("0", s) for s in stream.seeds(0, 2)] + [("1", s) for s in stream.seeds(1, 2)]
+    )
+    assert storage.aggregations == ["0", "1"]
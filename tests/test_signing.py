@@ -0,0 +1,38 @@
+"""Test nonce allocation of signed provider requests."""
+import threading
+import time
+
+from feltflow.signing import NonceAllocator
+
+
+def test_nonces_strictly_increasing():
+    allocator = NonceAllocator()
+    nonces = [allocator.next() for _ in range(1000)]
+    assert all(a < b for a, b in zip(nonces, nonces[1:]))
+    assert nonces[0] >= int(time.time() * 1000) - 1000
+
+
+def test_nonces_unique_across_threads():
+    allocator = NonceAllocator()
+    nonces = []
+    lock = threading.Lock()
+
+    def allocate():
+        allocated = [allocator.next() for _ in range(500)]
+        with lock:
+            nonces.extend(allocated)
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(nonces)) == 8 * 500
+
+
+def test_nonce_ahead():
+    allocator = NonceAllocator()
+    nonce = allocator.next(ahead=60_000)
+    assert nonce >= int(time.time() * 1000) + 59_000
+    # Following nonces stay above the one allocated ahead
+    assert allocator.next() == nonce + 1
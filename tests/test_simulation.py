@@ -0,0 +1,63 @@
+"""Test federated simulation with hierarchical aggregation."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from feltflow.simulation import Simulation, train_linear
+
+
+def train_without_size(data_paths, algocustomdata, output_dir):
+    """Training algorithm producing models without sample size."""
+    train_linear(data_paths, algocustomdata, output_dir)
+    path = os.path.join(output_dir, "model")
+    with open(path) as f:
+        model = json.load(f)
+    with open(path, "w") as f:
+        json.dump({"weights": model["weights"]}, f)
+
+
+def _simulation(tmp_path, name: str, fan_out=None, **kwargs) -> Simulation:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 3))
+    y = X @ np.array([1.0, -2.0, 0.5]) + 0.3 + rng.normal(scale=0.1, size=600)
+    data_path = str(tmp_path / "data.npy")
+    # Unequal shards, so the weighting by sample size matters
+    np.save(data_path, np.column_stack([X, y])[:597])
+
+    return Simulation(
+        data_path,
+        n_clients=6,
+        model={"weights": {"coef": np.zeros(3), "intercept": 0.0}},
+        work_dir=str(tmp_path / name),
+        max_workers=2,
+        aggregation_fan_out=fan_out,
+        **kwargs,
+    )
+
+
+def _run(tmp_path, name: str, fan_out=None) -> dict:
+    return _simulation(tmp_path, name, fan_out).run(rounds=2)["model"]
+
+
+def test_hierarchical_equals_flat(tmp_path):
+    flat = _run(tmp_path, "flat")
+    hierarchical = _run(tmp_path, "hierarchical", fan_out=2)
+
+    assert hierarchical["sample_size"] == flat["sample_size"] == 597
+    for name, value in flat["weights"].items():
+        np.testing.assert_allclose(hierarchical["weights"][name], value, rtol=1e-9)
+
+
+def test_hierarchical_requires_sample_size(tmp_path):
+    simulation = _simulation(
+        tmp_path,
+        "hierarchical",
+        fan_out=2,
+        training="tests.test_simulation:train_without_size",
+    )
+    # Models aren't validated, so missing sample size reaches the aggregation
+    simulation.training.model_schema = None
+    with pytest.raises(Exception, match="requires sample_size"):
+        simulation.run(rounds=1)